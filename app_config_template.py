@@ -5,7 +5,100 @@ box_config = {
 }
 
 app_config = {
-    "LOG_LEVEL": "DEBUG"
+    "LOG_LEVEL": "INFO",
+    # Events, transcripts and cards logged at DEBUG are cut to this many characters
+    "LOG_MAX_PAYLOAD": 2048,
+    # Fraction of DEBUG payloads logged per stage (event, record, job, transcript, summary, card)
+    "LOG_SAMPLE_RATES": {"transcript": 0.1, "card": 0.1},
+    # Box files at least this large are downloaded as parallel byte ranges
+    "PARALLEL_DOWNLOAD_THRESHOLD": 64 * 1024 * 1024,
+    # Size of each downloaded range, also used as the S3 multipart part size
+    "DOWNLOAD_CHUNK_SIZE": 8 * 1024 * 1024,
+    "DOWNLOAD_CONCURRENCY": 4,
+    # Days a processed recording's transcript and summary are reused for identical uploads
+    "DEDUP_TTL_DAYS": 30,
+    # Send only a mono FLAC audio track of video files to Transcribe (needs the ffmpeg layer)
+    "EXTRACT_AUDIO": False,
+    "AUDIO_SAMPLE_RATE": 16000,
+    # Recordings of at least SEGMENT_MIN_DURATION seconds are cut into SEGMENT_DURATION second
+    # pieces, overlapping by SEGMENT_OVERLAP seconds, and transcribed in parallel (needs the
+    # ffmpeg layer, 0 turns it off)
+    "SEGMENT_MIN_DURATION": 0,
+    "SEGMENT_DURATION": 600,
+    "SEGMENT_OVERLAP": 10,
+    "SEGMENT_CONCURRENCY": 4,
+    # SQS batching for the express lane of the transcribe lambda; records in a batch run on TRANSCRIBE_WORKER_COUNT threads
+    "TRANSCRIBE_BATCH_SIZE": 10,
+    "TRANSCRIBE_BATCHING_WINDOW_SECONDS": 5,
+    "TRANSCRIBE_WORKER_COUNT": 4,
+    # Deliveries before a message moves to the dead letter queue and an error card is shown
+    "TRANSCRIBE_MAX_RECEIVE_COUNT": 3,
+    # Times a message is sent back to wait for a Box, Transcribe, Bedrock or DynamoDB outage to
+    # pass; these waits don't count as deliveries, and the job fails once they run out
+    "MAX_DEFERRALS": 10,
+    # Files up to these sizes use the express lane, larger ones the bulk lane
+    "EXPRESS_MAX_AUDIO_SIZE": 100 * 1024 * 1024,
+    "EXPRESS_MAX_VIDEO_SIZE": 500 * 1024 * 1024,
+    # Concurrent transcribe invocations per lane (2 is the lowest SQS allows)
+    "EXPRESS_MAX_CONCURRENCY": 20,
+    "BULK_MAX_CONCURRENCY": 2,
+    # Bulk files are handled one per invocation and stay hidden longer between retries
+    "BULK_BATCH_SIZE": 1,
+    "BULK_VISIBILITY_TIMEOUT_MINUTES": 90,
+    # Days job rows are kept after their last change of state, finished or abandoned
+    "JOB_TTL_DAYS": 14,
+    # Finished transcription jobs handed to each summarize invocation, summarized on SUMMARIZE_WORKER_COUNT threads
+    "SUMMARIZE_BATCH_SIZE": 4,
+    "SUMMARIZE_BATCHING_WINDOW_SECONDS": 5,
+    "SUMMARIZE_WORKER_COUNT": 4,
+    # Transcript card entries: "window" (every TRANSCRIPT_WINDOW_SECONDS), "sentence" or
+    # "speaker" (needs MAX_SPEAKER_LABELS); TRANSCRIPT_MAX_ENTRIES caps the card, 0 for no cap
+    "TRANSCRIPT_POLICY": "window",
+    "TRANSCRIPT_WINDOW_SECONDS": 1,
+    "TRANSCRIPT_MAX_ENTRIES": 0,
+    # Per skill overrides, e.g. {"1234": {"policy": "sentence", "max_entries": 500}}
+    "TRANSCRIPT_POLICIES": {},
+    # Ask Transcribe to label up to this many speakers (2 to 30, 0 turns it off)
+    "MAX_SPEAKER_LABELS": 0,
+    # Transcripts over SUMMARY_MAP_REDUCE_TOKENS (estimated at 4 characters a token) are
+    # summarized in overlapping chunks of SUMMARY_CHUNK_TOKENS, SUMMARY_CONCURRENCY at a time
+    "SUMMARY_MAP_REDUCE_TOKENS": 50000,
+    "SUMMARY_CHUNK_TOKENS": 12000,
+    "SUMMARY_CHUNK_OVERLAP_TOKENS": 400,
+    "SUMMARY_CHUNK_OUTPUT_TOKENS": 300,
+    "SUMMARY_CONCURRENCY": 4,
+    # Days the per-chunk summaries are kept under summary_parts/ in the transcription bucket
+    "SUMMARY_PARTS_RETENTION_DAYS": 14,
+    # Summaries put on each file as separate cards, generated concurrently: any of
+    # "summary", "brief" (3 sentences), "speakers" (per speaker) and "follow_ups"
+    "SUMMARY_TEMPLATES": ["summary"],
+    # Stream summaries from Bedrock and show them on the status card as they are written,
+    # rewriting the card at most every STATUS_UPDATE_SECONDS with up to STATUS_PREVIEW_LENGTH characters
+    "BEDROCK_STREAMING": True,
+    "STATUS_UPDATE_SECONDS": 3,
+    "STATUS_PREVIEW_LENGTH": 1000,
+    # Days Bedrock completions are reused for identical requests (0 turns the cache off);
+    # larger completions are not cached, and BEDROCK_CACHE_BYPASS forces fresh completions
+    "BEDROCK_CACHE_TTL_DAYS": 7,
+    "BEDROCK_CACHE_MAX_ENTRY_BYTES": 256 * 1024,
+    "BEDROCK_CACHE_BYPASS": False,
+    # Total size of the cache; least recently used completions are evicted over it, checked
+    # at most every BEDROCK_CACHE_SWEEP_MINUTES (0 leaves it to the expiry alone)
+    "BEDROCK_CACHE_MAX_BYTES": 1024 * 1024 * 1024,
+    "BEDROCK_CACHE_SWEEP_MINUTES": 60,
+    # Skill ids, as strings like "12345", whose summaries can wait: they are gathered for
+    # BATCH_WINDOW_MINUTES and run as one Bedrock batch inference job, which needs BATCH_MIN_RECORDS
+    # requests; requests still short of a batch after BATCH_MAX_WAIT_MINUTES are summarized on
+    # demand. Batch files are kept BATCH_RETENTION_DAYS. Box skill tokens have to outlive the wait
+    "LOW_PRIORITY_SKILLS": [],
+    "BATCH_WINDOW_MINUTES": 60,
+    "BATCH_MIN_RECORDS": 100,
+    "BATCH_MAX_WAIT_MINUTES": 240,
+    "BATCH_RETENTION_DAYS": 14,
+    # Per dependency ("box", "transcribe", "bedrock", "dynamodb") overrides of the retry policy:
+    # attempts, base_delay and max_delay in seconds (backoff with full jitter), and the circuit
+    # breaker that opens after failure_threshold failed calls in a row for reset_seconds
+    "RETRY_POLICIES": {}
 }
 
 """
@@ -20,5 +113,20 @@ app_config = {
     * "amazon.titan-tg1-large"
 """
 ai_config = {
-    "MODEL_ID" : "anthropic.claude-v2:1"
+    # Default model, also used for the chunks of transcripts too long for every rule
+    "MODEL_ID" : "anthropic.claude-v2:1",
+    # Model and output budget per transcript length in estimated tokens, first fit wins;
+    # longer transcripts are summarized in chunks. Empty uses MODEL_ID up to SUMMARY_MAP_REDUCE_TOKENS
+    "MODEL_RULES": [
+        {"max_input_tokens": 4000, "model_id": "anthropic.claude-instant-v1", "output_tokens": 150},
+        {"max_input_tokens": 90000, "model_id": "anthropic.claude-v2:1", "output_tokens": 300}
+    ],
+    # Bedrock capacity per model shared by all summarize invocations, set from the account's
+    # quotas (0 turns a limit off). A full bucket holds RATE_BURST_SECONDS of capacity, callers
+    # wait up to RATE_MAX_WAIT_SECONDS for it, and throttled calls are made RATE_ATTEMPTS times in all
+    "REQUESTS_PER_MINUTE": 100,
+    "TOKENS_PER_MINUTE": 200000,
+    "RATE_BURST_SECONDS": 10,
+    "RATE_MAX_WAIT_SECONDS": 60,
+    "RATE_ATTEMPTS": 3
 }
\ No newline at end of file
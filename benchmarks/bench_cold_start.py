@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Measure what importing each lambda entry point costs in a fresh interpreter.
+
+Every handler module is imported --runs times, each time in a new Python
+process with -X importtime, and the script reports the median import wall
+time, the slowest top-level imports and the peak RSS of the process. Results
+are compared against a stored baseline and the script exits non-zero when a
+metric regresses by more than its threshold.
+
+Runs offline: AWS and Box settings are stubbed and no client talks to the
+network at import time. Third-party packages (boto3, box_sdk_gen) must be
+importable, either installed locally or through --site-packages pointing at
+unpacked layer contents.
+
+    python benchmarks/bench_cold_start.py --runs 20
+    python benchmarks/bench_cold_start.py --update-baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HANDLERS = {
+    'skill': os.path.join(ROOT, 'lambdas', 'skill'),
+    'transcribe': os.path.join(ROOT, 'lambdas', 'transcribe'),
+    'summarize': os.path.join(ROOT, 'lambdas', 'summarize'),
+}
+
+SHARED_DIR = os.path.join(ROOT, 'lambdas', 'shared')
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'cold_start_baseline.json')
+
+STUB_ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_EC2_METADATA_DISABLED': 'true',
+    'LOG_LEVEL': 'INFO',
+    'BOX_CLIENT_ID': 'client-id',
+    'BOX_KEY_1': 'primary-key',
+    'BOX_KEY_2': 'secondary-key',
+    'EXPRESS_QUEUE_URL': 'https://sqs.us-east-1.amazonaws.com/123456789012/TranscribeExpressQueue',
+    'BULK_QUEUE_URL': 'https://sqs.us-east-1.amazonaws.com/123456789012/TranscribeBulkQueue',
+    'JOB_TABLE': 'transcriptionJobTable',
+    'DEDUP_TABLE': 'transcriptionDedupTable',
+    'STORAGE_BUCKET': 'box-bedrock-storage-bucket',
+    'TRANSCRIBE_BUCKET': 'box-bedrock-transcription-bucket',
+    'AI_MODEL': 'anthropic.claude-v2:1',
+}
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def run_once(handler, site_packages):
+    env = dict(os.environ)
+    env.update(STUB_ENV)
+    env['PYTHONPATH'] = os.pathsep.join([HANDLERS[handler], SHARED_DIR] + site_packages)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            [sys.executable, '-X', 'importtime', '-c', IMPORT_SNIPPET.format(module=handler)],
+            stdout=stdout,
+            stderr=stderr,
+            env=env,
+            cwd=HANDLERS[handler]
+        )
+
+        # wait4 reports the resource usage of this child alone, unlike RUSAGE_CHILDREN
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        output = stdout.read().decode()
+        importtime = stderr.read().decode()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"importing {handler} failed:\n{importtime[-2000:]}")
+
+    return {
+        'wall_seconds': float(output.strip().splitlines()[-1]),
+        'peak_rss_kb': usage.ru_maxrss,
+        'modules': parse_importtime(importtime),
+    }
+
+
+def parse_importtime(text):
+    """
+    Return cumulative microseconds per module from -X importtime output.
+
+    Only top-level imports and their direct imports are kept, which for a
+    handler module means the handler itself and everything it imports.
+    """
+    modules = {}
+
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.rstrip()
+
+        # Nesting is shown as two extra spaces of indentation per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+
+        if depth > 1:
+            continue
+
+        modules[name.strip()] = int(cumulative_us)
+
+    return modules
+
+
+def measure(handler, runs, site_packages):
+    # The first import writes .pyc files; Lambda ships them, so don't count it
+    run_once(handler, site_packages)
+
+    samples = [run_once(handler, site_packages) for _ in range(runs)]
+
+    module_names = set().union(*(sample['modules'] for sample in samples))
+
+    return {
+        'wall_seconds': statistics.median(sample['wall_seconds'] for sample in samples),
+        'peak_rss_kb': statistics.median(sample['peak_rss_kb'] for sample in samples),
+        'modules': {
+            name: statistics.median(sample['modules'].get(name, 0) for sample in samples)
+            for name in module_names
+        },
+    }
+
+
+def compare(handler, result, baseline, max_time_regression, max_rss_regression):
+    failures = []
+    previous = baseline.get(handler)
+
+    if not previous:
+        return failures
+
+    checks = [
+        ('wall_seconds', max_time_regression),
+        ('peak_rss_kb', max_rss_regression),
+    ]
+
+    for metric, threshold in checks:
+        change = result[metric] / previous[metric] - 1
+
+        print(f"  {metric:<14} {change:+7.1%} vs baseline (limit {threshold:+.0%})")
+
+        if change > threshold:
+            failures.append(f"{handler} {metric} regressed {change:+.1%}")
+
+    return failures
+
+
+def report(handler, result, top):
+    print(f"{handler}: {result['wall_seconds'] * 1000:.1f} ms import, {result['peak_rss_kb'] / 1024:.1f} MiB peak RSS")
+
+    slowest = sorted(result['modules'].items(), key=lambda module: module[1], reverse=True)[:top]
+
+    for name, cumulative_us in slowest:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--handler', choices=sorted(HANDLERS), action='append')
+    parser.add_argument('--site-packages', action='append', default=[], help="extra directory holding layer packages")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--max-time-regression', type=float, default=0.20)
+    parser.add_argument('--max-rss-regression', type=float, default=0.10)
+    parser.add_argument('--top', type=int, default=10, help="number of top-level imports to list")
+    args = parser.parse_args()
+
+    baseline = {}
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    failures = []
+
+    for handler in args.handler or sorted(HANDLERS):
+        results[handler] = measure(handler, args.runs, args.site_packages)
+        report(handler, results[handler], args.top)
+        failures += compare(handler, results[handler], baseline, args.max_time_regression, args.max_rss_regression)
+
+    if args.update_baseline or not baseline:
+        baseline.update({
+            handler: {'wall_seconds': result['wall_seconds'], 'peak_rss_kb': result['peak_rss_kb']}
+            for handler, result in results.items()
+        })
+
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
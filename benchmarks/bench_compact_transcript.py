@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Compare Transcribe item dicts with transcript_util.compact_transcript.
+
+For a synthetic transcript of --words words (a punctuation item every ten
+words, a 5000 word vocabulary) the script reports the memory each
+representation holds and the time of one pass that groups words into
+one-second card entries, which is what the summarize stage does, and the
+time group_entries() takes to build the entries including their text.
+
+    python benchmarks/bench_compact_transcript.py --words 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas', 'shared'))
+
+import transcript_util
+
+
+def make_items_json(words):
+    items = []
+
+    for index in range(words):
+        start = index * 0.4
+        items.append({
+            'type': 'pronunciation',
+            'alternatives': [{'confidence': '0.998', 'content': f"word{index % 5000}"}],
+            'start_time': f"{start:.3f}",
+            'end_time': f"{start + 0.3:.3f}"
+        })
+
+        if index % 10 == 9:
+            items.append({'type': 'punctuation', 'alternatives': [{'confidence': '0.0', 'content': '.'}]})
+
+    return json.dumps(items)
+
+
+def group_dicts(items):
+    groups = 0
+    second = -1
+
+    for item in items:
+        if item['type'] == 'punctuation':
+            start = second
+        else:
+            start = int(float(item['start_time']))
+
+        if start != second:
+            groups += 1
+            second = start
+
+        item['alternatives'][0]['content']
+
+    return groups
+
+
+def group_compact(transcript):
+    groups = 0
+    second = -1
+    words = transcript.words
+    punctuation = transcript_util.compact_transcript.punctuation
+
+    for start_ms, word_id, kind in zip(transcript.start_ms, transcript.word_ids, transcript.kinds):
+        if kind == punctuation:
+            start = second
+        else:
+            start = start_ms // 1000
+
+        if start != second:
+            groups += 1
+            second = start
+
+        words[word_id]
+
+    return groups
+
+
+def measure_build(build):
+    # Timed without tracemalloc, which slows allocation-heavy code several times over
+    began = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - began
+
+    tracemalloc.start()
+    value = build()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return value, elapsed, held
+
+
+def measure_pass(fn, value):
+    began = time.perf_counter()
+    result = fn(value)
+
+    return result, time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=1000000)
+    args = parser.parse_args()
+
+    document = make_items_json(args.words)
+
+    items, dict_build, dict_bytes = measure_build(lambda: json.loads(document))
+    transcript, compact_build, compact_bytes = measure_build(
+        lambda: transcript_util.compact_transcript.from_items(json.loads(document))
+    )
+
+    dict_groups, dict_pass = measure_pass(group_dicts, items)
+    compact_groups, compact_pass = measure_pass(group_compact, transcript)
+
+    assert dict_groups == compact_groups
+
+    entries, entries_pass = measure_pass(transcript_util.group_entries, transcript)
+
+    assert len(entries) == compact_groups
+
+    scale = 1000000 / args.words
+
+    print(f"{args.words} words, per million words:")
+    print(f"{'':<10} {'held MiB':>9} {'build s':>8} {'pass s':>7}")
+    print(f"{'dicts':<10} {dict_bytes * scale / 2**20:9.1f} {dict_build * scale:8.2f} {dict_pass * scale:7.2f}")
+    print(f"{'compact':<10} {compact_bytes * scale / 2**20:9.1f} {compact_build * scale:8.2f} {compact_pass * scale:7.2f}")
+    print(f"group_entries() with text: {entries_pass * scale:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
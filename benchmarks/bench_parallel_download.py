@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Compare sequential and parallel ranged downloads against a local HTTP server.
+
+The server imitates Box: /2.0/files/<id>/content redirects to a download URL
+that honors Range requests and caps the bandwidth of each connection, which is
+what limits a single stream from Box in practice.
+
+    python benchmarks/bench_parallel_download.py --size-mb 256 --stream-mbps 40
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas', 'shared'))
+
+FILE_ID = '12345'
+BLOCK_SIZE = 64 * 1024
+
+
+def make_handler(data, stream_bytes_per_second, ignore_range):
+
+    class handler(BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith(f"/2.0/files/{FILE_ID}/content"):
+                self.send_response(302)
+                self.send_header('Location', f"/data/{FILE_ID}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            start, end = 0, len(data) - 1
+            match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+
+            if match and not ignore_range:
+                start = int(match.group(1))
+                end = min(int(match.group(2) or end), end)
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{end}/{len(data)}")
+            else:
+                self.send_response(200)
+
+            self.send_header('Content-Length', str(end - start + 1))
+            self.end_headers()
+
+            began = time.perf_counter()
+            sent = 0
+
+            for position in range(start, end + 1, BLOCK_SIZE):
+                block = data[position:min(position + BLOCK_SIZE, end + 1)]
+                self.wfile.write(block)
+                sent += len(block)
+
+                ahead = sent / stream_bytes_per_second - (time.perf_counter() - began)
+
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    return handler
+
+
+def start_server(data, stream_bytes_per_second, ignore_range):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(data, stream_bytes_per_second, ignore_range))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def get_sdk_client(box, base_url):
+    try:
+        from box_sdk_gen.networking.base_urls import BaseUrls
+    except ImportError:
+        from box_sdk_gen.base_urls import BaseUrls
+
+    return box.read_client.with_custom_base_urls(
+        BaseUrls(base_url=f"{base_url}/2.0", upload_url=base_url, oauth_2_url=base_url)
+    )
+
+
+def measure(label, size, fn):
+    began = time.perf_counter()
+    received = fn()
+    elapsed = time.perf_counter() - began
+
+    assert received == size, f"{label}: received {received} of {size} bytes"
+
+    print(f"{label:<36} {elapsed:8.2f}s {size / elapsed / 1024 / 1024:10.1f} MiB/s")
+
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=128)
+    parser.add_argument('--stream-mbps', type=float, default=40, help="per-connection cap in MiB/s")
+    parser.add_argument('--chunk-mb', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--ignore-range', action='store_true', help="make the server answer every request with 200")
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    data = os.urandom(1024 * 1024) * args.size_mb
+
+    server, base_url = start_server(data, args.stream_mbps * 1024 * 1024, args.ignore_range)
+    os.environ['BOX_API_BASE_URL'] = f"{base_url}/2.0"
+
+    import box_util
+
+    box = box_util.box_util('read-token', 'write-token', logging.getLogger())
+    box.read_client = get_sdk_client(box, base_url)
+
+    print(f"{size / 1024 / 1024:.0f} MiB file, {args.stream_mbps} MiB/s per connection, "
+          f"{args.chunk_mb} MiB chunks{' (server ignores Range)' if args.ignore_range else ''}")
+
+    baseline = measure("get_file_contents()", size, lambda: len(box.get_file_contents(FILE_ID)))
+
+    for concurrency in args.concurrency:
+        elapsed = measure(
+            f"get_file_ranges(concurrency={concurrency})",
+            size,
+            lambda: sum(len(chunk) for chunk in box.get_file_ranges(
+                FILE_ID, size, chunk_size=args.chunk_mb * 1024 * 1024, max_workers=concurrency
+            ))
+        )
+        print(f"{'':<36} {baseline / elapsed:8.2f}x vs get_file_contents()")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Simulate many summarize workers sharing one Bedrock token bucket.
+
+Every worker reserves capacity from an in-memory bucket and then "invokes"
+a model that throttles whenever more requests arrive in a second than the
+account quota allows. The report shows the admitted rate, how long workers
+waited, how many writes lost the conditional check and how many calls were
+throttled, with and without the governor in front.
+
+    python benchmarks/bench_rate_limit.py --workers 48 --quota 20
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas', 'shared'))
+
+import rate_util
+
+
+class fake_model:
+    """
+    Accepts at most quota calls in any one second window
+    """
+
+    def __init__(self, quota, latency):
+        self.quota = quota
+        self.latency = latency
+        self.calls = deque()
+        self.lock = threading.Lock()
+        self.throttles = 0
+
+    def invoke(self):
+        with self.lock:
+            now = time.monotonic()
+
+            while self.calls and now - self.calls[0] > 1:
+                self.calls.popleft()
+
+            if len(self.calls) >= self.quota:
+                self.throttles += 1
+                return False
+
+            self.calls.append(now)
+
+        time.sleep(self.latency)
+        return True
+
+
+def run(args, governed):
+    store = rate_util.memory_store()
+    rate = rate_util.rate_util(
+        store,
+        logging.getLogger(),
+        requests_per_minute=args.limit * 60 if governed else 0,
+        tokens_per_minute=0,
+        burst_seconds=args.burst_seconds,
+        max_wait_seconds=600
+    )
+    model = fake_model(args.quota, args.latency)
+    waits = []
+    lock = threading.Lock()
+
+    def work():
+        for _ in range(args.calls):
+            while True:
+                waited = rate.acquire('model')
+
+                with lock:
+                    waits.append(waited)
+
+                if model.invoke():
+                    break
+
+                rate.throttled('model')
+                time.sleep(args.retry_delay)
+
+    threads = [threading.Thread(target=work) for _ in range(args.workers)]
+    began = time.monotonic()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.monotonic() - began
+    completed = args.workers * args.calls
+
+    print(f"{'governed' if governed else 'ungoverned':<11} {elapsed:7.2f}s {completed / elapsed:7.1f} calls/s "
+          f"{model.throttles:6d} throttles {store.conflicts:6d} conflicts "
+          f"median wait {statistics.median(waits) if waits else 0:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=48)
+    parser.add_argument('--calls', type=int, default=5)
+    parser.add_argument('--quota', type=int, default=20, help="calls per second the fake model accepts")
+    parser.add_argument('--limit', type=float, default=15, help="calls per second the governor allows")
+    parser.add_argument('--burst-seconds', type=float, default=0.25)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--retry-delay', type=float, default=0.05, help="pause before retrying a throttled call")
+    args = parser.parse_args()
+
+    run(args, governed=False)
+    run(args, governed=True)
+
+
+if __name__ == '__main__':
+    main()
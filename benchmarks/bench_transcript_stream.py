@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Compare peak memory and time of loading Transcribe output with json.loads
+against streaming its items with transcript_util.
+
+A synthetic output document is generated for each recording length, with
+roughly 150 words per minute and a punctuation item every ten words.
+
+    python benchmarks/bench_transcript_stream.py --hours 1 2 4 8
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas', 'shared'))
+
+import transcript_util
+
+WORDS_PER_MINUTE = 150
+
+
+def make_document(hours):
+    items = []
+    words = int(hours * 60 * WORDS_PER_MINUTE)
+
+    for index in range(words):
+        start = index * 60 / WORDS_PER_MINUTE
+        items.append({
+            'id': len(items),
+            'type': 'pronunciation',
+            'alternatives': [{'confidence': '0.998', 'content': f"word{index % 1000}"}],
+            'start_time': f"{start:.3f}",
+            'end_time': f"{start + 0.3:.3f}"
+        })
+
+        if index % 10 == 9:
+            items.append({
+                'id': len(items),
+                'type': 'punctuation',
+                'alternatives': [{'confidence': '0.0', 'content': '.'}]
+            })
+
+    transcript = transcript_util.get_transcript_text(items)
+
+    return json.dumps({
+        'jobName': 'benchmark',
+        'accountId': '123456789012',
+        'results': {'transcripts': [{'transcript': transcript}], 'items': items},
+        'status': 'COMPLETED'
+    }).encode('utf-8'), len(items)
+
+
+def load_all(document):
+    content = json.loads(io.BytesIO(document).read())
+    transcript = content['results']['transcripts'][0]['transcript']
+    items = content['results']['items']
+
+    return len(transcript), sum(1 for item in items)
+
+
+def stream(document):
+    transcript = transcript_util.read_transcript(io.BytesIO(document))
+    items = transcript_util.iter_items(io.BytesIO(document))
+
+    return len(transcript), sum(1 for item in items)
+
+
+def measure(fn, document):
+    tracemalloc.start()
+    began = time.perf_counter()
+
+    result = fn(document)
+
+    elapsed = time.perf_counter() - began
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, nargs='+', default=[0.5, 1, 2, 4])
+    args = parser.parse_args()
+
+    print(f"{'hours':>6} {'items':>9} {'size MiB':>9} {'loads peak MiB':>15} {'loads s':>8} {'stream peak MiB':>16} {'stream s':>9}")
+
+    for hours in args.hours:
+        document, item_count = make_document(hours)
+
+        loaded, loads_seconds, loads_peak = measure(load_all, document)
+        streamed, stream_seconds, stream_peak = measure(stream, document)
+
+        assert loaded == streamed == (loaded[0], item_count)
+
+        print(f"{hours:6g} {item_count:9d} {len(document) / 2**20:9.1f} {loads_peak / 2**20:15.1f} "
+              f"{loads_seconds:8.2f} {stream_peak / 2**20:16.1f} {stream_seconds:9.2f}")
+
+
+if __name__ == '__main__':
+    main()
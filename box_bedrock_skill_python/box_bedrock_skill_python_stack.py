@@ -11,6 +11,8 @@ from aws_cdk import (
     aws_s3 as s3,
     aws_sqs as sqs,
     aws_lambda_event_sources as ales,
+    aws_events as events,
+    aws_events_targets as events_targets,
     aws_logs as logs,
     aws_lambda_python_alpha as _lambpy,
     aws_iam as _iam
@@ -24,6 +26,10 @@ class BoxBedrockSkillPythonStack(cdk.Stack):
 
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
+
+        dedup_ttl_days = int(app_config.get('DEDUP_TTL_DAYS', 30))
+        bedrock_cache_ttl_days = int(app_config.get('BEDROCK_CACHE_TTL_DAYS', 7))
+        low_priority_skills = app_config.get('LOW_PRIORITY_SKILLS', [])
        
         lambda_custom_policy = _iam.PolicyDocument(
             assign_sids=False,
@@ -56,19 +62,90 @@ class BoxBedrockSkillPythonStack(cdk.Stack):
             )]
         )
 
-        transcribe_queue = sqs.Queue(
-            self, "transcribeQueue",
-            queue_name="TranscribeQueue",
+        transcribe_max_receive_count = int(app_config.get('TRANSCRIBE_MAX_RECEIVE_COUNT', 3))
+        max_deferrals = int(app_config.get('MAX_DEFERRALS', 10))
+
+        # Small recordings take the express lane, large ones the bulk lane so
+        # they cannot hold up short files; each lane has its own dead letter queue
+        express_dead_letter_queue = sqs.Queue(
+            self, "transcribeExpressDeadLetterQueue",
+            queue_name="TranscribeExpressDeadLetterQueue",
+            retention_period=cdk.Duration.days(14),
+            removal_policy=cdk.RemovalPolicy.DESTROY
+        )
+
+        express_queue = sqs.Queue(
+            self, "transcribeExpressQueue",
+            queue_name="TranscribeExpressQueue",
             visibility_timeout=cdk.Duration.minutes(15),
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=transcribe_max_receive_count,
+                queue=express_dead_letter_queue
+            )
+        )
+
+        bulk_dead_letter_queue = sqs.Queue(
+            self, "transcribeBulkDeadLetterQueue",
+            queue_name="TranscribeBulkDeadLetterQueue",
+            retention_period=cdk.Duration.days(14),
             removal_policy=cdk.RemovalPolicy.DESTROY
         )
 
+        bulk_queue = sqs.Queue(
+            self, "transcribeBulkQueue",
+            queue_name="TranscribeBulkQueue",
+            visibility_timeout=cdk.Duration.minutes(int(app_config.get('BULK_VISIBILITY_TIMEOUT_MINUTES', 90))),
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=transcribe_max_receive_count,
+                queue=bulk_dead_letter_queue
+            )
+        )
+
+        summarize_dead_letter_queue = sqs.Queue(
+            self, "summarizeDeadLetterQueue",
+            queue_name="SummarizeDeadLetterQueue",
+            retention_period=cdk.Duration.days(14),
+            removal_policy=cdk.RemovalPolicy.DESTROY
+        )
+
+        summarize_queue = sqs.Queue(
+            self, "summarizeQueue",
+            queue_name="SummarizeQueue",
+            visibility_timeout=cdk.Duration.minutes(15),
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=transcribe_max_receive_count,
+                queue=summarize_dead_letter_queue
+            )
+        )
+
+        # Summarize starts when Transcribe reports a job finished, instead of
+        # on the output object showing up in S3
+        events.Rule(
+            self, "transcribeJobStateRule",
+            event_pattern=events.EventPattern(
+                source=["aws.transcribe"],
+                detail_type=["Transcribe Job State Change"],
+                detail={
+                    "TranscriptionJobStatus": ["COMPLETED", "FAILED"]
+                }
+            ),
+            targets=[events_targets.SqsQueue(summarize_queue)]
+        )
+
         storage_bucket = s3.Bucket(
             self, 'storageBucket',
             bucket_name="box-bedrock-storage-bucket",
             public_read_access=False,
             auto_delete_objects=True,
-            removal_policy=cdk.RemovalPolicy.DESTROY
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+            lifecycle_rules=[
+                s3.LifecycleRule(
+                    abort_incomplete_multipart_upload_after=cdk.Duration.days(1)
+                )
+            ]
         )
 
         transcription_bucket = s3.Bucket(
@@ -76,16 +153,77 @@ class BoxBedrockSkillPythonStack(cdk.Stack):
             bucket_name="box-bedrock-transcription-bucket",
             public_read_access=False,
             auto_delete_objects=True,
-            removal_policy=cdk.RemovalPolicy.DESTROY
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+            lifecycle_rules=[
+                s3.LifecycleRule(
+                    prefix="dedup/",
+                    expiration=cdk.Duration.days(dedup_ttl_days + 1)
+                ),
+                s3.LifecycleRule(
+                    prefix="summary_parts/",
+                    expiration=cdk.Duration.days(int(app_config.get('SUMMARY_PARTS_RETENTION_DAYS', 14)))
+                ),
+                s3.LifecycleRule(
+                    prefix="bedrock_cache/",
+                    expiration=cdk.Duration.days(bedrock_cache_ttl_days + 1)
+                ),
+                s3.LifecycleRule(
+                    prefix="batch_inference/",
+                    expiration=cdk.Duration.days(int(app_config.get('BATCH_RETENTION_DAYS', 14)))
+                )
+            ]
         )
         
+        # Jobs and their state; rows expire JOB_TTL_DAYS after their last move
         job_table = _dynamo.Table(
             self, id="jobTable",
             table_name="transcriptionJobTable",
             partition_key=_dynamo.Attribute(name="job_id", type=_dynamo.AttributeType.STRING),
+            time_to_live_attribute="expires_at",
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+            encryption=_dynamo.TableEncryption.AWS_MANAGED
+        )
+
+        job_table.add_global_secondary_index(
+            index_name="file_id-index",
+            partition_key=_dynamo.Attribute(name="file_id", type=_dynamo.AttributeType.STRING),
+            sort_key=_dynamo.Attribute(name="created_at", type=_dynamo.AttributeType.NUMBER)
+        )
+
+        dedup_table = _dynamo.Table(
+            self, id="dedupTable",
+            table_name="transcriptionDedupTable",
+            partition_key=_dynamo.Attribute(name="content_hash", type=_dynamo.AttributeType.STRING),
+            time_to_live_attribute="expires_at",
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+            encryption=_dynamo.TableEncryption.AWS_MANAGED
+        )
+
+        # One token bucket row per Bedrock model, shared by every summarize invocation
+        rate_limit_table = _dynamo.Table(
+            self, id="rateLimitTable",
+            table_name="bedrockRateLimitTable",
+            partition_key=_dynamo.Attribute(name="bucket", type=_dynamo.AttributeType.STRING),
+            billing_mode=_dynamo.BillingMode.PAY_PER_REQUEST,
             removal_policy=cdk.RemovalPolicy.DESTROY,
             encryption=_dynamo.TableEncryption.AWS_MANAGED
         )
+
+        # Bedrock reads batch inputs and writes their outputs in the transcription bucket as this role
+        batch_environment = {}
+
+        if low_priority_skills:
+            batch_role = _iam.Role(
+                self, 'batchInferenceRole',
+                assumed_by=_iam.ServicePrincipal('bedrock.amazonaws.com')
+            )
+            transcription_bucket.grant_read_write(batch_role)
+
+            batch_environment = {
+                "BATCH_ROLE_ARN": batch_role.role_arn,
+                "BATCH_MIN_RECORDS": str(app_config.get('BATCH_MIN_RECORDS', 100)),
+                "BATCH_MAX_WAIT_MINUTES": str(app_config.get('BATCH_MAX_WAIT_MINUTES', 240))
+            }
         
         box_gen_lambda_layer = _lambpy.PythonLayerVersion(
             self, 'transcriptionGenBoxLayer',
@@ -103,21 +241,77 @@ class BoxBedrockSkillPythonStack(cdk.Stack):
             layer_version_name='transcriptionBoxLayer'
         )
 
+        # box_util, ai_util and the other helpers every function imports
+        shared_lambda_layer = _lambpy.PythonLayerVersion(
+            self, 'sharedLayer',
+            entry='lambdas/shared',
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_12],
+            description='shared Box and AWS helpers',
+            layer_version_name='boxSkillSharedLayer'
+        )
+
+        extract_audio = bool(app_config.get('EXTRACT_AUDIO', False))
+        segment_min_duration = int(app_config.get('SEGMENT_MIN_DURATION', 0))
+
+        transcribe_layers = [box_gen_lambda_layer,shared_lambda_layer]
+
+        if extract_audio or segment_min_duration:
+            # Expects static ffmpeg and ffprobe builds in layers/ffmpeg/bin, see README
+            ffmpeg_lambda_layer = _lambda.LayerVersion(
+                self, 'ffmpegLayer',
+                code=_lambda.Code.from_asset('layers/ffmpeg'),
+                compatible_runtimes=[_lambda.Runtime.PYTHON_3_12],
+                description='ffmpeg for audio extraction',
+                layer_version_name='ffmpegLayer'
+            )
+            transcribe_layers.append(ffmpeg_lambda_layer)
+
+        logging_environment = {
+            "LOG_LEVEL": app_config.get('LOG_LEVEL', 'INFO'),
+            "LOG_MAX_PAYLOAD": str(app_config.get('LOG_MAX_PAYLOAD', 2048)),
+            "LOG_SAMPLE_RATES": json.dumps(app_config.get('LOG_SAMPLE_RATES', {}))
+        }
+
+        # Retry policies and circuit breakers of the calls to Box, Transcribe, Bedrock and DynamoDB
+        resilience_environment = {
+            "RETRY_POLICIES": json.dumps(app_config.get('RETRY_POLICIES', {}))
+        }
+
+        # Both functions that publish transcript cards cut entries the same way
+        transcript_card_environment = {
+            "TRANSCRIPT_POLICY": app_config.get('TRANSCRIPT_POLICY', 'window'),
+            "TRANSCRIPT_WINDOW_SECONDS": str(app_config.get('TRANSCRIPT_WINDOW_SECONDS', 1)),
+            "TRANSCRIPT_MAX_ENTRIES": str(app_config.get('TRANSCRIPT_MAX_ENTRIES', 0)),
+            "TRANSCRIPT_POLICIES": json.dumps(app_config.get('TRANSCRIPT_POLICIES', {}))
+        }
+
+        # What summaries depend on; transcribe reads it too, to tell whether deduplicated summaries still hold
+        summary_settings_environment = {
+            "AI_MODEL": ai_config['MODEL_ID'],
+            "MODEL_RULES": json.dumps(ai_config.get('MODEL_RULES', [])),
+            "SUMMARY_MAP_REDUCE_TOKENS": str(app_config.get('SUMMARY_MAP_REDUCE_TOKENS', 50000)),
+            "SUMMARY_TEMPLATES": ",".join(app_config.get('SUMMARY_TEMPLATES', ["summary"]))
+        }
+
         skill_lambda = _lambpy.PythonFunction(
             self, "skillLambda",
             entry="lambdas/skill",
             index="skill.py",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="lambda_handler",
-            layers=[box_gen_lambda_layer,box_lambda_layer],
+            layers=[box_gen_lambda_layer,box_lambda_layer,shared_lambda_layer],
             timeout=cdk.Duration.minutes(15),
             role=lambda_role,
             environment = {
-                "LOG_LEVEL": app_config['LOG_LEVEL'],
+                **logging_environment,
+                **resilience_environment,
                 "BOX_CLIENT_ID": box_config['BOX_CLIENT_ID'],
                 "BOX_KEY_1": box_config['BOX_KEY_1'],
                 "BOX_KEY_2": box_config['BOX_KEY_2'],
-                "QUEUE_URL": transcribe_queue.queue_url
+                "EXPRESS_QUEUE_URL": express_queue.queue_url,
+                "BULK_QUEUE_URL": bulk_queue.queue_url,
+                "EXPRESS_MAX_AUDIO_SIZE": str(app_config.get('EXPRESS_MAX_AUDIO_SIZE', 100 * 1024 * 1024)),
+                "EXPRESS_MAX_VIDEO_SIZE": str(app_config.get('EXPRESS_MAX_VIDEO_SIZE', 500 * 1024 * 1024))
             }
         )
 
@@ -127,20 +321,39 @@ class BoxBedrockSkillPythonStack(cdk.Stack):
             index="transcribe.py",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="lambda_handler",
-            layers=[box_gen_lambda_layer,box_lambda_layer],
+            layers=transcribe_layers,
             timeout=cdk.Duration.minutes(15),
             role=lambda_role,
-            ephemeral_storage_size=Size.gibibytes(10),
-            memory_size=10240,
+            memory_size=1024,
             environment = {
-                "LOG_LEVEL": app_config['LOG_LEVEL'],
+                **logging_environment,
+                **resilience_environment,
                 "BOX_CLIENT_ID": box_config['BOX_CLIENT_ID'],
                 "BOX_KEY_1": box_config['BOX_KEY_1'],
                 "BOX_KEY_2": box_config['BOX_KEY_2'],
                 "STORAGE_BUCKET": storage_bucket.bucket_name,
                 "TRANSCRIBE_BUCKET": transcription_bucket.bucket_name,
                 "JOB_TABLE": job_table.table_name,
-                "QUEUE_URL": transcribe_queue.queue_url
+                "JOB_TTL_DAYS": str(app_config.get('JOB_TTL_DAYS', 14)),
+                "DEDUP_TABLE": dedup_table.table_name,
+                "DEDUP_TTL_DAYS": str(dedup_ttl_days),
+                "PARALLEL_DOWNLOAD_THRESHOLD": str(app_config.get('PARALLEL_DOWNLOAD_THRESHOLD', 64 * 1024 * 1024)),
+                "DOWNLOAD_CHUNK_SIZE": str(app_config.get('DOWNLOAD_CHUNK_SIZE', 8 * 1024 * 1024)),
+                "DOWNLOAD_CONCURRENCY": str(app_config.get('DOWNLOAD_CONCURRENCY', 4)),
+                "UPLOAD_PART_SIZE": str(app_config.get('DOWNLOAD_CHUNK_SIZE', 8 * 1024 * 1024)),
+                "WORKER_COUNT": str(app_config.get('TRANSCRIBE_WORKER_COUNT', 4)),
+                "MAX_RECEIVE_COUNT": str(transcribe_max_receive_count),
+                "MAX_DEFERRALS": str(max_deferrals),
+                "EXTRACT_AUDIO": str(extract_audio).lower(),
+                "AUDIO_SAMPLE_RATE": str(app_config.get('AUDIO_SAMPLE_RATE', 16000)),
+                "SEGMENT_MIN_DURATION": str(segment_min_duration),
+                "SEGMENT_DURATION": str(app_config.get('SEGMENT_DURATION', 600)),
+                "SEGMENT_OVERLAP": str(app_config.get('SEGMENT_OVERLAP', 10)),
+                "SEGMENT_CONCURRENCY": str(app_config.get('SEGMENT_CONCURRENCY', 4)),
+                "MAX_SPEAKER_LABELS": str(app_config.get('MAX_SPEAKER_LABELS', 0)),
+                "SUMMARIZE_QUEUE_URL": summarize_queue.queue_url,
+                **summary_settings_environment,
+                **transcript_card_environment
             }
         )
 
@@ -150,43 +363,137 @@ class BoxBedrockSkillPythonStack(cdk.Stack):
             index="summarize.py",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="lambda_handler",
-            layers=[box_gen_lambda_layer,box_lambda_layer],
+            layers=[box_gen_lambda_layer,shared_lambda_layer],
             timeout=cdk.Duration.minutes(15),
             role=lambda_role,
             ephemeral_storage_size=Size.gibibytes(10),
             environment = {
-                "LOG_LEVEL": app_config['LOG_LEVEL'],
+                **logging_environment,
+                **resilience_environment,
                 "STORAGE_BUCKET": storage_bucket.bucket_name,
                 "TRANSCRIBE_BUCKET": transcription_bucket.bucket_name,
                 "JOB_TABLE": job_table.table_name,
-                "AI_MODEL": ai_config['MODEL_ID']
+                "JOB_TTL_DAYS": str(app_config.get('JOB_TTL_DAYS', 14)),
+                "DEDUP_TABLE": dedup_table.table_name,
+                "DEDUP_TTL_DAYS": str(dedup_ttl_days),
+                "WORKER_COUNT": str(app_config.get('SUMMARIZE_WORKER_COUNT', 4)),
+                "MAX_RECEIVE_COUNT": str(transcribe_max_receive_count),
+                "MAX_DEFERRALS": str(max_deferrals),
+                "RATE_LIMIT_TABLE": rate_limit_table.table_name,
+                "BEDROCK_REQUESTS_PER_MINUTE": str(ai_config.get('REQUESTS_PER_MINUTE', 0)),
+                "BEDROCK_TOKENS_PER_MINUTE": str(ai_config.get('TOKENS_PER_MINUTE', 0)),
+                "RATE_BURST_SECONDS": str(ai_config.get('RATE_BURST_SECONDS', 10)),
+                "RATE_MAX_WAIT_SECONDS": str(ai_config.get('RATE_MAX_WAIT_SECONDS', 60)),
+                "RATE_ATTEMPTS": str(ai_config.get('RATE_ATTEMPTS', 3)),
+                "SUMMARY_CHUNK_TOKENS": str(app_config.get('SUMMARY_CHUNK_TOKENS', 12000)),
+                "SUMMARY_CHUNK_OVERLAP_TOKENS": str(app_config.get('SUMMARY_CHUNK_OVERLAP_TOKENS', 400)),
+                "SUMMARY_CHUNK_OUTPUT_TOKENS": str(app_config.get('SUMMARY_CHUNK_OUTPUT_TOKENS', 300)),
+                "SUMMARY_CONCURRENCY": str(app_config.get('SUMMARY_CONCURRENCY', 4)),
+                "BEDROCK_STREAMING": str(app_config.get('BEDROCK_STREAMING', True)).lower(),
+                "STATUS_UPDATE_SECONDS": str(app_config.get('STATUS_UPDATE_SECONDS', 3)),
+                "STATUS_PREVIEW_LENGTH": str(app_config.get('STATUS_PREVIEW_LENGTH', 1000)),
+                "BEDROCK_CACHE_TTL_DAYS": str(bedrock_cache_ttl_days),
+                "BEDROCK_CACHE_MAX_ENTRY_BYTES": str(app_config.get('BEDROCK_CACHE_MAX_ENTRY_BYTES', 256 * 1024)),
+                "BEDROCK_CACHE_BYPASS": str(app_config.get('BEDROCK_CACHE_BYPASS', False)).lower(),
+                "BEDROCK_CACHE_MAX_BYTES": str(app_config.get('BEDROCK_CACHE_MAX_BYTES', 1024 * 1024 * 1024)),
+                "BEDROCK_CACHE_SWEEP_MINUTES": str(app_config.get('BEDROCK_CACHE_SWEEP_MINUTES', 60)),
+                "LOW_PRIORITY_SKILLS": json.dumps(low_priority_skills),
+                **summary_settings_environment,
+                **batch_environment,
+                **transcript_card_environment
             }
         )
 
-        transcribe_source = ales.SqsEventSource(transcribe_queue)
-        transcribe_lambda.add_event_source(transcribe_source)
+        # Submits the low priority summaries gathered each window as Bedrock batch
+        # inference jobs, and hands finished jobs back to summarize
+        if low_priority_skills:
+            batch_lambda = _lambpy.PythonFunction(
+                self, "batchLambda",
+                entry="lambdas/batch",
+                index="batch.py",
+                runtime=_lambda.Runtime.PYTHON_3_12,
+                handler="lambda_handler",
+                layers=[shared_lambda_layer],
+                timeout=cdk.Duration.minutes(15),
+                role=lambda_role,
+                environment = {
+                    **logging_environment,
+                    **resilience_environment,
+                    "STORAGE_BUCKET": storage_bucket.bucket_name,
+                    "TRANSCRIBE_BUCKET": transcription_bucket.bucket_name,
+                    "SUMMARIZE_QUEUE_URL": summarize_queue.queue_url,
+                    "AI_MODEL": ai_config['MODEL_ID'],
+                    **batch_environment
+                }
+            )
 
-        summarize_source = ales.S3EventSource(
-            transcription_bucket, 
-            events= [
-                s3.EventType.OBJECT_CREATED_PUT
-            ],
-            filters=[
-                s3.NotificationKeyFilter(prefix="meetings_summary/")
-            ]
+            events.Rule(
+                self, "batchWindowRule",
+                schedule=events.Schedule.rate(cdk.Duration.minutes(int(app_config.get('BATCH_WINDOW_MINUTES', 60)))),
+                targets=[events_targets.LambdaFunction(batch_lambda)]
+            )
+
+            events.Rule(
+                self, "batchJobStateRule",
+                event_pattern=events.EventPattern(
+                    source=["aws.bedrock"],
+                    detail_type=["Batch Inference Job State Change"],
+                    # Only the jobs batch_util starts, not every batch job in the account
+                    detail={"batchJobName": [{"prefix": "summaries-"}]}
+                ),
+                targets=[events_targets.LambdaFunction(batch_lambda)]
+            )
+
+            transcription_bucket.grant_read_write(batch_lambda)
+            summarize_queue.grant_send_messages(batch_lambda)
+
+        express_source = ales.SqsEventSource(
+            express_queue,
+            batch_size=int(app_config.get('TRANSCRIBE_BATCH_SIZE', 10)),
+            max_batching_window=cdk.Duration.seconds(int(app_config.get('TRANSCRIBE_BATCHING_WINDOW_SECONDS', 5))),
+            max_concurrency=int(app_config.get('EXPRESS_MAX_CONCURRENCY', 20)),
+            report_batch_item_failures=True
+        )
+        transcribe_lambda.add_event_source(express_source)
+
+        bulk_source = ales.SqsEventSource(
+            bulk_queue,
+            batch_size=int(app_config.get('BULK_BATCH_SIZE', 1)),
+            max_concurrency=int(app_config.get('BULK_MAX_CONCURRENCY', 2)),
+            report_batch_item_failures=True
+        )
+        transcribe_lambda.add_event_source(bulk_source)
+
+        summarize_source = ales.SqsEventSource(
+            summarize_queue,
+            batch_size=int(app_config.get('SUMMARIZE_BATCH_SIZE', 4)),
+            max_batching_window=cdk.Duration.seconds(int(app_config.get('SUMMARIZE_BATCHING_WINDOW_SECONDS', 5))),
+            report_batch_item_failures=True
         )
         summarize_lambda.add_event_source(summarize_source)
 
         job_table.grant_full_access(transcribe_lambda)
         job_table.grant_full_access(summarize_lambda)
+        dedup_table.grant_read_write_data(transcribe_lambda)
+        dedup_table.grant_read_write_data(summarize_lambda)
+        rate_limit_table.grant_read_write_data(summarize_lambda)
 
         storage_bucket.grant_read_write(transcribe_lambda)
         storage_bucket.grant_read_write(summarize_lambda)
+        transcription_bucket.grant_read_write(transcribe_lambda)
         transcription_bucket.grant_read_write(summarize_lambda)
 
-        transcribe_queue.grant_send_messages(skill_lambda)
-        transcribe_queue.grant_consume_messages(transcribe_lambda)
-        transcribe_queue.grant_purge(transcribe_lambda)
+        for queue in [express_queue, bulk_queue]:
+            queue.grant_send_messages(skill_lambda)
+            queue.grant_consume_messages(transcribe_lambda)
+            # Deferred messages are sent back to the queue they came from
+            queue.grant_send_messages(transcribe_lambda)
+            queue.grant_purge(transcribe_lambda)
+
+        summarize_queue.grant_consume_messages(summarize_lambda)
+        summarize_queue.grant_send_messages(summarize_lambda)
+        # Repeat uploads whose summaries are stale go straight to summarize
+        summarize_queue.grant_send_messages(transcribe_lambda)
 
         # Define API Gateway and HTTP API
         transcribe_api = _apigw.RestApi(
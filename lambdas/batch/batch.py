@@ -0,0 +1,77 @@
+import json
+import os
+
+import ai_util
+import aws_util
+import batch_util
+import log_util
+
+summarize_queue_url = os.environ['SUMMARIZE_QUEUE_URL']
+
+transcribe_bucket = os.environ['TRANSCRIBE_BUCKET']
+
+logger = log_util.get_logger()
+
+def send_to_summarize(job_id, summaries=None):
+    """
+    Hand a job back to the summarize lambda, with its summaries or, without
+    them, asking for an on demand summary
+    """
+    message = {
+        'detail': {
+            'TranscriptionJobName': job_id,
+            'TranscriptionJobStatus': 'COMPLETED'
+        }
+    }
+
+    if summaries is None:
+        message['on_demand'] = True
+    else:
+        message['summaries'] = summaries
+
+    aws_util.get_client('sqs').send_message(QueueUrl=summarize_queue_url, MessageBody=json.dumps(message))
+
+def submit_window(batch):
+    overdue = batch.submit()
+
+    for job_id in overdue:
+        logger.info(f"{job_id} waited too long for a full batch, summarizing on demand")
+        send_to_summarize(job_id)
+
+def fan_out(ai, batch, job_arn):
+    status, results, failed = batch.get_results(job_arn, ai.get_completion)
+
+    logger.info(f"batch inference job {job_arn} is {status}: {len(results)} jobs summarized, {len(failed)} failed")
+
+    for job_id, summaries in results.items():
+        send_to_summarize(job_id, summaries)
+
+    for job_id in failed:
+        send_to_summarize(job_id)
+
+def lambda_handler(event, context):
+    log_util.log_payload(logger, 'event', "batch->lambda_handler: Event", event)
+
+    ai = ai_util.ai_util()
+
+    batch = batch_util.batch_util(
+        aws_util.get_client('s3'),
+        aws_util.get_client('bedrock'),
+        transcribe_bucket,
+        logger
+    )
+
+    # Runs on the accumulation window schedule and on Bedrock batch job state changes
+    if event.get('detail-type') == 'Batch Inference Job State Change':
+        status = event['detail']['status']
+
+        if not event['detail'].get('batchJobName', '').startswith(batch_util.batch_util.job_name_prefix):
+            logger.info(f"batch inference job {event['detail'].get('batchJobName')} isn't a summary batch, skipping it")
+        elif status in batch_util.batch_util.finished_statuses | batch_util.batch_util.failed_statuses:
+            fan_out(ai, batch, event['detail']['batchJobArn'])
+    else:
+        submit_window(batch)
+
+    return {
+        'statusCode' : 200
+    }
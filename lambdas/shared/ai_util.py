@@ -0,0 +1,588 @@
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import aws_util
+import cache_util
+import log_util
+import rate_util
+import resilience_util
+import transcript_util
+
+logger = logging.getLogger(__name__)
+
+class ai_util:
+
+    summary_parts_prefix = "summary_parts/"
+
+    # Part of every cache key; bump it when the prompts change so cached completions miss
+    template_version = "1"
+
+    # Summaries that can be put on a file, each published as its own card
+    prompt_templates = {
+        'summary': {
+            'title': "Summary",
+            'instruction': "Please summarize the above meeting transcript",
+            'token_count': 150
+        },
+        'brief': {
+            'title': "Summary in 3 sentences",
+            'instruction': "Please summarize the above meeting transcript in 3 sentences",
+            'token_count': 150
+        },
+        'speakers': {
+            'title': "Summary by speaker",
+            'instruction': "Please summarize the above meeting transcript on a per speaker basis",
+            'token_count': 300
+        },
+        'follow_ups': {
+            'title': "Follow ups",
+            'instruction': "Please provide the follow ups each person should take away from the above meeting transcript",
+            'token_count': 300
+        }
+    }
+
+    claude_models = ["anthropic.claude-v2:1", "anthropic.claude-v2", "anthropic.claude-instant-v1", "anthropic.claude-v1", "anthropic.claude-v2-100k"]
+    jurassic_models = ["ai21.j2-ultra"]
+
+    # Output budget the template token counts are written for, see route
+    default_output_tokens = 150
+
+    def __init__(self):
+        self.meeting_summary_store = os.environ['TRANSCRIBE_BUCKET']
+        self.meeting_recordings_store = os.environ['STORAGE_BUCKET']
+        self._cache = None
+        self._rate = None
+
+        self.model_id = os.environ.get('AI_MODEL', "anthropic.claude-v2:1")
+
+        # Without MODEL_RULES, transcripts estimated above map_reduce_tokens are summarized in chunks
+        self.map_reduce_tokens = int(os.environ.get('SUMMARY_MAP_REDUCE_TOKENS', 50000))
+
+        # Ordered [{"max_input_tokens", "model_id", "output_tokens"}]; the first rule whose
+        # max_input_tokens fits the transcript wins, and longer ones are summarized in chunks
+        self.model_rules = json.loads(os.environ.get('MODEL_RULES') or '[]') or [{
+            'max_input_tokens': self.map_reduce_tokens,
+            'model_id': self.model_id,
+            'output_tokens': ai_util.default_output_tokens
+        }]
+        self.chunk_tokens = int(os.environ.get('SUMMARY_CHUNK_TOKENS', 12000))
+        self.chunk_overlap_tokens = int(os.environ.get('SUMMARY_CHUNK_OVERLAP_TOKENS', 400))
+        self.chunk_summary_tokens = int(os.environ.get('SUMMARY_CHUNK_OUTPUT_TOKENS', 300))
+        self.summary_concurrency = int(os.environ.get('SUMMARY_CONCURRENCY', 4))
+
+        # Bedrock calls that were throttled are tried again up to this many times in all
+        self.rate_attempts = int(os.environ.get('RATE_ATTEMPTS', 3))
+
+        # Stream completions that are shown on the status card while they are generated
+        self.streaming = os.environ.get('BEDROCK_STREAMING', 'true').lower() == 'true'
+
+        # Comma separated names from prompt_templates, in card order
+        self.summary_templates = [
+            name.strip()
+            for name in os.environ.get('SUMMARY_TEMPLATES', 'summary').split(',')
+            if name.strip()
+        ]
+
+        unknown = [name for name in self.summary_templates if name not in ai_util.prompt_templates]
+
+        if unknown or not self.summary_templates:
+            raise ValueError(f"SUMMARY_TEMPLATES must name some of {', '.join(ai_util.prompt_templates)}, got {unknown}")
+
+    # Calls to both are retried by resilience_util, see invoke for Bedrock throttles
+    @property
+    def transcribe(self):
+        return aws_util.get_client("transcribe", retries=aws_util.no_retries)
+
+    @property
+    def bedrock(self):
+        return aws_util.get_client("bedrock-runtime", retries=aws_util.no_retries)
+
+    @property
+    def s3(self):
+        return aws_util.get_client("s3")
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = cache_util.cache_util(self.s3, self.meeting_summary_store, logger)
+
+        return self._cache
+
+    @property
+    def rate(self):
+        if self._rate is None:
+            table_name = os.environ.get('RATE_LIMIT_TABLE')
+
+            if table_name:
+                store = rate_util.dynamo_store(lambda: aws_util.get_table(table_name))
+            else:
+                store = rate_util.memory_store()
+
+            self._rate = rate_util.rate_util(store, logger)
+
+        return self._rate
+
+    def get_job_name(self, meeting_file):
+        file_name, file_extension = os.path.splitext(meeting_file)
+
+        return file_name.replace(" ", "_").replace(",","").replace("&","_")
+
+    def meeting_transcribe(self,meeting_file, sample_rate=None, job_unique_name=None):
+        """
+        Trascribe the meeting recording file and stores the output in a S3 bucket
+
+        The media format is taken from the file extension; pass sample_rate when
+        the file was transcoded so Transcribe doesn't have to detect it. A
+        job_unique_name that is already taken raises ConflictException.
+        """
+        file_name, file_extension = os.path.splitext(meeting_file)
+
+        if not job_unique_name:
+            temp_name_append = uuid.uuid4().hex[:6]
+            job_unique_name = f"{self.get_job_name(meeting_file)}_{temp_name_append}"
+
+        job_uri = f"s3://{self.meeting_recordings_store}/{meeting_file}"
+
+        job_args = {}
+
+        if sample_rate:
+            job_args['MediaSampleRateHertz'] = int(sample_rate)
+
+        # Speaker labels let transcript cards break at speaker turns
+        max_speakers = int(os.environ.get('MAX_SPEAKER_LABELS', 0))
+
+        if max_speakers:
+            job_args['Settings'] = {
+                'ShowSpeakerLabels': True,
+                'MaxSpeakerLabels': max_speakers
+            }
+
+        resilience_util.call(
+            'transcribe',
+            self.transcribe.start_transcription_job,
+            TranscriptionJobName=job_unique_name,
+            Media={'MediaFileUri': job_uri},
+            MediaFormat=file_extension[1:],
+            LanguageCode='en-US',
+            OutputBucketName=self.meeting_summary_store,
+            OutputKey=f"meetings_summary/{job_unique_name}.json",
+            **job_args
+        )
+
+        return job_unique_name, job_uri
+    
+    def get_transcription_status(self, job_name):
+        return resilience_util.call('transcribe', self.transcribe.get_transcription_job, TranscriptionJobName=job_name)
+    
+    def get_transcription(self, job_unique_name):
+        """
+        Read the output of a finished job; summarize only runs once Transcribe
+        reports the job COMPLETED, so the object is already in place.
+
+        Items are streamed from S3 on every pass instead of being loaded, which
+        keeps memory flat however long the recording is.
+        """
+        def open_body():
+            return self.s3.get_object(
+                Bucket=self.meeting_summary_store,
+                Key=f"meetings_summary/{job_unique_name}.json"
+            )['Body']
+
+        transcript = transcript_util.read_transcript(open_body())
+        items = transcript_util.reopenable(lambda: transcript_util.iter_items(open_body()))
+
+        return transcript, items
+        
+    def create_claude_body(self, input_text = "some text", token_count = 150, temp = 0.05, topP = 1, topK = 250, stop_sequence = "Human:"):
+        body = {
+        "prompt": input_text,
+            "max_tokens_to_sample": token_count,
+            "temperature": temp,
+            "top_k": topK,
+            "top_p":topP,
+            "stop_sequences":[stop_sequence]   
+        } 
+        return body
+
+    def create_jurassic_body(self, input_text = "some text", token_count = 150, temp = 0.05, topP = 1, stop_sequence = "Human:"):
+        body = {
+        "prompt": input_text,
+            "maxTokens": token_count,
+            "temperature": temp,
+            "topP":topP,
+            "stopSequences":[stop_sequence]   
+        } 
+        return body
+
+    def create_titan_body(self, input_text = "some text", token_count = 4096, temp = 0.05, topP = 1, stop_sequence = "Human:"):
+        body = {
+        "inputText": input_text,
+            "textGenerationConfig": {
+            "maxTokenCount": token_count,
+            #   "stopSequences": [stop_sequence],
+            "temperature":temp,
+            "topP":topP
+            }
+        } 
+        return body
+
+    def invoke(self, call, model_id, tokens):
+        """
+        Return call() once the rate governor has capacity for a request of
+        tokens, retrying throttled calls up to rate_attempts times, and
+        raises rate_limited when there is no capacity. Without a governor
+        throttles are retried with the other transient errors, by the
+        bedrock policy of resilience_util.
+        """
+        if not self.rate.is_enabled():
+            return resilience_util.call('bedrock', call)
+
+        for attempt in range(self.rate_attempts):
+            waited = self.rate.acquire(model_id, tokens)
+
+            if waited:
+                logger.info(f"waited {waited:.1f}s for {model_id} capacity")
+
+            try:
+                return resilience_util.call('bedrock', call, retry_throttles=False)
+            except self.bedrock.exceptions.ThrottlingException:
+                self.rate.throttled(model_id)
+
+        raise rate_util.rate_limited(
+            f"{model_id} still throttled after {self.rate_attempts} attempts",
+            self.rate.max_wait_seconds
+        )
+
+    def get_model_res(self, body, model_id, usage = None, tokens = 0):
+        """
+        Invoke the model; usage, when given, receives the token counts Bedrock
+        reports, and tokens is what to reserve from the rate governor
+        """
+        resp = self.invoke(
+            lambda: self.bedrock.invoke_model(modelId = model_id, body=json.dumps(body), accept = "*/*", contentType = "application/json"),
+            model_id,
+            tokens
+        )
+        results = json.loads(resp.get("body").read().decode('utf-8'))
+
+        if usage is not None:
+            headers = resp.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+            usage['input_tokens'] = int(headers.get("x-amzn-bedrock-input-token-count", 0))
+            usage['output_tokens'] = int(headers.get("x-amzn-bedrock-output-token-count", 0))
+
+        return results
+
+    def get_model_stream(self, body, model_id, get_text, usage = None, tokens = 0):
+        """
+        Invoke the model and return an iterator over the completion in pieces
+        as it is generated; get_text picks the text out of each decoded chunk
+        """
+        resp = self.invoke(
+            lambda: self.bedrock.invoke_model_with_response_stream(modelId = model_id, body=json.dumps(body), accept = "*/*", contentType = "application/json"),
+            model_id,
+            tokens
+        )
+
+        def pieces():
+            for event in resp.get("body"):
+                chunk = event.get("chunk")
+
+                if chunk:
+                    decoded = json.loads(chunk["bytes"].decode('utf-8'))
+
+                    # The last chunk carries the token counts of the whole invocation
+                    metrics = decoded.get("amazon-bedrock-invocationMetrics")
+
+                    if metrics and usage is not None:
+                        usage['input_tokens'] = metrics.get("inputTokenCount", 0)
+                        usage['output_tokens'] = metrics.get("outputTokenCount", 0)
+
+                    yield get_text(decoded)
+
+        return pieces()
+
+    def get_summary_settings(self):
+        """
+        Return what the summaries depend on besides the transcript, to tell
+        whether stored summaries are still what this configuration would make
+        """
+        return {
+            'templates': self.summary_templates,
+            'model_rules': self.model_rules,
+            'template_version': ai_util.template_version
+        }
+
+    def route(self, estimated_tokens):
+        """
+        Return the first model rule that fits estimated_tokens, or None when
+        the transcript has to be summarized in chunks
+        """
+        for rule in self.model_rules:
+            if estimated_tokens <= int(rule['max_input_tokens']):
+                return {
+                    'model_id': rule.get('model_id', self.model_id),
+                    'output_tokens': int(rule.get('output_tokens', ai_util.default_output_tokens))
+                }
+
+        return None
+
+    def log_usage(self, junique_name, model_id, estimated_tokens, token_count, usage):
+        logger.info(
+            f"{junique_name}: {model_id} read {usage.get('input_tokens')} tokens (estimated {estimated_tokens}) "
+            f"and wrote {usage.get('output_tokens')} of {token_count}"
+        )
+
+        if usage.get('input_tokens'):
+            log_util.put_metrics({
+                'EstimatedInputTokens': estimated_tokens,
+                'InputTokens': usage['input_tokens'],
+                'OutputTokens': usage.get('output_tokens', 0)
+            }, dimensions={'ModelId': model_id})
+
+    def get_model_request(self, prompt, token_count, temp, model_id):
+        """
+        Return the request body for model_id and a function reading the text
+        of a streamed chunk, None for models that can't stream (Jurassic)
+        """
+        if model_id in ai_util.claude_models:
+            body = self.create_claude_body(input_text = prompt, token_count = token_count, temp = temp, topP = 1, stop_sequence="Human:") # 4096
+            return body, lambda chunk: chunk['completion']
+
+        if model_id in ai_util.jurassic_models:
+            body = self.create_jurassic_body(input_text = prompt, token_count = token_count, temp = temp, stop_sequence="Please")
+            return body, None
+
+        body = self.create_titan_body(input_text = prompt, token_count = token_count, temp = temp)
+        return body, lambda chunk: chunk['outputText']
+
+    def get_completion(self, model_id, results):
+        if model_id in ai_util.claude_models:
+            return results['completion']
+
+        if model_id in ai_util.jurassic_models:
+            return results['completions'][0]['data']['text']
+
+        return results['results'][0]['outputText']
+
+    def get_bedrock_response(self, prompt, junique_name, meeting_summary_store, token_count = 150, temp = 0, model_id = "anthropic.claude-v2:1", refresh = False, on_progress = None):
+        """
+        Return the completion for prompt, from the cache when the same request
+        was answered before, and store it under junique_name.
+
+        refresh skips the cache lookup and overwrites the cached completion.
+        When on_progress is given the completion is streamed and on_progress
+        is called with the text so far after every piece.
+        """
+        body, get_piece = self.get_model_request(prompt, token_count, temp, model_id)
+        get_completion = lambda results: self.get_completion(model_id, results)
+
+        cache_key = self.cache.get_key(model_id, body, ai_util.template_version)
+        response = self.cache.lookup(cache_key, refresh = refresh)
+
+        if response is None:
+            usage = {}
+            estimated_tokens = transcript_util.estimate_tokens(prompt)
+
+            # Bedrock counts the full output budget against the quota until the call ends
+            tokens = estimated_tokens + token_count
+
+            if on_progress and get_piece and self.streaming:
+                response = ""
+
+                for piece in self.get_model_stream(body, model_id, get_piece, usage = usage, tokens = tokens):
+                    response += piece
+                    on_progress(response)
+            else:
+                response = get_completion(self.get_model_res(body, model_id, usage = usage, tokens = tokens))
+
+            self.log_usage(junique_name, model_id, estimated_tokens, token_count, usage)
+            self.cache.store(cache_key, model_id, response)
+
+        self.s3.put_object(Bucket=self.meeting_summary_store, Key=junique_name, Body=response)
+
+        return response
+        
+    def summarize_parts(self, make_prompt, parts, key_prefix, token_count, model_id):
+        """
+        Summarize parts concurrently on a bounded pool, keeping each result in
+        S3 under key_prefix for debugging
+        """
+        def summarize(index):
+            return self.get_bedrock_response(
+                make_prompt(parts[index], index, len(parts)),
+                f"{key_prefix}-{index:03d}.txt",
+                self.meeting_summary_store,
+                token_count = token_count,
+                model_id = model_id
+            )
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.summary_concurrency, len(parts)))) as executor:
+            return list(executor.map(summarize, range(len(parts))))
+
+    def map_reduce_summarize(self, transcribed_meeting_content, jname, transcript, model_id):
+        """
+        Condense a transcript too long for one prompt.
+
+        The transcript is cut at sentence and speaker boundaries into
+        overlapping chunks of chunk_tokens, the chunks are summarized in
+        parallel, and the partial summaries are combined in as many rounds as
+        it takes to fit them into one prompt. Returns the partial summaries
+        for the summary templates to work from.
+        """
+        if transcript is not None:
+            units = transcript_util.split_units(transcript)
+        else:
+            units = transcript_util.split_sentences(transcribed_meeting_content)
+
+        chunks = transcript_util.pack_chunks(units, self.chunk_tokens, self.chunk_overlap_tokens)
+        key_prefix = f"{ai_util.summary_parts_prefix}{jname}"
+
+        logger.info(f"{jname}: summarizing {len(chunks)} chunks of up to {self.chunk_tokens} tokens")
+
+        partials = self.summarize_parts(
+            lambda chunk, index, count: f"""\n\nHuman:
+        <meeting transcript part="{index + 1} of {count}">
+        {chunk}
+        </meeting transcript>
+        
+        Please summarize this part of a longer meeting transcript, keeping decisions, action items and who raised them
+        \n\nAssistant:""",
+            chunks,
+            f"{key_prefix}/map",
+            self.chunk_summary_tokens,
+            model_id
+        )
+
+        reduce_round = 0
+
+        while True:
+            groups = transcript_util.pack_chunks(partials, self.chunk_tokens, min_units=2)
+
+            if len(groups) == 1:
+                return groups[0]
+
+            reduce_round += 1
+
+            logger.info(f"{jname}: reduce round {reduce_round} combines {len(partials)} summaries into {len(groups)}")
+
+            partials = self.summarize_parts(
+                lambda group, index, count: f"""\n\nHuman:
+        <partial summaries>
+        {group}
+        </partial summaries>
+        
+        These are summaries of consecutive parts of one meeting. Please combine them into one summary
+        \n\nAssistant:""",
+                groups,
+                f"{key_prefix}/reduce-{reduce_round}",
+                self.chunk_summary_tokens,
+                model_id
+            )
+
+    def get_summary_prompts(self, transcribed_meeting_content, meeting_file, transcript=None):
+        """
+        Return one request per template in summary_templates, as
+        [{'title', 'prompt', 'junique_name', 'token_count', 'model_id'}].
+
+        The model and output budget come from the first model rule that fits
+        the estimated transcript length; transcripts longer than every rule
+        are first condensed by map_reduce_summarize, and routed again on the
+        condensed length. Pass the compact transcript as well so chunks can
+        follow speaker turns.
+        """
+        jname = meeting_file.replace(" ", "_").replace(",","")
+
+        estimated_tokens = transcript_util.estimate_tokens(transcribed_meeting_content)
+        route = self.route(estimated_tokens)
+
+        if route is None:
+            logger.info(f"{jname}: {estimated_tokens} estimated tokens are over every model rule, summarizing in chunks with {self.model_id}")
+
+            partials = self.map_reduce_summarize(transcribed_meeting_content, jname, transcript, self.model_id)
+
+            estimated_tokens = transcript_util.estimate_tokens(partials)
+            route = self.route(estimated_tokens) or {'model_id': self.model_id, 'output_tokens': ai_util.default_output_tokens}
+
+            context = f"""<partial summaries>
+        {partials}
+        </partial summaries>
+        
+        These are summaries of consecutive parts of one meeting transcript."""
+        else:
+            context = f"""<meeting transcript>
+        {transcribed_meeting_content}
+        </meeting transcript>"""
+
+        logger.info(f"{jname}: routed {estimated_tokens} estimated tokens to {route['model_id']} with {route['output_tokens']} output tokens")
+
+        return [
+            {
+                'title': ai_util.prompt_templates[name]['title'],
+                'prompt': f"""\n\nHuman:
+        {context}
+        
+        {ai_util.prompt_templates[name]['instruction']}
+        \n\nAssistant:""",
+                # The general summary keeps the object name it always had
+                'junique_name': f"{jname}_{jname if name == 'summary' else name}.txt",
+                # Template lengths are written for the default budget and scale with the route's
+                'token_count': ai_util.prompt_templates[name]['token_count'] * route['output_tokens'] // ai_util.default_output_tokens,
+                'model_id': route['model_id']
+            }
+            for name in self.summary_templates
+        ]
+
+    def get_batch_requests(self, transcribed_meeting_content, meeting_file, transcript=None):
+        """
+        Return the summary requests as [{'title', 'model_id', 'body'}] for batch_util.queue
+        """
+        return [
+            {
+                'title': request['title'],
+                'model_id': request['model_id'],
+                'body': self.get_model_request(request['prompt'], request['token_count'], 0, request['model_id'])[0]
+            }
+            for request in self.get_summary_prompts(transcribed_meeting_content, meeting_file, transcript)
+        ]
+
+    def meeting_summarize(self, transcribed_meeting_content, meeting_file, transcript=None, on_progress=None):
+        """
+        Summarize the meeting transcript using Amazon Bedrock
+
+        Every request from get_summary_prompts is sent to Bedrock at the same
+        time, and the results are returned as {card title: summary} in
+        template order. on_progress(title, text) receives each summary as it
+        streams in.
+        """
+        def summarize(request):
+            progress = None
+
+            if on_progress:
+                progress = lambda text: on_progress(request['title'], text)
+
+            return self.get_bedrock_response(
+                request['prompt'],
+                request['junique_name'],
+                self.meeting_summary_store,
+                token_count = request['token_count'],
+                model_id = request['model_id'],
+                on_progress = progress
+            )
+
+        requests = self.get_summary_prompts(transcribed_meeting_content, meeting_file, transcript)
+
+        # One call per template, all in flight at once, so N templates take about as long as the slowest
+        with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+            summaries = list(executor.map(summarize, requests))
+
+        meeting_summary = {
+            request['title']: summary
+            for request, summary in zip(requests, summaries)
+        }
+
+        log_util.log_payload(logger, 'summary', "meeting summary", meeting_summary)
+
+        return meeting_summary
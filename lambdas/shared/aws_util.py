@@ -0,0 +1,138 @@
+"""
+AWS clients shared by every module in the layer.
+
+Clients are built on first use and kept at module scope, so warm invocations
+reuse them and their connection pools. boto3 clients are thread safe once
+built but creating them is not, hence the lock. DynamoDB resources are not
+thread safe at all, so each table call borrows a resource from a pool kept
+at module scope; it grows to the number of threads calling at once and
+outlives the thread pools of single invocations. Table calls go through the
+dynamodb retry policy and circuit breaker of resilience_util, which replaces
+botocore's own retries.
+"""
+import math
+import threading
+
+import boto3
+from botocore.config import Config
+
+import resilience_util
+
+clients = {}
+clients_lock = threading.Lock()
+
+tables = {}
+
+# Resources all come from one session, so they raise the same exception classes
+dynamodb_session = None
+dynamodb_pool = []
+
+# For clients whose calls are retried by resilience_util instead
+no_retries = {'mode': 'standard', 'max_attempts': 1}
+
+def get_client(service_name, **config):
+    """
+    Return the shared client for service_name; config, botocore Config
+    options, only applies when this call builds it
+    """
+    client = clients.get(service_name)
+
+    if client is None:
+        with clients_lock:
+            client = clients.get(service_name)
+
+            if client is None:
+                client = clients[service_name] = boto3.client(service_name, config=Config(**config) if config else None)
+
+    return client
+
+def borrow_dynamodb():
+    global dynamodb_session
+
+    with clients_lock:
+        if dynamodb_pool:
+            return dynamodb_pool.pop()
+
+        if dynamodb_session is None:
+            dynamodb_session = boto3.session.Session()
+
+        return dynamodb_session.resource('dynamodb', config=Config(retries=no_retries))
+
+def return_dynamodb(dynamodb):
+    with clients_lock:
+        dynamodb_pool.append(dynamodb)
+
+class pooled_table:
+    """
+    A DynamoDB table whose calls each run on a resource of their own,
+    borrowed from the pool for the length of the call
+    """
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+
+        dynamodb = borrow_dynamodb()
+        self.meta = dynamodb.Table(table_name).meta
+        return_dynamodb(dynamodb)
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            dynamodb = borrow_dynamodb()
+
+            try:
+                return getattr(dynamodb.Table(self.table_name), name)(*args, **kwargs)
+            finally:
+                return_dynamodb(dynamodb)
+
+        return call
+
+def get_table(table_name):
+    table = tables.get(table_name)
+
+    if table is None:
+        table = resilience_util.resilient(pooled_table(table_name), 'dynamodb')
+        tables.setdefault(table_name, table)
+
+    return tables[table_name]
+
+# The longest DelaySeconds SQS accepts
+max_delay_seconds = 900
+
+def get_attribute(record, name):
+    attribute = record.get('messageAttributes', {}).get(name)
+
+    return attribute['stringValue'] if attribute else None
+
+def get_message_id(record):
+    """
+    Return the id of the message a record was first delivered as, kept
+    across delay_message so claims and job names stay the same
+    """
+    return get_attribute(record, 'original_message_id') or record['messageId']
+
+def get_deferrals(record):
+    """
+    Return how many times delay_message has sent a record back
+    """
+    return int(get_attribute(record, 'deferrals') or 0)
+
+def delay_message(record, seconds):
+    """
+    Send the body of a record of a lambda event to its queue again, to be
+    delivered after seconds.
+
+    The copy is a new message, so the wait doesn't use up a receive of the
+    original; the caller lets the original succeed and SQS deletes it.
+    """
+    region, account, queue_name = record['eventSourceARN'].split(':')[3:6]
+
+    get_client('sqs').send_message(
+        QueueUrl=f"https://sqs.{region}.amazonaws.com/{account}/{queue_name}",
+        MessageBody=record['body'],
+        # A delay of 0 would have it back at once, only to be deferred again
+        DelaySeconds=min(max_delay_seconds, max(1, math.ceil(seconds))),
+        MessageAttributes={
+            'original_message_id': {'DataType': 'String', 'StringValue': get_message_id(record)},
+            'deferrals': {'DataType': 'Number', 'StringValue': str(get_deferrals(record) + 1)}
+        }
+    )
@@ -0,0 +1,271 @@
+import datetime
+import json
+import os
+import uuid
+
+class batch_util:
+    """
+    Summaries of low priority jobs through Bedrock batch inference.
+
+    queue() parks a job's model requests under pending/ in S3. submit(),
+    run once per accumulation window, gathers the pending requests of each
+    model into one JSONL input and starts a batch inference job for it,
+    with a manifest mapping the record ids Bedrock echoes back to the job id
+    and card title of each request. get_results() reads a finished batch
+    back as {job id: {card title: completion}}.
+    """
+
+    key_prefix = "batch_inference/"
+
+    # Names of the batch jobs started here, the state change rule matches on it
+    job_name_prefix = "summaries-"
+
+    # Batch job states with output to read, and those that will never have any
+    finished_statuses = {'Completed', 'PartiallyCompleted'}
+    failed_statuses = {'Failed', 'Stopped', 'Expired'}
+
+    def __init__(self, s3, bedrock, bucket, logger, role_arn=None, min_records=None, max_wait_minutes=None):
+        self.s3 = s3
+        self.bedrock = bedrock
+        self.bucket = bucket
+        self.logger = logger
+
+        self.role_arn = role_arn or os.environ.get('BATCH_ROLE_ARN')
+
+        # Bedrock rejects batch jobs with fewer records than its minimum
+        if min_records is None:
+            min_records = int(os.environ.get('BATCH_MIN_RECORDS', 100))
+
+        # Requests waiting longer than this for a full batch are run on demand instead
+        if max_wait_minutes is None:
+            max_wait_minutes = float(os.environ.get('BATCH_MAX_WAIT_MINUTES', 240))
+
+        self.min_records = min_records
+        self.max_wait = datetime.timedelta(minutes=max_wait_minutes)
+
+    def get_uri(self, key):
+        return f"s3://{self.bucket}/{key}"
+
+    def get_key(self, uri):
+        return uri.split('/', 3)[3]
+
+    def queue(self, job_id, requests):
+        """
+        Park requests, [{'title', 'model_id', 'body'}], until the next submit
+        """
+        by_model = {}
+
+        for request in requests:
+            by_model.setdefault(request['model_id'], []).append(request)
+
+        for model_id, model_requests in by_model.items():
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=f"{batch_util.key_prefix}pending/{model_id}/{job_id}.jsonl",
+                Body="\n".join(json.dumps({'title': request['title'], 'body': request['body']}) for request in model_requests).encode('utf-8'),
+                ContentType='application/jsonl'
+            )
+
+        self.logger.info(f"{job_id}: {len(requests)} summary requests queued for batch inference")
+
+    def list_pending(self):
+        """
+        Return {model id: [(key, job id, last modified)]} of the parked requests
+        """
+        pending = {}
+        prefix = f"{batch_util.key_prefix}pending/"
+
+        for page in self.s3.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get('Contents', []):
+                model_id, file_name = item['Key'][len(prefix):].rsplit('/', 1)
+                pending.setdefault(model_id, []).append((item['Key'], file_name[:-len('.jsonl')], item['LastModified']))
+
+        return pending
+
+    def submit(self, now=None):
+        """
+        Start one batch inference job per model with pending requests.
+
+        Returns the ids of jobs whose requests waited max_wait without
+        filling a batch; their requests are dropped and they should be
+        summarized on demand.
+        """
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        overdue = []
+
+        for model_id, objects in self.list_pending().items():
+            records = []
+            manifest = {}
+
+            for key, job_id, last_modified in objects:
+                lines = self.s3.get_object(Bucket=self.bucket, Key=key)['Body'].read().decode('utf-8').splitlines()
+
+                for line in lines:
+                    request = json.loads(line)
+
+                    # Bedrock wants record ids of 11 alphanumeric characters
+                    record_id = f"R{len(records):010d}"
+                    manifest[record_id] = {'job_id': job_id, 'title': request['title']}
+                    records.append({'recordId': record_id, 'modelInput': request['body']})
+
+            oldest = min(last_modified for key, job_id, last_modified in objects)
+
+            if len(records) < self.min_records:
+                if now - oldest < self.max_wait:
+                    self.logger.info(f"{model_id}: holding {len(records)} records until there are {self.min_records}")
+                    continue
+
+                overdue += [job_id for key, job_id, last_modified in objects]
+            else:
+                self.start_job(model_id, records, manifest)
+
+            for key, job_id, last_modified in objects:
+                self.s3.delete_object(Bucket=self.bucket, Key=key)
+
+        return overdue
+
+    def start_job(self, model_id, records, manifest):
+        job_name = f"{batch_util.job_name_prefix}{datetime.datetime.now(datetime.timezone.utc):%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        input_key = f"{batch_util.key_prefix}input/{job_name}.jsonl"
+
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=input_key,
+            Body="\n".join(json.dumps(record) for record in records).encode('utf-8'),
+            ContentType='application/jsonl'
+        )
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=f"{batch_util.key_prefix}input/{job_name}.manifest.json",
+            Body=json.dumps(manifest).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+        response = self.bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self.role_arn,
+            modelId=model_id,
+            inputDataConfig={'s3InputDataConfig': {'s3Uri': self.get_uri(input_key)}},
+            outputDataConfig={'s3OutputDataConfig': {'s3Uri': self.get_uri(f"{batch_util.key_prefix}output/")}}
+        )
+
+        self.logger.info(f"batch inference job {job_name} started with {len(records)} {model_id} records")
+
+        return response['jobArn']
+
+    def get_results(self, job_arn, get_completion):
+        """
+        Return (status, {job id: {title: completion}}, failed job ids) of a
+        batch job; get_completion(model_id, output) reads one model output.
+        Jobs with a failed record are reported failed as a whole. A batch
+        job without a manifest wasn't started here and has no results.
+        """
+        job = self.bedrock.get_model_invocation_job(jobIdentifier=job_arn)
+        input_key = self.get_key(job['inputDataConfig']['s3InputDataConfig']['s3Uri'])
+
+        try:
+            manifest = json.loads(self.s3.get_object(
+                Bucket=self.bucket,
+                Key=input_key.replace('.jsonl', '.manifest.json')
+            )['Body'].read())
+        except self.s3.exceptions.NoSuchKey:
+            self.logger.warning(f"batch inference job {job_arn} has no manifest, skipping it")
+            return job['status'], {}, []
+
+        job_ids = {entry['job_id'] for entry in manifest.values()}
+
+        if job['status'] not in batch_util.finished_statuses:
+            return job['status'], {}, sorted(job_ids)
+
+        # Output lands in <output uri><job id>/<input file name>.out
+        output_key = (
+            f"{self.get_key(job['outputDataConfig']['s3OutputDataConfig']['s3Uri'])}"
+            f"{job_arn.rsplit('/', 1)[-1]}/{input_key.rsplit('/', 1)[-1]}.out"
+        )
+
+        body = self.s3.get_object(Bucket=self.bucket, Key=output_key)['Body']
+        results = {}
+        failed = set()
+
+        for line in body.iter_lines():
+            if not line:
+                continue
+
+            record = json.loads(line)
+            entry = manifest[record['recordId']]
+
+            if 'modelOutput' not in record:
+                self.logger.warning(f"batch record {record['recordId']} of {entry['job_id']} failed: {record.get('error')}")
+                failed.add(entry['job_id'])
+                continue
+
+            results.setdefault(entry['job_id'], {})[entry['title']] = get_completion(job['modelId'], record['modelOutput'])
+
+        # Jobs missing from the output failed too
+        failed |= job_ids - set(results)
+
+        for job_id in failed:
+            results.pop(job_id, None)
+
+        return job['status'], results, sorted(failed)
+
+class local_batch_backend:
+    """
+    Stand-in for the Bedrock batch inference API, for running offline.
+
+    Jobs move from Submitted through InProgress to Completed, one step per
+    get_model_invocation_job call, and on completion every record's output
+    is written where Bedrock would put it, from invoke(model_id, body).
+    """
+
+    def __init__(self, s3, invoke, account="123456789012"):
+        self.s3 = s3
+        self.invoke = invoke
+        self.account = account
+        self.jobs = {}
+
+    def create_model_invocation_job(self, jobName, roleArn, modelId, inputDataConfig, outputDataConfig):
+        job_arn = f"arn:aws:bedrock:us-east-1:{self.account}:model-invocation-job/{uuid.uuid4().hex[:12]}"
+
+        self.jobs[job_arn] = {
+            'jobArn': job_arn,
+            'jobName': jobName,
+            'roleArn': roleArn,
+            'modelId': modelId,
+            'status': 'Submitted',
+            'inputDataConfig': inputDataConfig,
+            'outputDataConfig': outputDataConfig
+        }
+
+        return {'jobArn': job_arn}
+
+    def get_model_invocation_job(self, jobIdentifier):
+        job = self.jobs[jobIdentifier]
+
+        if job['status'] == 'Submitted':
+            job['status'] = 'InProgress'
+        elif job['status'] == 'InProgress':
+            self.run(job)
+            job['status'] = 'Completed'
+
+        return dict(job)
+
+    def run(self, job):
+        input_uri = job['inputDataConfig']['s3InputDataConfig']['s3Uri']
+        bucket, input_key = input_uri[len('s3://'):].split('/', 1)
+        output_prefix = job['outputDataConfig']['s3OutputDataConfig']['s3Uri'].split('/', 3)[3]
+
+        lines = self.s3.get_object(Bucket=bucket, Key=input_key)['Body'].read().decode('utf-8').splitlines()
+        outputs = []
+
+        for line in lines:
+            record = json.loads(line)
+            record['modelOutput'] = self.invoke(job['modelId'], record['modelInput'])
+            outputs.append(json.dumps(record))
+
+        self.s3.put_object(
+            Bucket=bucket,
+            Key=f"{output_prefix}{job['jobArn'].rsplit('/', 1)[-1]}/{input_key.rsplit('/', 1)[-1]}.out",
+            Body="\n".join(outputs).encode('utf-8'),
+            ContentType='application/jsonl'
+        )
@@ -0,0 +1,764 @@
+import os
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from box_sdk_gen.client import BoxClient
+from box_sdk_gen.developer_token_auth import BoxDeveloperTokenAuth
+from box_sdk_gen.schemas import (
+    StatusSkillCard, 
+    StatusSkillCardTypeField, 
+    StatusSkillCardSkillCardTypeField, 
+    StatusSkillCardSkillCardTitleField, 
+    StatusSkillCardSkillTypeField, 
+    StatusSkillCardStatusCodeField, 
+    StatusSkillCardStatusField, 
+    StatusSkillCardSkillField, 
+    StatusSkillCardInvocationTypeField, 
+    StatusSkillCardInvocationField,
+    TranscriptSkillCardTypeField, 
+    TranscriptSkillCardSkillCardTypeField, 
+    TranscriptSkillCardSkillCardTitleField, 
+    TranscriptSkillCardSkillTypeField, 
+    TranscriptSkillCardSkillField, 
+    TranscriptSkillCardInvocationTypeField, 
+    TranscriptSkillCardInvocationField, 
+    TranscriptSkillCardEntriesField, 
+    TranscriptSkillCardEntriesAppearsField,
+    TranscriptSkillCard
+)
+from box_sdk_gen.managers.skills import (
+    UpdateAllSkillCardsOnFileStatus, 
+    UpdateAllSkillCardsOnFileMetadata, 
+    UpdateAllSkillCardsOnFileFileTypeField, 
+    UpdateAllSkillCardsOnFileFile
+)
+from box_sdk_gen.utils import ByteStream, read_byte_stream
+
+import log_util
+import resilience_util
+import transcript_util
+
+class chunk_reader:
+    """
+    File-like wrapper that serves read() calls from an iterator of byte chunks
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+
+            if chunk is None:
+                break
+
+            self.buffer = self.buffer + chunk if self.buffer else chunk
+
+        if size < 0:
+            size = len(self.buffer)
+
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+
+        return data
+
+    def close(self):
+        close = getattr(self.chunks, 'close', None)
+
+        if close:
+            close()
+
+class hashing_reader:
+    """
+    File-like wrapper that feeds everything read from a stream into a hashlib digest
+    """
+
+    def __init__(self, stream, digest):
+        self.stream = stream
+        self.digest = digest
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.digest.update(data)
+
+        return data
+
+    def close(self):
+        close = getattr(self.stream, 'close', None)
+
+        if close:
+            close()
+
+class progress_card:
+    """
+    Shows partial summaries on the file's status card while they stream in.
+
+    update() can be called from every thread summarizing the file and for
+    every token; the card is rewritten at most once per interval seconds,
+    with the latest text of each summary, and a failed update is only logged.
+    """
+
+    def __init__(self, box, file_id, skill_id, invocation_id, title="Bedrock Skill", interval=None, max_length=None):
+        self.box = box
+        self.file_id = file_id
+        self.skill_id = skill_id
+        self.invocation_id = invocation_id
+        self.title = title
+
+        if interval is None:
+            interval = float(os.environ.get('STATUS_UPDATE_SECONDS', 3))
+
+        if max_length is None:
+            max_length = int(os.environ.get('STATUS_PREVIEW_LENGTH', 1000))
+
+        self.interval = interval
+        self.max_length = max_length
+
+        self.partials = {}
+        self.last_sent = None
+        self.lock = threading.Lock()
+
+    def get_status(self):
+        with self.lock:
+            partials = dict(self.partials)
+
+        if len(partials) == 1:
+            status = next(iter(partials.values()))
+        else:
+            status = "\n\n".join(f"{title}: {text}" for title, text in partials.items())
+
+        status = status.strip()
+
+        if len(status) > self.max_length:
+            status = status[:self.max_length].rstrip()
+
+        return f"{status}..."
+
+    def update(self, title, text):
+        with self.lock:
+            self.partials[title] = text
+
+            now = time.monotonic()
+
+            if self.last_sent is not None and now - self.last_sent < self.interval:
+                return
+
+            # Claimed under the lock, so only one thread sends per interval
+            self.last_sent = now
+
+        try:
+            self.box.send_processing_card(self.file_id, self.skill_id, self.title, self.get_status(), self.invocation_id)
+        except Exception as e:
+            self.box.logger.warning(f"could not update the status card of file {self.file_id}: {e}")
+
+class box_util:
+
+    skills_error_enum = {
+        "FILE_PROCESSING_ERROR": 'skills_file_processing_error',
+        "INVALID_FILE_SIZE": 'skills_invalid_file_size_error',
+        "INVALID_FILE_FORMAT": 'skills_invalid_file_format_error',
+        "INVALID_EVENT": 'skills_invalid_event_error',
+        "NO_INFO_FOUND": 'skills_no_info_found',
+        "INVOCATIONS_ERROR": 'skills_invocations_error',
+        "EXTERNAL_AUTH_ERROR": 'skills_external_auth_error',
+        "BILLING_ERROR": 'skills_billing_error',
+        "UNKNOWN": 'skills_unknown_error'
+    }
+
+    box_video_formats = set([
+        '.3g2',
+        '.3gp',
+        '.avi',
+        '.flv',
+        '.m2v',
+        '.m2ts',
+        '.m4v',
+        '.mkv',
+        '.mov',
+        '.mp4',
+        '.mpeg',
+        '.mpg',
+        '.ogg',
+        '.mts',
+        '.qt',
+        '.ts',
+        '.wmv'
+    ])
+
+    box_audio_formats = set([
+        '.3g2',
+        '.aac',
+        '.aif',
+        '.aifc',
+        '.aiff',
+        '.amr',
+        '.au',
+        '.flac',
+        '.m4a',
+        '.mp3',
+        '.ogg',
+        '.ra',
+        '.wav',
+        '.wma'
+    ])
+
+    # Box rejects webhook deliveries older than this, see is_launch_safe
+    max_delivery_age = datetime.timedelta(minutes=10)
+
+    def __init__(self, read_token, write_token, logger):
+        self.logger = logger
+
+        self.read_token = read_token
+        self.write_token = write_token
+        self.api_base_url = os.environ.get('BOX_API_BASE_URL', 'https://api.box.com/2.0')
+        self.download_chunk_size = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+        self.download_concurrency = int(os.environ.get('DOWNLOAD_CONCURRENCY', 4))
+        self.parallel_download_threshold = int(os.environ.get('PARALLEL_DOWNLOAD_THRESHOLD', 64 * 1024 * 1024))
+
+        # How transcript card entries are cut, see get_transcript_policy
+        self.transcript_policy = {
+            'policy': os.environ.get('TRANSCRIPT_POLICY', 'window'),
+            'window_seconds': float(os.environ.get('TRANSCRIPT_WINDOW_SECONDS', 1)),
+            'max_entries': int(os.environ.get('TRANSCRIPT_MAX_ENTRIES', 0)),
+        }
+        self.skill_transcript_policies = json.loads(os.environ.get('TRANSCRIPT_POLICIES') or '{}')
+
+        self.client_id = os.environ.get('BOX_CLIENT_ID', None)
+        self.primary_key = os.environ.get('BOX_KEY_1', None)
+        self.secondary_key = os.environ.get('BOX_KEY_2', None)
+
+        # Clients are built on first use, most handlers need only one of them
+        self._read_client = None
+        self._write_client = None
+        self._old_client = None
+
+    @property
+    def read_client(self):
+        if self._read_client is None:
+            self._read_client = self.get_basic_client(self.read_token)
+
+        return self._read_client
+
+    @read_client.setter
+    def read_client(self, client):
+        self._read_client = client
+
+    @property
+    def write_client(self):
+        if self._write_client is None:
+            self._write_client = self.get_basic_client(self.write_token)
+
+        return self._write_client
+
+    @property
+    def skills(self):
+        # Card writes go through the box retry policy and circuit breaker
+        return resilience_util.resilient(self.write_client.skills, 'box')
+
+    @property
+    def old_client(self):
+        if self._old_client is None:
+            self._old_client = self.get_old_client(self.read_token)
+
+        return self._old_client
+        
+    def get_basic_client(self,token):
+
+        auth = BoxDeveloperTokenAuth(token=token)
+
+        return BoxClient(auth)
+    
+    def get_old_client(self,token):
+        # The legacy SDK is only needed by the JWT helpers below, so it is imported on demand
+        from boxsdk import OAuth2, Client
+
+        auth = OAuth2(
+            client_id=self.client_id, 
+            client_secret=self.primary_key,
+            access_token=token
+        )
+
+        return Client(auth)
+
+    def get_signature(self, body, headers, signature_key):
+        if not signature_key:
+            return None
+
+        if headers.get('box-signature-version') != '1' or headers.get('box-signature-algorithm') != 'HmacSHA256':
+            return None
+
+        signature = hmac.new(signature_key.encode('utf-8'), digestmod=hashlib.sha256)
+        signature.update(body + headers['box-delivery-timestamp'].encode('utf-8'))
+
+        return base64.b64encode(signature.digest()).decode()
+
+    def is_launch_safe(self, body, headers):
+        """
+        Check the webhook signature Box sends with every skill invocation.
+
+        Same rules as boxsdk's Webhook.validate_message: the delivery must be at
+        most ten minutes old and signed with the primary or secondary key.
+        """
+        headers = {key.lower(): value for key, value in headers.items()}
+
+        try:
+            delivered = datetime.datetime.fromisoformat(headers['box-delivery-timestamp'])
+        except (KeyError, ValueError):
+            return False
+
+        if delivered.tzinfo is None:
+            delivered = delivered.replace(tzinfo=datetime.timezone.utc)
+
+        if datetime.datetime.now(datetime.timezone.utc) - delivered > box_util.max_delivery_age:
+            return False
+
+        for signature_key, header in ((self.primary_key, 'box-signature-primary'), (self.secondary_key, 'box-signature-secondary')):
+            signature = self.get_signature(body, headers, signature_key)
+
+            if signature and hmac.compare_digest(signature, headers.get(header, '')):
+                return True
+
+        return False
+    
+    def is_video(self, file_type):
+        return file_type in box_util.box_video_formats
+    
+    def is_audio(self, file_type):
+        return file_type in box_util.box_audio_formats
+    
+    def get_file_contents(self,file_id):
+
+        downloaded_file_content: ByteStream = self.read_client.downloads.download_file(
+            file_id=file_id
+        )
+
+        self.logger.debug(f"downloaded file content = {downloaded_file_content}")
+
+        file_content = read_byte_stream(downloaded_file_content)
+
+        return file_content
+
+    def get_file_hash(self, file_id):
+        """
+        Return the SHA-1 Box reports for the file and the id of its current version
+        """
+        file = self.read_client.files.get_file_by_id(file_id=file_id, fields=['sha1', 'file_version'])
+
+        file_version_id = file.file_version.id if file.file_version else None
+
+        return file.sha1, file_version_id
+
+    def get_file_stream(self, file_id, offset=0):
+
+        byte_range = f"bytes={offset}-" if offset else None
+
+        file_content_stream: ByteStream = self.read_client.downloads.download_file(
+            file_id=file_id,
+            range=byte_range
+        )
+
+        return file_content_stream
+
+    def get_download_url(self, file_id, session):
+        """
+        Resolve the pre-authorized download location Box redirects file content requests to
+        """
+        response = session.get(
+            f"{self.api_base_url}/files/{file_id}/content",
+            headers={'Authorization': f"Bearer {self.read_token}"},
+            allow_redirects=False
+        )
+        response.raise_for_status()
+
+        return requests.compat.urljoin(response.url, response.headers.get('Location', response.url))
+
+    def get_file_url(self, file_id):
+
+        with requests.Session() as session:
+            return self.get_download_url(file_id, session)
+
+    def get_file_ranges(self, file_id, file_size, offset=0, chunk_size=None, max_workers=None):
+        """
+        Download a file as byte ranges on a bounded thread pool and yield the chunks in order.
+
+        At most max_workers ranges are in flight at once, so memory stays around
+        max_workers * chunk_size. Falls back to a single stream when the server
+        answers a ranged request with the whole file.
+        """
+        chunk_size = chunk_size or self.download_chunk_size
+        max_workers = max_workers or self.download_concurrency
+
+        if offset >= file_size:
+            return
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        try:
+            url = self.get_download_url(file_id, session)
+
+            first = session.get(
+                url,
+                headers={'Range': f"bytes={offset}-{min(offset + chunk_size, file_size) - 1}"},
+                stream=True
+            )
+            first.raise_for_status()
+
+            if first.status_code != 206:
+                self.logger.info(f"range requests not honored for file {file_id}, downloading as one stream")
+                yield from self.iter_response(first, chunk_size, skip=offset)
+                return
+
+            yield first.content
+
+            def fetch(start):
+                end = min(start + chunk_size, file_size) - 1
+                response = session.get(url, headers={'Range': f"bytes={start}-{end}"})
+                response.raise_for_status()
+
+                if response.status_code != 206:
+                    raise IOError(f"range {start}-{end} of file {file_id} was not honored")
+
+                return response.content
+
+            starts = iter(range(offset + chunk_size, file_size, chunk_size))
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pending = deque()
+
+                for start in starts:
+                    pending.append(executor.submit(fetch, start))
+
+                    if len(pending) >= max_workers:
+                        break
+
+                while pending:
+                    chunk = pending.popleft().result()
+
+                    start = next(starts, None)
+
+                    if start is not None:
+                        pending.append(executor.submit(fetch, start))
+
+                    yield chunk
+        finally:
+            session.close()
+
+    def iter_response(self, response, chunk_size, skip=0):
+
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if skip:
+                dropped = min(skip, len(chunk))
+                chunk = chunk[dropped:]
+                skip -= dropped
+
+            if chunk:
+                yield chunk
+
+    def get_file_reader(self, file_id, file_size, offset=0):
+        """
+        Return a readable stream of the file from offset, fetched in parallel ranges for large files
+        """
+        if int(file_size) - offset < self.parallel_download_threshold:
+            return self.get_file_stream(file_id, offset)
+
+        return chunk_reader(self.get_file_ranges(file_id, int(file_size), offset))
+
+    def send_processing_card(self, file_id, skill_id, title, status, invocation_id):
+        title_code = f"skill_{title.lower().replace(' ', '_')}"
+
+        return self.skills.update_all_skill_cards_on_file(
+            skill_id=skill_id,
+            status=UpdateAllSkillCardsOnFileStatus.PROCESSING.value,
+            file=UpdateAllSkillCardsOnFileFile(
+                id=file_id,
+                type=UpdateAllSkillCardsOnFileFileTypeField.FILE.value
+            ), 
+            metadata=UpdateAllSkillCardsOnFileMetadata(cards=[
+                StatusSkillCard(
+                    type=StatusSkillCardTypeField.SKILL_CARD.value, 
+                    skill_card_type=StatusSkillCardSkillCardTypeField.STATUS.value, 
+                    skill_card_title=StatusSkillCardSkillCardTitleField(
+                        code=title_code, 
+                        message=title
+                    ), 
+                    skill=StatusSkillCardSkillField(
+                        id=skill_id, 
+                        type=StatusSkillCardSkillTypeField.SERVICE.value
+                    ), 
+                    invocation=StatusSkillCardInvocationField(
+                        id=invocation_id, 
+                        type=StatusSkillCardInvocationTypeField.SKILL_INVOCATION.value
+                    ), 
+                    status=StatusSkillCardStatusField(
+                        code=StatusSkillCardStatusCodeField.PROCESSING.value,
+                        message=status
+                    )
+                )
+            ])
+        )
+        
+
+    def send_error_card(self, file_id, skill_id, title, status, invocation_id):
+        
+        title_code = f"skill_{title.lower().replace(' ', '_')}"
+        
+        return self.skills.update_all_skill_cards_on_file(
+            skill_id=skill_id,
+            status=UpdateAllSkillCardsOnFileStatus.PROCESSING.value,
+            file=UpdateAllSkillCardsOnFileFile(
+                id=file_id,
+                type=UpdateAllSkillCardsOnFileFileTypeField.FILE.value
+            ), 
+            metadata=UpdateAllSkillCardsOnFileMetadata(cards=[
+                StatusSkillCard(
+                    type=StatusSkillCardTypeField.SKILL_CARD.value, 
+                    skill_card_type=StatusSkillCardSkillCardTypeField.STATUS.value, 
+                    skill_card_title=StatusSkillCardSkillCardTitleField(
+                        code=title_code, 
+                        message=title
+                    ), 
+                    skill=StatusSkillCardSkillField(
+                        id=skill_id, 
+                        type=StatusSkillCardSkillTypeField.SERVICE.value
+                    ), 
+                    invocation=StatusSkillCardInvocationField(
+                        id=invocation_id, 
+                        type=StatusSkillCardInvocationTypeField.SKILL_INVOCATION.value
+                    ), 
+                    status=StatusSkillCardStatusField(
+                        code=StatusSkillCardStatusCodeField.TRANSIENT_FAILURE.value,
+                        message=status
+                    )
+                )
+            ])
+        )
+
+    def get_transcript_policy(self, skill_id=None):
+        """
+        Entry policy for a skill: the TRANSCRIPT_* defaults with any keys that
+        TRANSCRIPT_POLICIES, a JSON object keyed on skill id, sets for it
+        """
+        policy = dict(self.transcript_policy)
+        policy.update(self.skill_transcript_policies.get(str(skill_id), {}))
+
+        return policy
+
+    def create_transcript_entries(self, entries, skill_id=None):
+        """
+        Card entries cut by the skill's transcript policy; entries is a
+        compact_transcript or any iterable of Transcribe items
+        """
+        policy = self.get_transcript_policy(skill_id)
+
+        grouped = transcript_util.group_entries(
+            entries,
+            window_seconds=float(policy['window_seconds']),
+            policy=policy['policy'],
+            max_entries=int(policy['max_entries'])
+        )
+
+        self.logger.debug(f"{len(grouped)} transcript entries with {policy}")
+
+        return [
+            TranscriptSkillCardEntriesField(
+                text=text,
+                appears=[ TranscriptSkillCardEntriesAppearsField(second) ]
+            )
+            for second, text in grouped
+        ]
+
+    def get_summary_card_code(self, title):
+        # The general summary keeps the code its card always had
+        if title == "Summary":
+            return "summary-card"
+
+        return f"summary-card-{title.lower().replace(' ', '-')}"
+
+    def update_skills_on_file(self, file_id, skill_id, entries, summaries, invocation_id):
+        """
+        Publish one card per summary and the transcript card in a single call.
+
+        summaries maps card titles to text; a plain string is published as
+        the "Summary" card, as stored by earlier versions.
+        """
+        if isinstance(summaries, str):
+            summaries = {"Summary": summaries}
+
+        summary_cards = [
+            TranscriptSkillCard(
+                type=TranscriptSkillCardTypeField.SKILL_CARD.value, 
+                skill_card_type=TranscriptSkillCardSkillCardTypeField.TRANSCRIPT.value, 
+                skill_card_title=TranscriptSkillCardSkillCardTitleField(
+                    code=self.get_summary_card_code(title), 
+                    message=title
+                ), 
+                skill=TranscriptSkillCardSkillField(
+                    id=skill_id, 
+                    type=TranscriptSkillCardSkillTypeField.SERVICE.value
+                ), 
+                invocation=TranscriptSkillCardInvocationField(
+                    id=invocation_id, 
+                    type=TranscriptSkillCardInvocationTypeField.SKILL_INVOCATION.value
+                ), 
+                entries=[
+                    TranscriptSkillCardEntriesField(
+                        text=str(summary)
+                    )
+                ]
+            )
+            for title, summary in summaries.items()
+        ]
+        
+        log_util.log_payload(self.logger, 'card', "summary cards", summary_cards)
+
+        skill_entries = self.create_transcript_entries(entries, skill_id)
+        
+        transcript_card = TranscriptSkillCard(
+                    type=TranscriptSkillCardTypeField.SKILL_CARD.value, 
+                    skill_card_type=TranscriptSkillCardSkillCardTypeField.TRANSCRIPT.value, 
+                    skill_card_title=TranscriptSkillCardSkillCardTitleField(
+                        code="transcript_card", 
+                        message="Transcript"
+                    ), 
+                    skill=TranscriptSkillCardSkillField(
+                        id=skill_id, 
+                        type=TranscriptSkillCardSkillTypeField.SERVICE.value
+                    ), 
+                    invocation=TranscriptSkillCardInvocationField(
+                        id=invocation_id, 
+                        type=TranscriptSkillCardInvocationTypeField.SKILL_INVOCATION.value
+                    ), 
+                    entries=skill_entries
+                )
+        
+        log_util.log_payload(self.logger, 'card', "transcript card", transcript_card)
+
+        return self.skills.create_box_skill_cards_on_file(
+            file_id=file_id, 
+            cards=[
+                *summary_cards,
+                transcript_card
+            ]
+        )
+
+        
+    def send_transcript_card(self, file_id, skill_id, title, transcript, invocation_id):
+        title_code = f"skill_{title.lower().replace(' ', '_')}"
+
+        return self.skills.create_box_skill_cards_on_file(
+            file_id=file_id, 
+            cards=[
+                TranscriptSkillCard(
+                    type=TranscriptSkillCardTypeField.SKILL_CARD.value, 
+                    skill_card_type=TranscriptSkillCardSkillCardTypeField.TRANSCRIPT.value, 
+                    skill_card_title=TranscriptSkillCardSkillCardTitleField(
+                        code=title_code, 
+                        message=title
+                    ), 
+                    skill=TranscriptSkillCardSkillField(
+                        id=skill_id, 
+                        type=TranscriptSkillCardSkillTypeField.SERVICE.value
+                    ), 
+                    invocation=TranscriptSkillCardInvocationField(
+                        id=invocation_id, 
+                        type=TranscriptSkillCardInvocationTypeField.SKILL_INVOCATION.value
+                    ), 
+                    entries=TranscriptSkillCardEntriesField(
+                        text=transcript
+                    )
+                )
+            ]
+        )
+        
+
+    def delete_status_card(self, file_id):
+        return self.skills.delete_box_skill_cards_from_file(file_id=file_id)
+
+    def jwt_auth(self):
+        from boxsdk import Client, JWTAuth
+
+        try:
+            auth = JWTAuth(
+                client_id=os.environ['BOX_CLIENT_ID'],
+                client_secret=os.environ['BOX_CLIENT_SECRET'],
+                enterprise_id=os.environ['BOX_CLIENT_EID'],
+                jwt_key_id=os.environ['BOX_JWT_KEY'],
+                rsa_private_key_file_sys_path=os.environ['BOX_PRIVATE_KEY'],
+                rsa_private_key_passphrase=os.environ['BOX_PRIVATE_KEY_PASSPHRASE'],
+            )
+
+            self.access_token = auth.authenticate_instance()
+
+            self.logger.debug("instantiate client")
+            self.client = Client(auth)
+        except Exception as e:
+            self.logger.exception(f"Unable to instantiate Box SDK")
+
+    def getUserToken(self,user_id):
+        from boxsdk import Client, JWTAuth
+
+        try:
+            user = self.client.user(user_id)
+
+            user_auth = JWTAuth(
+                client_id=os.environ['BOX_CLIENT_ID'],
+                client_secret=os.environ['BOX_CLIENT_SECRET'],
+                enterprise_id=os.environ['BOX_CLIENT_EID'],
+                jwt_key_id=os.environ['BOX_JWT_KEY'],
+                rsa_private_key_file_sys_path=os.environ['BOX_PRIVATE_KEY'],
+                rsa_private_key_passphrase=os.environ['BOX_PRIVATE_KEY_PASSPHRASE'],
+                user=user
+            )
+
+            user_auth.authenticate_user()
+
+            self.client = Client(user_auth)
+        except Exception as e:
+            self.logger.exception(f"Unable to authenticate user {user_id}")
+
+    def get_preview_token(self, file_id):
+        self.logger.debug(f"file_id {file_id}")
+
+        target_file = self.client.file(file_id=file_id)
+        self.logger.debug(f"target_file {target_file}")
+        
+        scopes = [
+            'base_explorer', 'item_preview', 'item_download', 'item_rename', 'item_share', 'item_delete',
+            'base_picker', 'item_upload', 'base_preview', 'annotation_edit', 'annotation_view_all', 
+            'annotation_view_self', 'base_sidebar', 'item_comment', 'base_upload'
+        ]
+        
+        token_info = self.client.downscope_token(scopes, target_file)
+        self.logger.debug("Got downscoped access token")
+
+        return token_info.access_token
+
+    def get_picker_token(self, folder_id):
+        self.logger.debug(f"folder_id {folder_id}")
+
+        target_folder = self.client.folder(folder_id=folder_id)
+        self.logger.debug(f"target_folder {target_folder}")
+
+        scopes = [
+            'base_explorer', 'item_preview', 'item_download', 'item_rename', 'item_share', 'item_delete',
+            'base_picker', 'item_upload', 'base_preview', 'annotation_edit', 'annotation_view_all', 
+            'annotation_view_self', 'base_sidebar', 'item_comment', 'base_upload'
+        ]
+
+        token_info = self.client.downscope_token(scopes, target_folder)
+        self.logger.debug("Got downscoped access token")
+
+        return token_info.access_token
\ No newline at end of file
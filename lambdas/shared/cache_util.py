@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import log_util
+
+# When this container last swept the cache, so warm invocations sweep at most once per interval
+last_sweep = 0
+sweep_lock = threading.Lock()
+
+class cache_util:
+    """
+    Cache of Bedrock completions in S3, keyed on the request.
+
+    The key is a SHA-256 of the model id, the request body with its keys
+    sorted and the prompt template version, so a redelivered event or a re-run
+    of the same file reuses the completion instead of invoking the model
+    again, while a changed prompt or parameter misses. Entries expire after
+    ttl_days: reads check the expiry stored in the object metadata and a
+    bucket lifecycle rule removes them. Completions larger than max_entry_bytes
+    are not cached.
+
+    The whole cache is kept under max_bytes by evicting the least recently
+    used entries. A hit on an entry written over touch_seconds ago copies it
+    onto itself, so LastModified follows use without a write per hit, and
+    after a store each container sweeps at most once per sweep_minutes.
+    """
+
+    # How stale LastModified may get before a hit refreshes it
+    touch_seconds = 24 * 60 * 60
+
+    # Keys per delete_objects request
+    delete_batch = 1000
+
+    key_prefix = "bedrock_cache/"
+
+    def __init__(self, s3, bucket, logger, ttl_days=None, max_entry_bytes=None, bypass=None, max_bytes=None, sweep_minutes=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.logger = logger
+
+        if ttl_days is None:
+            ttl_days = float(os.environ.get('BEDROCK_CACHE_TTL_DAYS', 7))
+
+        if max_entry_bytes is None:
+            max_entry_bytes = int(os.environ.get('BEDROCK_CACHE_MAX_ENTRY_BYTES', 256 * 1024))
+
+        # Bypassing still writes fresh completions, so it doubles as a forced refresh
+        if bypass is None:
+            bypass = os.environ.get('BEDROCK_CACHE_BYPASS', 'false').lower() == 'true'
+
+        # 0 leaves the size of the cache to the lifecycle rule alone
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('BEDROCK_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+
+        if sweep_minutes is None:
+            sweep_minutes = float(os.environ.get('BEDROCK_CACHE_SWEEP_MINUTES', 60))
+
+        self.ttl_seconds = int(float(ttl_days) * 24 * 60 * 60)
+        self.max_entry_bytes = max_entry_bytes
+        self.bypass = bypass
+        self.max_bytes = max_bytes
+        self.sweep_seconds = sweep_minutes * 60
+
+        self.hits = 0
+        self.misses = 0
+        self.counter_lock = threading.Lock()
+
+    def is_enabled(self):
+        return self.ttl_seconds > 0
+
+    def get_key(self, model_id, body, template_version):
+        request = json.dumps(
+            {'model_id': model_id, 'body': body, 'template_version': template_version},
+            sort_keys=True,
+            separators=(',', ':')
+        )
+
+        return f"{cache_util.key_prefix}{hashlib.sha256(request.encode('utf-8')).hexdigest()}.txt"
+
+    def count(self, hit):
+        with self.counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        log_util.put_metrics({'BedrockCacheHit': int(hit), 'BedrockCacheMiss': int(not hit)})
+
+    def lookup(self, key, refresh=False):
+        """
+        Return the cached completion stored under key, or None on a miss
+        """
+        if not self.is_enabled() or self.bypass or refresh:
+            return None
+
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=key)
+        except self.s3.exceptions.NoSuchKey:
+            self.logger.debug(f"bedrock cache miss for {key}")
+            self.count(False)
+            return None
+
+        # The lifecycle rule works in whole days, so check the expiry ourselves
+        if int(response['Metadata'].get('expires-at', 0)) <= time.time():
+            self.logger.debug(f"bedrock cache entry {key} expired")
+            response['Body'].close()
+            self.count(False)
+            return None
+
+        self.logger.info(f"bedrock cache hit for {key}")
+        self.count(True)
+
+        completion = response['Body'].read().decode('utf-8')
+
+        last_modified = response.get('LastModified')
+
+        if last_modified and time.time() - last_modified.timestamp() > cache_util.touch_seconds:
+            self.touch(key, response['Metadata'])
+
+        return completion
+
+    def touch(self, key, metadata):
+        """
+        Mark key as recently used; keeps its expiry, only eviction looks at it
+        """
+        try:
+            self.s3.copy_object(
+                Bucket=self.bucket,
+                Key=key,
+                CopySource={'Bucket': self.bucket, 'Key': key},
+                ContentType='text/plain; charset=utf-8',
+                Metadata=metadata,
+                MetadataDirective='REPLACE'
+            )
+        except Exception as e:
+            self.logger.warning(f"could not refresh bedrock cache entry {key}: {e}")
+
+    def evict(self):
+        """
+        Delete the least recently used entries until the cache fits in
+        max_bytes; returns the number deleted
+        """
+        entries = []
+
+        for page in self.s3.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=cache_util.key_prefix):
+            entries += page.get('Contents', [])
+
+        total = sum(entry['Size'] for entry in entries)
+
+        if total <= self.max_bytes:
+            self.logger.debug(f"bedrock cache holds {total} bytes in {len(entries)} entries")
+            return 0
+
+        evicted = []
+
+        for entry in sorted(entries, key=lambda entry: entry['LastModified']):
+            if total <= self.max_bytes:
+                break
+
+            evicted.append(entry['Key'])
+            total -= entry['Size']
+
+        for start in range(0, len(evicted), cache_util.delete_batch):
+            self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in evicted[start:start + cache_util.delete_batch]], 'Quiet': True}
+            )
+
+        self.logger.info(f"evicted {len(evicted)} bedrock cache entries, {total} bytes left")
+        log_util.put_metrics({'BedrockCacheEvicted': len(evicted)})
+
+        return len(evicted)
+
+    def sweep(self):
+        """
+        Evict once sweep_seconds have passed since this container last did
+        """
+        global last_sweep
+
+        if not self.max_bytes:
+            return
+
+        with sweep_lock:
+            if time.time() - last_sweep < self.sweep_seconds:
+                return
+
+            last_sweep = time.time()
+
+        # Like a failed write, a failed sweep must not fail the summary
+        try:
+            self.evict()
+        except Exception as e:
+            self.logger.warning(f"could not sweep the bedrock cache: {e}")
+
+    def store(self, key, model_id, completion):
+        if not self.is_enabled():
+            return
+
+        data = completion.encode('utf-8')
+
+        if len(data) > self.max_entry_bytes:
+            self.logger.info(f"bedrock completion of {len(data)} bytes is over the {self.max_entry_bytes} byte cache limit")
+            return
+
+        # A failed write only costs a future miss, so it must not fail the summary
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=data,
+                ContentType='text/plain; charset=utf-8',
+                Metadata={
+                    'model-id': model_id,
+                    'expires-at': str(int(time.time()) + self.ttl_seconds)
+                }
+            )
+        except Exception as e:
+            self.logger.warning(f"could not cache bedrock completion {key}: {e}")
+            return
+
+        self.sweep()
@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+import time
+
+import transcript_util
+
+class dedup_util:
+    """
+    Index of already processed recordings keyed on their SHA-1 content hash.
+
+    The index row lives in DynamoDB and points at an S3 object holding the
+    transcript items and summary, so a repeat upload can be published without
+    transcribing or summarizing it again. Both expire after ttl_days: the row
+    through DynamoDB TTL and the object through a bucket lifecycle rule.
+
+    The key is the hash alone, without the Box file version. Every upload,
+    copy or restore gets a version id of its own, so keying on it would only
+    ever match a re-run of the very same version, which the job table already
+    catches. Box hashes the whole content, and equal bytes make an equal
+    transcript whatever version carries them. The version that produced an
+    entry is kept on the row for tracing.
+
+    The summary only holds for the summary settings it was made with, the
+    card templates and models, which are kept on the row too. Once they
+    change, callers reuse the transcript items alone and summarize again.
+    """
+
+    key_prefix = "dedup/"
+
+    def __init__(self, table, s3, bucket, logger, ttl_days=None):
+        self.table = table
+        self.s3 = s3
+        self.bucket = bucket
+        self.logger = logger
+
+        if ttl_days is None:
+            ttl_days = int(os.environ.get('DEDUP_TTL_DAYS', 30))
+
+        self.ttl_seconds = int(ttl_days) * 24 * 60 * 60
+
+    def get_object_key(self, content_hash):
+        return f"{dedup_util.key_prefix}{content_hash}.json"
+
+    def lookup(self, content_hash):
+        """
+        Return the stored {'summary', 'items', 'summary_settings'} for
+        content_hash, or None on a miss; summary is {card title: text}, or a
+        string for older entries, which have no summary_settings
+        """
+        item = self.table.get_item(Key={'content_hash': content_hash}).get('Item')
+
+        if not item:
+            self.logger.debug(f"dedup miss for {content_hash}")
+            return None
+
+        # DynamoDB removes expired rows lazily, so check the expiry ourselves
+        if int(item['expires_at']) <= time.time():
+            self.logger.debug(f"dedup entry for {content_hash} expired")
+            self.evict(content_hash)
+            return None
+
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=item['object_key'])
+        except self.s3.exceptions.NoSuchKey:
+            self.logger.info(f"dedup object for {content_hash} is gone, evicting entry")
+            self.evict(content_hash)
+            return None
+
+        self.logger.info(f"dedup hit for {content_hash} from file version {item.get('file_version_id')}")
+
+        # The summary is written first, so reading it stops long before the items
+        summary = transcript_util.read_value(response['Body'], "summary")
+
+        def open_items():
+            body = self.s3.get_object(Bucket=self.bucket, Key=item['object_key'])['Body']
+            return transcript_util.iter_values(body, "items.item")
+
+        return {
+            'summary': summary,
+            'items': transcript_util.reopenable(open_items),
+            'summary_settings': json.loads(item['summary_settings']) if 'summary_settings' in item else None
+        }
+
+    def store(self, content_hash, file_version_id, summary, items, summary_settings=None):
+        object_key = self.get_object_key(content_hash)
+        now = int(time.time())
+
+        # Items may be a stream too long to hold, so spill the document to disk past 8 MiB
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as document:
+            document.write(f'{{"summary": {json.dumps(summary)}, "items": ['.encode('utf-8'))
+
+            for index, entry in enumerate(items):
+                document.write(f'{"," if index else ""}{json.dumps(entry)}'.encode('utf-8'))
+
+            document.write(b']}')
+            document.seek(0)
+
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=object_key,
+                Body=document,
+                ContentType='application/json'
+            )
+
+        self.table.put_item(
+            Item={
+                'content_hash': content_hash,
+                'file_version_id': str(file_version_id),
+                'object_key': object_key,
+                # JSON, so it compares equal after the round trip through DynamoDB numbers
+                'summary_settings': json.dumps(summary_settings, sort_keys=True),
+                'created_at': now,
+                'expires_at': now + self.ttl_seconds
+            }
+        )
+
+        self.logger.debug(f"dedup entry stored for {content_hash}")
+
+    def evict(self, content_hash):
+        self.table.delete_item(Key={'content_hash': content_hash})
+        self.s3.delete_object(Bucket=self.bucket, Key=self.get_object_key(content_hash))
@@ -0,0 +1,163 @@
+import os
+import time
+
+class job_util:
+    """
+    Rows of the job table as a state machine.
+
+    A job moves QUEUED -> UPLOADING -> TRANSCRIBING -> SUMMARIZING ->
+    PUBLISHED, or to FAILED from any state short of the end. Every move is
+    an update conditional on the state the row is expected to be in, so a
+    duplicate delivery finds the row already moved on and backs off. The
+    message that makes a move claims the row, and its own redeliveries may
+    take up the state again where a failure left it.
+
+    Each state stamps <state>_at on the row the first time it is entered.
+    expires_at lets DynamoDB TTL remove rows ttl_days after their last move,
+    including those a lost message left half way.
+    """
+
+    QUEUED = 'QUEUED'
+    UPLOADING = 'UPLOADING'
+    TRANSCRIBING = 'TRANSCRIBING'
+    SUMMARIZING = 'SUMMARIZING'
+    PUBLISHED = 'PUBLISHED'
+    FAILED = 'FAILED'
+
+    active_states = (QUEUED, UPLOADING, TRANSCRIBING, SUMMARIZING)
+    final_states = (PUBLISHED, FAILED)
+
+    # Global secondary index of the jobs of a file, newest last
+    file_index = "file_id-index"
+
+    # Dropped once a job is over, Box tokens have no use after that
+    token_attributes = ('file_read_token', 'file_write_token')
+
+    def __init__(self, table, logger, ttl_days=None):
+        self.table = table
+        self.logger = logger
+
+        if ttl_days is None:
+            ttl_days = float(os.environ.get('JOB_TTL_DAYS', 14))
+
+        self.ttl_seconds = int(ttl_days * 24 * 60 * 60)
+
+    def get(self, job_id):
+        return self.table.get_item(Key={'job_id': job_id}, ConsistentRead=True).get('Item')
+
+    def get_file_jobs(self, file_id):
+        response = self.table.query(
+            IndexName=job_util.file_index,
+            KeyConditionExpression="file_id = :file_id",
+            ExpressionAttributeValues={':file_id': file_id}
+        )
+
+        return response['Items']
+
+    def create(self, job_id, attributes):
+        """
+        Add job_id as QUEUED with attributes, unless the row already exists
+        """
+        now = int(time.time())
+
+        try:
+            self.table.put_item(
+                Item={
+                    **attributes,
+                    'job_id': job_id,
+                    'state': job_util.QUEUED,
+                    'created_at': now,
+                    'queued_at': now,
+                    'updated_at': now,
+                    'expires_at': now + self.ttl_seconds
+                },
+                ConditionExpression="attribute_not_exists(job_id)"
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            self.logger.info(f"job {job_id} already exists")
+            return False
+
+        self.logger.info(f"job {job_id} queued")
+
+        return True
+
+    def update(self, job_id, attributes):
+        """
+        Set attributes on an existing row without moving it
+        """
+        names = {f"#a{index}": name for index, name in enumerate(attributes)}
+        values = {f":a{index}": value for index, value in enumerate(attributes.values())}
+
+        self.table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression="SET " + ", ".join(f"#a{index} = :a{index}" for index in range(len(attributes))),
+            ConditionExpression="attribute_exists(job_id)",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+
+    def transition(self, job_id, state, from_states, claim=None, from_claim=None, remove=()):
+        """
+        Move job_id to state from any of from_states.
+
+        With claim the row is claimed for it, and a row already in state
+        under the same claim moves too, for a redelivered message picking
+        up its own work. from_claim also moves a row in state that another
+        claim handed over. Returns the row as updated, or None when it was
+        not where expected.
+        """
+        now = int(time.time())
+
+        names = {'#state': 'state', '#stamp': f"{state.lower()}_at"}
+        values = {':state': state, ':now': now, ':expires_at': now + self.ttl_seconds}
+
+        update = [
+            "#state = :state",
+            "#stamp = if_not_exists(#stamp, :now)",
+            "updated_at = :now",
+            "expires_at = :expires_at"
+        ]
+        conditions = []
+
+        if from_states:
+            for index, from_state in enumerate(from_states):
+                values[f":from{index}"] = from_state
+
+            conditions.append(f"#state IN ({', '.join(f':from{index}' for index in range(len(from_states)))})")
+
+        if claim:
+            values[':claim'] = claim
+            update.append("claimed_by = :claim")
+            conditions.append("(#state = :state AND claimed_by = :claim)")
+
+        if from_claim:
+            values[':from_claim'] = from_claim
+            conditions.append("(#state = :state AND claimed_by = :from_claim)")
+
+        expression = "SET " + ", ".join(update)
+
+        if remove:
+            expression += " REMOVE " + ", ".join(remove)
+
+        try:
+            response = self.table.update_item(
+                Key={'job_id': job_id},
+                UpdateExpression=expression,
+                ConditionExpression=" OR ".join(conditions),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues="ALL_NEW"
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            self.logger.info(f"job {job_id} not moved to {state}, it wasn't {' or '.join(from_states) or 'claimed'}")
+            return None
+
+        self.logger.info(f"job {job_id} is {state}")
+
+        return response['Attributes']
+
+    def finish(self, job_id, state):
+        """
+        Move job_id to PUBLISHED or FAILED from wherever it is short of that
+        """
+        return self.transition(job_id, state, job_util.active_states, remove=job_util.token_attributes)
@@ -0,0 +1,169 @@
+"""
+JSON line logging for the lambdas.
+
+get_logger() points the root logger, and with it the Lambda runtime's
+handler, at json_formatter, so every record is one JSON object carrying the
+level, message and request id. Large values such as events, transcripts and
+cards go through log_payload(): nothing is rendered unless the level is
+enabled and the stage is sampled, credentials are masked, and the rendered
+text is cut to LOG_MAX_PAYLOAD characters with the full size recorded.
+put_metrics() writes counters in CloudWatch embedded metric format.
+"""
+import datetime
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+levels = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARN': logging.WARNING,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+}
+
+# Keys whose values never reach the logs
+sensitive_keys = {
+    'token',
+    'access_token',
+    'refresh_token',
+    'file_read_token',
+    'file_write_token',
+    'authorization',
+    'box-signature-primary',
+    'box-signature-secondary',
+}
+
+max_payload_length = int(os.environ.get('LOG_MAX_PAYLOAD', 2048))
+
+# Fraction of payloads logged per stage, e.g. {"transcript": 0.01}; stages not listed log every time
+sample_rates = json.loads(os.environ.get('LOG_SAMPLE_RATES') or '{}')
+
+metrics_namespace = os.environ.get('METRICS_NAMESPACE', 'BoxBedrockSkill')
+
+class json_formatter(logging.Formatter):
+
+    fields = ('aws_request_id', 'stage')
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+
+        for field in json_formatter.fields:
+            value = getattr(record, field, None)
+
+            if value is not None:
+                entry[field] = value
+
+        # Rendering the message measured any payloads among the arguments
+        sizes = [arg.size for arg in record.args or () if isinstance(arg, payload)]
+
+        if sizes:
+            entry['payload_size'] = sum(sizes)
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+def get_logger(level=None):
+    """
+    Configure the root logger once per cold start and return it
+    """
+    logger = logging.getLogger()
+    logger.setLevel(levels.get((level or os.environ.get('LOG_LEVEL', 'INFO')).upper(), logging.INFO))
+
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler(sys.stdout))
+
+    for handler in logger.handlers:
+        handler.setFormatter(json_formatter())
+
+    return logger
+
+def redact(value):
+    if isinstance(value, dict):
+        return {
+            key: '***' if str(key).lower() in sensitive_keys else redact(item)
+            for key, item in value.items()
+        }
+
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+
+    return value
+
+class payload:
+    """
+    Log argument that renders its value only when the record is emitted
+    """
+
+    def __init__(self, value, max_length=None):
+        self.value = value
+        self.max_length = max_length or max_payload_length
+        self.size = None
+
+    def render(self):
+        value = self.value
+
+        if hasattr(value, 'to_dict'):
+            value = value.to_dict()
+
+        if isinstance(value, str):
+            return value
+
+        return json.dumps(redact(value), default=str)
+
+    def __str__(self):
+        text = self.render()
+        self.size = len(text)
+
+        if self.size > self.max_length:
+            return f"{text[:self.max_length]}... [truncated, {self.size} chars]"
+
+        return text
+
+def is_sampled(stage):
+    rate = float(sample_rates.get(stage, 1))
+
+    return rate >= 1 or random.random() < rate
+
+def log_payload(logger, stage, message, value, level=logging.DEBUG):
+    """
+    Log message with a large value, if level is enabled and stage is sampled
+    """
+    if not logger.isEnabledFor(level) or not is_sampled(stage):
+        return
+
+    logger.log(level, "%s: %s", message, payload(value), extra={'stage': stage})
+
+def put_metrics(values, unit='Count', dimensions=None):
+    """
+    Emit values, a {name: number} dict, as CloudWatch embedded metrics.
+
+    The document has to be the whole log line for CloudWatch to extract the
+    metrics, so it bypasses json_formatter.
+    """
+    dimensions = dimensions or {}
+
+    document = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': metrics_namespace,
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name in values]
+            }]
+        },
+        **dimensions,
+        **values
+    }
+
+    print(json.dumps(document), flush=True)
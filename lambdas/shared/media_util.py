@@ -0,0 +1,145 @@
+import os
+import subprocess
+
+class process_reader:
+    """
+    File-like view of a subprocess's stdout that raises if the process fails
+    """
+
+    def __init__(self, process):
+        self.process = process
+
+    def read(self, size=-1):
+        data = self.process.stdout.read(size)
+
+        if not data:
+            self.process.wait()
+
+            if self.process.returncode != 0:
+                error = self.process.stderr.read().decode('utf-8', 'replace').strip()
+                raise RuntimeError(f"ffmpeg exited with {self.process.returncode}: {error}")
+
+        return data
+
+    def skip(self, size):
+        while size > 0:
+            data = self.read(min(size, 1024 * 1024))
+
+            if not data:
+                break
+
+            size -= len(data)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+        self.process.stdout.close()
+        self.process.stderr.close()
+
+def plan_segments(duration, segment_duration, overlap):
+    """
+    Split duration seconds into (start, length) segments of segment_duration
+    seconds, each running overlap seconds into the next one.
+    """
+    segments = []
+    start = 0
+
+    while start < duration:
+        segments.append((start, min(segment_duration + overlap, duration - start)))
+        start += segment_duration
+
+    # A short tail is cheaper to keep in the previous segment than to transcribe alone
+    if len(segments) > 1 and segments[-1][1] <= overlap:
+        segments.pop()
+        previous_start, previous_length = segments[-1]
+        segments[-1] = (previous_start, duration - previous_start)
+
+    return segments
+
+class media_util:
+
+    audio_format = "flac"
+
+    def __init__(self, logger, ffmpeg_path=None, sample_rate=None, ffprobe_path=None):
+        self.logger = logger
+        self.ffmpeg_path = ffmpeg_path or os.environ.get('FFMPEG_PATH', '/opt/bin/ffmpeg')
+        self.ffprobe_path = ffprobe_path or os.environ.get(
+            'FFPROBE_PATH',
+            os.path.join(os.path.dirname(self.ffmpeg_path), 'ffprobe')
+        )
+        self.sample_rate = int(sample_rate or os.environ.get('AUDIO_SAMPLE_RATE', 16000))
+
+    def is_available(self):
+        return os.access(self.ffmpeg_path, os.X_OK)
+
+    def get_audio_name(self, job_id):
+        return f"{job_id}.{media_util.audio_format}"
+
+    def get_duration(self, source):
+        """
+        Return the duration of source in seconds, or None when ffprobe can't tell
+        """
+        if not os.access(self.ffprobe_path, os.X_OK):
+            self.logger.debug(f"{self.ffprobe_path} is missing, duration unknown")
+            return None
+
+        command = [
+            self.ffprobe_path,
+            '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            source
+        ]
+
+        result = subprocess.run(command, capture_output=True, timeout=120)
+
+        try:
+            return float(result.stdout.decode().strip())
+        except ValueError:
+            self.logger.warning(f"ffprobe returned no duration: {result.stderr.decode('utf-8', 'replace').strip()}")
+            return None
+
+    def extract_audio(self, source, offset=0, start=None, duration=None):
+        """
+        Demux the first audio track of source and stream it back as mono FLAC.
+
+        source is anything ffmpeg can open, typically a pre-authorized Box
+        download URL, which lets ffmpeg seek in containers such as mp4 that keep
+        their index at the end. The encoder output is deterministic, so a
+        resumed upload can skip the bytes it already stored. start and duration,
+        in seconds, limit the output to one segment of the recording.
+        """
+        seek = []
+
+        if start:
+            seek += ['-ss', str(start)]
+
+        if duration:
+            seek += ['-t', str(duration)]
+
+        command = [
+            self.ffmpeg_path,
+            '-nostdin',
+            '-loglevel', 'error',
+            *seek,
+            '-i', source,
+            '-vn',
+            '-ac', '1',
+            '-ar', str(self.sample_rate),
+            '-c:a', media_util.audio_format,
+            '-f', media_util.audio_format,
+            'pipe:1'
+        ]
+
+        self.logger.debug(f"starting ffmpeg for {self.sample_rate} Hz mono {media_util.audio_format}")
+
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        reader = process_reader(process)
+
+        if offset:
+            reader.skip(offset)
+
+        return reader
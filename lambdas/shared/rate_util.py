@@ -0,0 +1,209 @@
+"""
+Token buckets shared by every invocation that calls Bedrock.
+
+Each model has one bucket row holding what is left of its requests and
+tokens per minute. Callers reserve capacity with acquire() before invoking
+the model and wait while the bucket refills; writes are conditional on the
+row's version not having changed since it was read, so concurrent lambdas
+never spend the same capacity twice. A throttle reported by Bedrock halves
+the refill rate of everyone using the bucket, and the rate creeps back up
+while no throttles are seen.
+"""
+import decimal
+import os
+import threading
+import time
+
+class rate_limited(Exception):
+    """
+    Raised when capacity did not free up within the allowed wait; retry_in
+    is the seconds until there should be some again
+    """
+
+    def __init__(self, message, retry_in):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+class memory_store:
+    """
+    Bucket rows in a dict, for tests and local runs
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.lock = threading.Lock()
+        self.conflicts = 0
+
+    def read(self, key):
+        with self.lock:
+            row = self.rows.get(key)
+            return dict(row) if row else None
+
+    def write(self, key, row, previous):
+        with self.lock:
+            current = self.rows.get(key)
+
+            if (current and current['version']) != (previous and previous['version']):
+                self.conflicts += 1
+                return False
+
+            self.rows[key] = dict(row)
+            return True
+
+class dynamo_store:
+    """
+    Bucket rows in a DynamoDB table keyed on bucket; get_table returns the
+    table for the calling thread, as table resources can't be shared
+    """
+
+    fields = ('requests', 'tokens', 'scale', 'updated_at')
+
+    def __init__(self, get_table):
+        self.get_table = get_table
+
+    def read(self, key):
+        item = self.get_table().get_item(Key={'bucket': key}, ConsistentRead=True).get('Item')
+
+        if not item:
+            return None
+
+        row = {field: float(item[field]) for field in dynamo_store.fields}
+        row['version'] = int(item['version'])
+
+        return row
+
+    def write(self, key, row, previous):
+        item = {'bucket': key, 'version': row['version']}
+        item.update({field: decimal.Decimal(f"{row[field]:.6f}") for field in dynamo_store.fields})
+
+        if previous:
+            condition = {
+                'ConditionExpression': 'version = :previous',
+                'ExpressionAttributeValues': {':previous': previous['version']}
+            }
+        else:
+            condition = {'ConditionExpression': 'attribute_not_exists(#bucket)', 'ExpressionAttributeNames': {'#bucket': 'bucket'}}
+
+        table = self.get_table()
+
+        try:
+            table.put_item(Item=item, **condition)
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+        return True
+
+class rate_util:
+
+    def __init__(self, store, logger, requests_per_minute=None, tokens_per_minute=None, burst_seconds=None,
+                 max_wait_seconds=None, min_scale=0.1, recovery_per_minute=0.1, clock=time.time, sleep=time.sleep):
+        self.store = store
+        self.logger = logger
+
+        if requests_per_minute is None:
+            requests_per_minute = float(os.environ.get('BEDROCK_REQUESTS_PER_MINUTE', 0))
+
+        if tokens_per_minute is None:
+            tokens_per_minute = float(os.environ.get('BEDROCK_TOKENS_PER_MINUTE', 0))
+
+        # Capacity a full bucket holds, in seconds of refill
+        if burst_seconds is None:
+            burst_seconds = float(os.environ.get('RATE_BURST_SECONDS', 10))
+
+        if max_wait_seconds is None:
+            max_wait_seconds = float(os.environ.get('RATE_MAX_WAIT_SECONDS', 60))
+
+        self.limits = {'requests': requests_per_minute / 60, 'tokens': tokens_per_minute / 60}
+        self.burst_seconds = burst_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.min_scale = min_scale
+        self.recovery_per_second = recovery_per_minute / 60
+        self.clock = clock
+        self.sleep = sleep
+
+    def is_enabled(self):
+        return any(self.limits.values())
+
+    def get_capacity(self, name, scale):
+        # Room for at least one request, however low the rate
+        return max(1.0 if name == 'requests' else 0.0, self.limits[name] * scale * self.burst_seconds)
+
+    def refill(self, row, now):
+        """
+        Return row brought up to now: capacity refilled at the scaled rate
+        and the scale itself recovered, additively, toward 1
+        """
+        if row is None:
+            row = {'scale': 1.0, 'updated_at': now, 'version': 1}
+            row.update({name: self.get_capacity(name, 1.0) for name in self.limits})
+            return row
+
+        elapsed = max(0.0, now - row['updated_at'])
+        scale = min(1.0, row['scale'] + self.recovery_per_second * elapsed)
+
+        refilled = {'scale': scale, 'updated_at': now, 'version': row['version'] + 1}
+
+        for name, rate in self.limits.items():
+            refilled[name] = min(self.get_capacity(name, scale), row[name] + rate * scale * elapsed)
+
+        return refilled
+
+    def acquire(self, key, tokens=0):
+        """
+        Take one request and tokens from the bucket of key, waiting for them
+        to refill for up to max_wait_seconds; returns the seconds waited
+        """
+        if not self.is_enabled():
+            return 0
+
+        started = self.clock()
+        wanted = {'requests': 1, 'tokens': tokens}
+
+        while True:
+            previous = self.store.read(key)
+            now = self.clock()
+            row = self.refill(previous, now)
+
+            wait = 0
+
+            for name, rate in self.limits.items():
+                if not rate:
+                    continue
+
+                # A request bigger than the whole bucket goes through once the bucket is full
+                needed = min(wanted[name], self.get_capacity(name, row['scale']))
+
+                if row[name] < needed:
+                    wait = max(wait, (needed - row[name]) / (rate * row['scale']))
+
+            if not wait:
+                for name, rate in self.limits.items():
+                    if rate:
+                        row[name] -= min(wanted[name], row[name])
+
+                if self.store.write(key, row, previous):
+                    return now - started
+
+                # Someone else spent capacity since the read, look again
+                continue
+
+            if now + wait - started > self.max_wait_seconds:
+                raise rate_limited(f"{key} has no capacity for {tokens} tokens within {self.max_wait_seconds} seconds", wait)
+
+            self.sleep(wait)
+
+    def throttled(self, key):
+        """
+        Halve the refill rate of key after Bedrock throttled a request
+        """
+        if not self.is_enabled():
+            return
+
+        while True:
+            previous = self.store.read(key)
+            row = self.refill(previous, self.clock())
+            row['scale'] = max(self.min_scale, row['scale'] / 2)
+
+            if self.store.write(key, row, previous):
+                self.logger.warning(f"bedrock throttled {key}, refill rate down to {row['scale']:.0%}")
+                return
@@ -0,0 +1,321 @@
+"""
+Retries and circuit breakers around the calls to Box, Transcribe, Bedrock
+and DynamoDB.
+
+call(dependency, fn, ...) runs fn under the dependency's retry policy:
+throttles, 5xx responses, timeouts and dropped connections are tried again
+after an exponential backoff with full jitter, or after the Retry-After the
+service asked for, and any other error goes straight back to the caller.
+
+Each dependency also has a circuit breaker, kept at module scope so warm
+invocations share it. Once failure_threshold calls in a row have used up
+their retries it opens, and calls fail at once with circuit_open, leaving
+the message to be redelivered instead of spending lambda time on a service
+that is down. After reset_seconds a single trial call is let through, and
+its outcome closes the breaker or opens it again. Retries and breaker state
+changes are emitted as metrics.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import log_util
+
+logger = logging.getLogger(__name__)
+
+# Per dependency defaults, overridden key by key from RETRY_POLICIES, e.g. {"box": {"attempts": 5}}
+default_policies = {
+    # box_sdk_gen already retries 429s itself, so fewer attempts on top of it
+    'box': {'attempts': 3, 'base_delay': 1, 'max_delay': 20},
+    'transcribe': {'attempts': 5, 'base_delay': 0.5, 'max_delay': 10},
+    'bedrock': {'attempts': 3, 'base_delay': 1, 'max_delay': 10},
+    'dynamodb': {'attempts': 6, 'base_delay': 0.05, 'max_delay': 2},
+}
+
+throttle_codes = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'LimitExceededException',
+}
+
+transient_codes = {
+    'InternalFailure',
+    'InternalServerError',
+    'InternalServerException',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+    'ModelTimeoutException',
+    'RequestTimeout',
+    'RequestTimeoutException',
+}
+
+transient_statuses = {500, 502, 503, 504}
+
+# botocore, requests and builtin exceptions for a dependency that could not be reached
+connection_errors = {
+    'EndpointConnectionError',
+    'ConnectTimeoutError',
+    'ReadTimeoutError',
+    'ConnectionClosedError',
+    'ConnectionError',
+    'ConnectTimeout',
+    'ReadTimeout',
+    'TimeoutError',
+}
+
+class circuit_open(Exception):
+    """
+    Raised instead of calling a dependency whose breaker is open; retry_in
+    is the seconds until it lets a call through again
+    """
+
+    def __init__(self, dependency, retry_in):
+        super().__init__(f"{dependency} is unavailable, calls resume in {retry_in:.0f} seconds")
+        self.dependency = dependency
+        self.retry_in = retry_in
+
+def get_response(error):
+    """
+    Return (error code, HTTP status, response headers) of a botocore
+    ClientError, box_sdk_gen BoxAPIError or requests HTTPError
+    """
+    response_info = getattr(error, 'response_info', None)
+
+    if response_info is not None:
+        return getattr(response_info, 'code', None), getattr(response_info, 'status_code', None), getattr(response_info, 'headers', None) or {}
+
+    response = getattr(error, 'response', None)
+
+    if isinstance(response, dict):
+        metadata = response.get('ResponseMetadata', {})
+        return response.get('Error', {}).get('Code'), metadata.get('HTTPStatusCode'), metadata.get('HTTPHeaders', {})
+
+    if response is not None:
+        return None, getattr(response, 'status_code', None), getattr(response, 'headers', None) or {}
+
+    return None, None, {}
+
+def classify(error):
+    """
+    Return 'throttle' or 'transient' for errors worth retrying, else None
+    """
+    code, status, headers = get_response(error)
+
+    if code in throttle_codes or status == 429:
+        return 'throttle'
+
+    if code in transient_codes or status in transient_statuses:
+        return 'transient'
+
+    if any(cls.__name__ in connection_errors for cls in type(error).__mro__):
+        return 'transient'
+
+    return None
+
+def get_retry_after(error):
+    code, status, headers = get_response(error)
+
+    for name, value in headers.items():
+        if name.lower() == 'retry-after':
+            try:
+                return max(0.0, float(value))
+            except (TypeError, ValueError):
+                # The HTTP date form, fall back on the backoff
+                return None
+
+    return None
+
+class retry_policy:
+
+    def __init__(self, dependency, attempts=3, base_delay=0.5, max_delay=10, failure_threshold=5, reset_seconds=30):
+        self.dependency = dependency
+        self.attempts = int(attempts)
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.failure_threshold = int(failure_threshold)
+        self.reset_seconds = float(reset_seconds)
+
+    def is_retryable(self, error, retry_throttles=True):
+        kind = classify(error)
+
+        return kind == 'transient' or (kind == 'throttle' and retry_throttles)
+
+    def get_delay(self, attempt, error):
+        """
+        Seconds to wait before trying again after attempt, counted from 1.
+        A Retry-After longer than max_delay returns None: waiting that long
+        costs more than letting the message be redelivered.
+        """
+        retry_after = get_retry_after(error)
+
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+class circuit_breaker:
+
+    def __init__(self, dependency, failure_threshold, reset_seconds, clock=time.monotonic):
+        self.dependency = dependency
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        Raise circuit_open unless a call may go ahead; returns True when the
+        call is the trial of a half open breaker
+        """
+        with self.lock:
+            if self.state == 'closed':
+                return False
+
+            if self.state == 'open':
+                retry_in = self.opened_at + self.reset_seconds - self.clock()
+
+                if retry_in <= 0:
+                    self.set_state('half_open')
+                    return True
+            else:
+                # Another call is the trial, give it a full reset period
+                retry_in = self.reset_seconds
+
+        log_util.put_metrics({'CircuitRejected': 1}, dimensions={'Dependency': self.dependency})
+
+        raise circuit_open(self.dependency, retry_in)
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+
+            if self.state != 'closed':
+                self.set_state('closed')
+
+    def failed(self):
+        with self.lock:
+            self.failures += 1
+
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                self.set_state('open')
+
+    def set_state(self, state):
+        log = logger.warning if state == 'open' else logger.info
+        log(f"{self.dependency} circuit breaker {self.state} -> {state} after {self.failures} failures")
+
+        self.state = state
+
+        log_util.put_metrics({'CircuitStateChange': 1}, dimensions={'Dependency': self.dependency, 'State': state})
+
+class resilience_util:
+
+    def __init__(self, policies=None, clock=time.monotonic, sleep=time.sleep):
+        if policies is None:
+            policies = json.loads(os.environ.get('RETRY_POLICIES') or '{}')
+
+        self.policies = {
+            dependency: retry_policy(dependency, **{**default_policies.get(dependency, {}), **policies.get(dependency, {})})
+            for dependency in {*default_policies, *policies}
+        }
+
+        self.breakers = {
+            dependency: circuit_breaker(dependency, policy.failure_threshold, policy.reset_seconds, clock)
+            for dependency, policy in self.policies.items()
+        }
+
+        self.sleep = sleep
+
+    def call(self, dependency, fn, *args, retry_throttles=True, **kwargs):
+        """
+        Return fn(*args, **kwargs), retrying transient failures under the
+        dependency's policy; retry_throttles=False hands throttles straight
+        back, to callers that pace themselves
+        """
+        policy = self.policies[dependency]
+        breaker = self.breakers[dependency]
+        attempt = 1
+
+        while True:
+            trial = breaker.allow()
+
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not policy.is_retryable(e, retry_throttles):
+                    # The dependency answered, it just didn't like the request
+                    breaker.succeeded()
+                    raise
+
+                delay = None
+
+                # A trial call gets one attempt, its retries would be refused anyway
+                if attempt < policy.attempts and not trial:
+                    delay = policy.get_delay(attempt, e)
+
+                if delay is None:
+                    breaker.failed()
+                    raise
+
+                logger.info(f"{dependency} call failed ({e}), attempt {attempt + 1} of {policy.attempts} in {delay:.2f}s")
+                log_util.put_metrics({'DependencyRetry': 1}, dimensions={'Dependency': dependency})
+
+                self.sleep(delay)
+                attempt += 1
+                continue
+
+            breaker.succeeded()
+
+            return result
+
+class resilient:
+    """
+    Proxy whose methods run through call(dependency, ...); attributes that
+    aren't callable, like a table's meta, are the target's own
+    """
+
+    def __init__(self, target, dependency):
+        self.target = target
+        self.dependency = dependency
+
+    def __getattr__(self, name):
+        attr = getattr(self.target, name)
+
+        if not callable(attr):
+            return attr
+
+        def wrapped(*args, **kwargs):
+            return call(self.dependency, attr, *args, **kwargs)
+
+        return wrapped
+
+shared = None
+shared_lock = threading.Lock()
+
+def get_shared():
+    global shared
+
+    if shared is None:
+        with shared_lock:
+            if shared is None:
+                shared = resilience_util()
+
+    return shared
+
+def call(dependency, fn, *args, **kwargs):
+    """
+    Call fn under the container wide policy and breaker of dependency
+    """
+    return get_shared().call(dependency, fn, *args, **kwargs)
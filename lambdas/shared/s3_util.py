@@ -0,0 +1,138 @@
+import os
+
+class s3_util:
+
+    # S3 rejects multipart parts smaller than 5 MiB (except the last one)
+    min_part_size = 5 * 1024 * 1024
+    default_part_size = 8 * 1024 * 1024
+
+    def __init__(self, s3, bucket, logger, part_size=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.logger = logger
+
+        if part_size is None:
+            part_size = int(os.environ.get('UPLOAD_PART_SIZE', s3_util.default_part_size))
+
+        self.part_size = max(int(part_size), s3_util.min_part_size)
+
+    def get_resumable_parts(self, key, upload_id):
+        """
+        Return the leading run of full-size parts already stored for upload_id.
+
+        Anything after the first gap or short part is uploaded again.
+        """
+        parts = []
+        marker = 0
+
+        while True:
+            response = self.s3.list_parts(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumberMarker=marker
+            )
+            parts.extend(response.get('Parts', []))
+
+            if not response.get('IsTruncated'):
+                break
+
+            marker = response['NextPartNumberMarker']
+
+        parts.sort(key=lambda part: part['PartNumber'])
+
+        resumable = []
+
+        for part in parts:
+            if part['PartNumber'] != len(resumable) + 1 or part['Size'] != self.part_size:
+                break
+
+            resumable.append({'PartNumber': part['PartNumber'], 'ETag': part['ETag']})
+
+        return resumable
+
+    def read_part(self, stream):
+        """
+        Read exactly one part from stream, or less at end of stream
+        """
+        buffer = bytearray()
+
+        while len(buffer) < self.part_size:
+            chunk = stream.read(self.part_size - len(buffer))
+
+            if not chunk:
+                break
+
+            buffer.extend(chunk)
+
+        return bytes(buffer)
+
+    def upload_stream(self, key, open_stream, upload_id=None, on_start=None):
+        """
+        Copy a stream into S3 as a multipart upload, holding at most one part in memory.
+
+        open_stream(offset) must return a readable stream starting at byte offset.
+        Pass the upload_id of an unfinished upload of the same stream to keep
+        its completed parts and transfer only the remainder; only that exact
+        upload is resumed, never another one that happens to share the key.
+        A new upload's id is handed to on_start(upload_id), for the caller to
+        keep until the upload is complete.
+        """
+        parts = []
+
+        if upload_id:
+            try:
+                parts = self.get_resumable_parts(key, upload_id)
+                self.logger.info(f"resuming upload {upload_id} for {key} after {len(parts)} parts")
+            except self.s3.exceptions.NoSuchUpload:
+                self.logger.info(f"upload {upload_id} for {key} is gone, starting over")
+                upload_id = None
+
+        if not upload_id:
+            upload_id = self.s3.create_multipart_upload(Bucket=self.bucket, Key=key)['UploadId']
+            self.logger.debug(f"started upload {upload_id} for {key}")
+
+            if on_start:
+                on_start(upload_id)
+
+        offset = len(parts) * self.part_size
+        stream = open_stream(offset)
+
+        try:
+            while True:
+                body = self.read_part(stream)
+
+                if not body:
+                    break
+
+                part_number = len(parts) + 1
+
+                response = self.s3.upload_part(
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body
+                )
+                parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+
+                offset += len(body)
+                self.logger.debug(f"uploaded part {part_number} of {key} ({offset} bytes so far)")
+
+                if len(body) < self.part_size:
+                    break
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+
+        if not parts:
+            # Multipart uploads need at least one part, so empty files go up in one request
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            return self.s3.put_object(Bucket=self.bucket, Key=key, Body=b'')
+
+        return self.s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
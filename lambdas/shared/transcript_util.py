@@ -0,0 +1,557 @@
+"""
+Helpers for the items list in Amazon Transcribe output.
+
+Each item is a dict such as {'type': 'pronunciation', 'start_time': '1.04',
+'end_time': '1.38', 'alternatives': [{'content': 'Hello', ...}]}; punctuation
+items carry no times.
+
+Transcripts of long recordings hold hundreds of thousands of items, so they
+are read from the S3 body stream one item at a time instead of being parsed
+into a single list.
+"""
+import array
+import codecs
+import itertools
+import json
+import operator
+import re
+import sys
+
+string_pattern = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+structure_pattern = re.compile(r'["\[\]{}]')
+number_end_pattern = re.compile(r'[^0-9eE+\-.]')
+whitespace_pattern = re.compile(r'\s*')
+
+class json_stream:
+    """
+    Pull parser over a JSON document read from a binary stream.
+
+    walk() yields (path, value) for the values whose dotted path is wanted,
+    with "item" standing for any array element as in "results.items.item".
+    Only wanted values are decoded; everything else is skipped without
+    building Python objects, so memory stays bounded by the largest wanted
+    value rather than by the document.
+    """
+
+    def __init__(self, stream, chunk_size=64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+
+        data = self.stream.read(self.chunk_size)
+
+        if not data:
+            self.eof = True
+
+        self.buffer = self.buffer[self.position:] + self.text_decoder.decode(data, final=self.eof)
+        self.position = 0
+
+        return True
+
+    def peek(self):
+        while True:
+            self.position = whitespace_pattern.match(self.buffer, self.position).end()
+
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+
+            if not self.fill():
+                raise ValueError("unexpected end of JSON document")
+
+    def expect(self, characters):
+        character = self.peek()
+
+        if character not in characters:
+            raise ValueError(f"expected one of {characters!r}, found {character!r}")
+
+        self.position += 1
+
+        return character
+
+    def decode_value(self):
+        # A number at the end of the buffer may continue in the next chunk
+        if self.peek() in '-0123456789':
+            while not number_end_pattern.search(self.buffer, self.position) and self.fill():
+                pass
+
+        while True:
+            try:
+                value, self.position = self.json_decoder.raw_decode(self.buffer, self.position)
+                return value
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+
+    def skip_string(self):
+        while not (match := string_pattern.match(self.buffer, self.position)):
+            if not self.fill():
+                raise ValueError("unterminated JSON string")
+
+        self.position = match.end()
+
+    def skip_value(self):
+        opening = self.peek()
+
+        if opening == '"':
+            self.skip_string()
+            return
+
+        if opening not in '[{':
+            self.decode_value()
+            return
+
+        depth = 0
+
+        while True:
+            match = structure_pattern.search(self.buffer, self.position)
+
+            if not match:
+                self.position = len(self.buffer)
+
+                if not self.fill():
+                    raise ValueError("unexpected end of JSON document")
+                continue
+
+            self.position = match.start()
+
+            if match.group() == '"':
+                self.skip_string()
+                continue
+
+            self.position += 1
+            depth += 1 if match.group() in '[{' else -1
+
+            if depth == 0:
+                return
+
+    def walk(self, wanted, path=()):
+        """
+        Yield (path, value) for each wanted path inside the value that starts
+        at the current position
+        """
+        dotted = ".".join(path)
+
+        if dotted in wanted:
+            yield dotted, self.decode_value()
+            return
+
+        prefix = f"{dotted}." if path else ""
+        opening = self.peek()
+
+        if opening not in '[{' or not any(want.startswith(prefix) for want in wanted):
+            self.skip_value()
+            return
+
+        self.position += 1
+        closing = '}' if opening == '{' else ']'
+
+        if self.peek() == closing:
+            self.position += 1
+            return
+
+        while True:
+            if opening == '{':
+                self.peek()
+                key = self.decode_value()
+                self.expect(':')
+                yield from self.walk(wanted, path + (key,))
+            else:
+                yield from self.walk(wanted, path + ('item',))
+
+            if self.expect(',' + closing) == closing:
+                return
+
+class reopenable:
+    """
+    Iterable that calls open_items() for every pass, so a streamed list can
+    be consumed more than once without being held in memory
+    """
+
+    def __init__(self, open_items):
+        self.open_items = open_items
+
+    def __iter__(self):
+        return iter(self.open_items())
+
+def iter_values(stream, path):
+    try:
+        for found, value in json_stream(stream).walk({path}):
+            yield value
+    finally:
+        close = getattr(stream, 'close', None)
+
+        if close:
+            close()
+
+def read_value(stream, path, default=None):
+    """
+    Return the first value at path, closing the stream without reading the rest
+    """
+    values = iter_values(stream, path)
+
+    try:
+        return next(values, default)
+    finally:
+        values.close()
+
+def read_transcript(stream):
+    return read_value(stream, "results.transcripts.item.transcript", "")
+
+def iter_items(stream):
+    return iter_values(stream, "results.items.item")
+
+def shift_item(item, seconds, item_id=None):
+    shifted = dict(item)
+
+    if 'start_time' in item:
+        shifted['start_time'] = f"{float(item['start_time']) + seconds:.3f}"
+        shifted['end_time'] = f"{float(item['end_time']) + seconds:.3f}"
+
+    if item_id is not None and 'id' in item:
+        shifted['id'] = item_id
+
+    return shifted
+
+def stitch_segments(segments, overlap):
+    """
+    Join the items of overlapping segment transcripts into one iterable.
+
+    segments is a list of (start, items) in recording order, where start is
+    the segment's offset in seconds and its items are timed from that offset.
+    Words inside an overlap are taken from the earlier segment up to the
+    middle of the overlap and from the later segment after it, which also
+    drops the words cut in half at either edge of a segment. Punctuation
+    follows the word before it. Items are produced lazily on each pass over
+    the result.
+    """
+    return reopenable(lambda: iter_stitched(segments, overlap))
+
+def iter_stitched(segments, overlap):
+    count = 0
+
+    for index, (start, items) in enumerate(segments):
+        lower = start + overlap / 2 if index > 0 else None
+        upper = segments[index + 1][0] + overlap / 2 if index + 1 < len(segments) else None
+
+        keep = lower is None
+
+        for item in items:
+            if 'start_time' in item:
+                position = start + float(item['start_time'])
+                keep = (lower is None or position >= lower) and (upper is None or position < upper)
+
+            if keep:
+                yield shift_item(item, start, item_id=count)
+                count += 1
+
+def get_transcript_text(items):
+    return compact_transcript.from_items(items).text()
+
+class compact_transcript:
+    """
+    Column-oriented copy of Transcribe items, parsed once.
+
+    Times are whole milliseconds in int32 arrays (-1 for punctuation), words
+    are indexes into a table of interned strings, and the item type and
+    confidence take one and two bytes per item. Speaker labels, present when
+    the job ran with diarization, are indexes into a second table. An hour of speech fits in
+    well under a megabyte, against tens of megabytes of item dicts, and
+    consumers read numbers instead of converting strings on every pass.
+    Iterating yields Transcribe-style item dicts for code that wants them.
+    """
+
+    pronunciation = 0
+    punctuation = 1
+
+    types = {'pronunciation': 0, 'punctuation': 1}
+    type_names = ['pronunciation', 'punctuation']
+
+    def __init__(self):
+        self.start_ms = array.array('i')
+        self.end_ms = array.array('i')
+        self.word_ids = array.array('I')
+        self.kinds = array.array('B')
+        # Confidence in ten-thousandths
+        self.confidences = array.array('H')
+        # Speaker table index per item, -1 without diarization
+        self.speaker_ids = array.array('h')
+        self.words = []
+        self.word_index = {}
+        self.speakers = []
+        self.speaker_index = {}
+
+    @classmethod
+    def from_items(cls, items):
+        if isinstance(items, cls):
+            return items
+
+        transcript = cls()
+
+        for item in items:
+            transcript.append(item)
+
+        return transcript
+
+    def append(self, item):
+        alternative = item['alternatives'][0]
+        content = alternative['content']
+
+        word_id = self.word_index.get(content)
+
+        if word_id is None:
+            word_id = self.word_index[content] = len(self.words)
+            self.words.append(sys.intern(content))
+
+        if 'start_time' in item:
+            self.start_ms.append(round(float(item['start_time']) * 1000))
+            self.end_ms.append(round(float(item['end_time']) * 1000))
+        else:
+            self.start_ms.append(-1)
+            self.end_ms.append(-1)
+
+        speaker = item.get('speaker_label')
+
+        if speaker is None:
+            self.speaker_ids.append(-1)
+        else:
+            speaker_id = self.speaker_index.get(speaker)
+
+            if speaker_id is None:
+                speaker_id = self.speaker_index[speaker] = len(self.speakers)
+                self.speakers.append(speaker)
+
+            self.speaker_ids.append(speaker_id)
+
+        self.word_ids.append(word_id)
+        self.kinds.append(compact_transcript.types.get(item['type'], compact_transcript.pronunciation))
+        self.confidences.append(round(float(alternative.get('confidence') or 0) * 10000))
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def content(self, index):
+        return self.words[self.word_ids[index]]
+
+    def is_punctuation(self, index):
+        return self.kinds[index] == compact_transcript.punctuation
+
+    def text(self, start=0, end=None):
+        words = []
+        words_append = words.append
+        table = self.words
+        punctuation = compact_transcript.punctuation
+
+        for word_id, kind in zip(self.word_ids[start:end], self.kinds[start:end]):
+            if kind == punctuation and words:
+                words[-1] += table[word_id]
+            else:
+                words_append(table[word_id])
+
+        return " ".join(words)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            item = {
+                'type': compact_transcript.type_names[self.kinds[index]],
+                'alternatives': [{
+                    'confidence': f"{self.confidences[index] / 10000:.4g}",
+                    'content': self.content(index)
+                }]
+            }
+
+            if self.start_ms[index] >= 0:
+                item['start_time'] = f"{self.start_ms[index] / 1000:.3f}"
+                item['end_time'] = f"{self.end_ms[index] / 1000:.3f}"
+
+            if self.speaker_ids[index] >= 0:
+                item['speaker_label'] = self.speakers[self.speaker_ids[index]]
+
+            yield item
+
+sentence_endings = {'.', '?', '!'}
+
+entry_policies = ('window', 'sentence', 'speaker')
+
+def forward_fill(values, missing=-1):
+    """
+    Replace missing values with the last present one; leading gaps take the first
+    """
+    first = next((value for value in values if value != missing), missing)
+
+    return list(itertools.accumulate(
+        values,
+        lambda previous, value: previous if value == missing else value,
+        initial=first
+    ))[1:]
+
+def group_entries(items, window_seconds=1, policy='window', max_entries=None):
+    """
+    Group words into (second, text) card entries.
+
+    policy decides where an entry ends:
+      'window'   every window_seconds of speech
+      'sentence' after each sentence-ending punctuation item
+      'speaker'  at each change of speaker, or by window when the transcript
+                 has no speaker labels
+    With max_entries, neighbouring entries are merged evenly until no more
+    than that many remain, keeping the card small however long the meeting.
+
+    Every column is processed in whole passes: the split positions come from
+    comparing a column with itself shifted by one, and each entry's words are
+    joined once. Text keeps the spacing cards have always had: every item
+    followed by a space.
+    """
+    if policy not in entry_policies:
+        raise ValueError(f"unknown transcript entry policy {policy!r}, expected one of {entry_policies}")
+
+    transcript = compact_transcript.from_items(items)
+    count = len(transcript)
+
+    if not count:
+        return []
+
+    window_ms = max(1, round(window_seconds * 1000))
+
+    if policy == 'speaker' and not transcript.speakers:
+        policy = 'window'
+
+    if policy == 'window':
+        keys = forward_fill([start_ms // window_ms if start_ms >= 0 else -1 for start_ms in transcript.start_ms])
+        changes = itertools.compress(range(1, count), map(operator.ne, keys, itertools.islice(keys, 1, None)))
+    elif policy == 'speaker':
+        keys = forward_fill(transcript.speaker_ids)
+        changes = itertools.compress(range(1, count), map(operator.ne, keys, itertools.islice(keys, 1, None)))
+    else:
+        endings = {word_id for word_id, word in enumerate(transcript.words) if word in sentence_endings}
+        changes = itertools.compress(range(1, count), map(endings.__contains__, transcript.word_ids))
+
+    bounds = [0, *changes]
+
+    if max_entries and len(bounds) > max_entries:
+        step = -(-len(bounds) // max_entries)
+        bounds = bounds[::step]
+
+    bounds.append(count)
+
+    seconds = forward_fill([start_ms // 1000 if start_ms >= 0 else -1 for start_ms in transcript.start_ms])
+    lookup = transcript.words.__getitem__
+    word_ids = transcript.word_ids
+
+    return [
+        (max(seconds[start], 0), " ".join(map(lookup, word_ids[start:end])) + " ")
+        for start, end in zip(bounds, itertools.islice(bounds, 1, None))
+    ]
+
+def split_units(items):
+    """
+    Split a transcript into sentences, also breaking at speaker changes.
+
+    These are the smallest pieces a long transcript is cut into for
+    summarizing. A unit that starts a new speaker's turn is prefixed with
+    the speaker label.
+    """
+    transcript = compact_transcript.from_items(items)
+    count = len(transcript)
+
+    if not count:
+        return []
+
+    endings = {word_id for word_id, word in enumerate(transcript.words) if word in sentence_endings}
+    breaks = map(endings.__contains__, transcript.word_ids)
+    speakers = None
+
+    if transcript.speakers:
+        speakers = forward_fill(transcript.speaker_ids)
+        breaks = map(operator.or_, breaks, map(operator.ne, speakers, itertools.islice(speakers, 1, None)))
+
+    bounds = [0, *itertools.compress(range(1, count), breaks), count]
+
+    units = []
+    previous_speaker = None
+
+    for start, end in zip(bounds, itertools.islice(bounds, 1, None)):
+        text = transcript.text(start, end)
+
+        if speakers and speakers[start] >= 0 and speakers[start] != previous_speaker:
+            previous_speaker = speakers[start]
+            text = f"{transcript.speakers[previous_speaker]}: {text}"
+
+        units.append(text)
+
+    return units
+
+def split_sentences(text):
+    return [sentence for sentence in re.split(r'(?<=[.?!])\s+', text) if sentence]
+
+def estimate_tokens(text):
+    """
+    Rough token count for prompt budgeting, about four characters per token
+    for English text
+    """
+    return len(text) // 4 + 1
+
+def pack_chunks(units, max_tokens, overlap_tokens=0, min_units=1):
+    """
+    Pack consecutive text units into chunks of at most max_tokens.
+
+    Each chunk after the first repeats trailing units of the previous one
+    worth up to overlap_tokens, so context carries across the cut. A unit
+    longer than max_tokens is split on whitespace. Chunks hold at least
+    min_units units, even past max_tokens, so repeated packing always
+    shrinks the list.
+    """
+    pieces = []
+
+    for unit in units:
+        if estimate_tokens(unit) <= max_tokens:
+            pieces.append(unit)
+            continue
+
+        words = unit.split()
+        words_per_piece = max(1, len(words) * max_tokens // estimate_tokens(unit))
+
+        for start in range(0, len(words), words_per_piece):
+            pieces.append(" ".join(words[start:start + words_per_piece]))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    carried = 0
+
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+
+        if current and current_tokens + tokens > max_tokens and len(current) - carried >= min_units:
+            chunks.append(current)
+
+            overlap = []
+            overlap_size = 0
+
+            for previous in reversed(current):
+                size = estimate_tokens(previous)
+
+                if overlap_size + size > overlap_tokens or overlap_size + size + tokens > max_tokens:
+                    break
+
+                overlap.insert(0, previous)
+                overlap_size += size
+
+            current = overlap
+            current_tokens = overlap_size
+            carried = len(overlap)
+
+        current.append(piece)
+        current_tokens += tokens
+
+    if current:
+        chunks.append(current)
+
+    return [" ".join(chunk) for chunk in chunks]
@@ -1,30 +1,21 @@
 import base64
-import boto3
-from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Key
 import json
-import logging
 import os
-from pprint import pformat
 from urllib.parse import parse_qsl
 
+import aws_util
 import box_util
+import log_util
 
 
-sqs = boto3.client('sqs')
-queue_url = os.environ['QUEUE_URL']
+express_queue_url = os.environ['EXPRESS_QUEUE_URL']
+bulk_queue_url = os.environ['BULK_QUEUE_URL']
 
-LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
-logger = logging.getLogger()
+# Largest files sent to the express lane; video carries more bytes per minute than audio
+express_max_audio_size = int(os.environ.get('EXPRESS_MAX_AUDIO_SIZE', 100 * 1024 * 1024))
+express_max_video_size = int(os.environ.get('EXPRESS_MAX_VIDEO_SIZE', 500 * 1024 * 1024))
 
-if LOG_LEVEL == "DEBUG":
-    logger.setLevel(logging.DEBUG)
-elif LOG_LEVEL == "ERROR":
-    logger.setLevel(logging.ERROR)
-elif LOG_LEVEL == "WARN":
-    logger.setLevel(logging.WARN)
-else:
-    logger.setLevel(logging.INFO)
+logger = log_util.get_logger()
 
 def get_file_context(body):
     
@@ -40,10 +31,25 @@ def get_file_context(body):
     
     return file_context
 
+def get_lane(boxsdk, file_context, file_extension):
+    """
+    Small recordings go to the express queue so they never wait behind
+    multi-hour uploads sitting in the bulk queue.
+    """
+    if boxsdk.is_video(file_extension):
+        max_size = express_max_video_size
+    else:
+        max_size = express_max_audio_size
+
+    if file_context['file_size'] <= max_size:
+        return "express", express_queue_url
+
+    return "bulk", bulk_queue_url
+
 
 def lambda_handler(event, context):
-    logger.debug(f"skill->lambda_handler: Event: " + pformat(event))
-    logger.debug(f"skill->lambda_handler: Context: " + pformat(context))
+    log_util.log_payload(logger, 'event', "skill->lambda_handler: Event", event)
+    log_util.log_payload(logger, 'event', "skill->lambda_handler: Context", context)
 
     try:
         
@@ -109,7 +115,12 @@ def lambda_handler(event, context):
             file_context['request_id']
         )
 
-        sqs.send_message(
+        lane, queue_url = get_lane(boxsdk, file_context, file_extension)
+        file_context['lane'] = lane
+
+        logger.debug(f"queueing {file_context['file_size']} byte file on the {lane} lane")
+
+        aws_util.get_client('sqs').send_message(
             QueueUrl=queue_url,
             MessageBody=json.dumps(file_context)
         )
@@ -1,166 +1,379 @@
 import base64
-import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import parse_qsl
-import boto3
-from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Key, Attr
 import json
-import logging
 import os
-from pprint import pformat
-import uuid
 
-import ai_util,box_util
-
-dynamodb = boto3.resource('dynamodb')
+import ai_util,aws_util,batch_util,box_util,dedup_util,job_util,log_util,rate_util,resilience_util,transcript_util
 
 JOB_TABLE = os.environ['JOB_TABLE']
-job_table= dynamodb.Table(JOB_TABLE)
+DEDUP_TABLE = os.environ['DEDUP_TABLE']
 
-s3 = boto3.client('s3')
 storage_bucket = os.environ['STORAGE_BUCKET']
+transcribe_bucket = os.environ['TRANSCRIBE_BUCKET']
+
+worker_count = int(os.environ.get('WORKER_COUNT', 4))
+max_receive_count = int(os.environ.get('MAX_RECEIVE_COUNT', 3))
+max_deferrals = int(os.environ.get('MAX_DEFERRALS', 10))
 
-LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
-logger = logging.getLogger()
+# Jobs of these skills are low priority and summarized through Bedrock batch inference;
+# Box sends skill ids as strings, so ids configured as numbers match too
+low_priority_skills = {str(skill_id) for skill_id in json.loads(os.environ.get('LOW_PRIORITY_SKILLS') or '[]')}
 
-if LOG_LEVEL == "DEBUG":
-    logger.setLevel(logging.DEBUG)
-elif LOG_LEVEL == "ERROR":
-    logger.setLevel(logging.ERROR)
-elif LOG_LEVEL == "WARN":
-    logger.setLevel(logging.WARN)
-else:
-    logger.setLevel(logging.INFO)
+logger = log_util.get_logger()
+
+def get_jobs():
+    # Tables can't be shared between threads, so one per caller
+    return job_util.job_util(aws_util.get_table(JOB_TABLE), logger)
 
 def get_job_data(job_id):
-    results = job_table.query(KeyConditionExpression=Key("job_id").eq(job_id))
+    return to_job_data(get_jobs().get(job_id))
+
+def to_job_data(item):
+    # Transcribe reports every job in the account, not only the ones this skill started
+    if not item:
+        return None
     
     job_data = {}
     
     try:
-        item = results['Items'][0]
-        logger.debug("item: " + str(item))
+        log_util.log_payload(logger, 'job', "item", item)
 
         """
         'job_id': str(job_id),
+        'state': QUEUED through PUBLISHED or FAILED, see job_util, with '<state>_at' timestamps
+        'claimed_by': id of the message working on the job
         'job_uri': str(job_uri),
         'request_id': file_context['request_id'],
         'skill_id': file_context['skill_id'],
         'file_id': file_context['file_id'],
         'file_name': file_context['file_name'],
         'file_size': file_context['file_size'],
-        'file_read_token': file_context['file_read_token'],
-        'file_write_token': file_context['file_write_token'],
+        'file_read_token': file_context['file_read_token'], until the job is over
+        'file_write_token': file_context['file_write_token'], until the job is over
+        'content_hash': file_context['content_hash'],
+        'transcript_hash': content hash of an earlier upload whose transcript is reused, if any,
+        'file_version_id': file_context['file_version_id'],
+        'parent_job_id': job id of the whole recording, segment rows only
+        'segment_jobs', 'segment_starts', 'segment_overlap': parent rows only
         """
         
         job_data['job_id'] = item['job_id']
-        job_data['job_uri'] =  item['job_uri']
+        job_data['state'] = item['state']
+        job_data['job_uri'] =  item.get('job_uri', '')
         job_data['request_id'] =  item['request_id']
         job_data['skill_id'] =  item['skill_id']
         job_data['file_id'] =  item['file_id']
         job_data['file_name'] =  item['file_name']
         job_data['file_size'] =  item['file_size']
-        job_data['file_read_token'] =  item['file_read_token']
-        job_data['file_write_token'] =  item['file_write_token']
-        logger.debug("job_data: " + str(job_data))
+        job_data['file_read_token'] =  item.get('file_read_token', '')
+        job_data['file_write_token'] =  item.get('file_write_token', '')
+        job_data['content_hash'] = item.get('content_hash', '')
+        job_data['transcript_hash'] = item.get('transcript_hash', '')
+        job_data['file_version_id'] = item.get('file_version_id', '')
+        job_data['parent_job_id'] = item.get('parent_job_id', '')
+        job_data['segment_jobs'] = item.get('segment_jobs', [])
+        job_data['segment_starts'] = item.get('segment_starts', [])
+        job_data['segment_overlap'] = item.get('segment_overlap', 0)
+        log_util.log_payload(logger, 'job', "job_data", job_data)
         
     except Exception as e:
         logger.error(str(e))
-        logger.error(job_id + ' is not defined.')
-        raise Exception(f"{job_id} is not defined. {e}")
+        logger.error(item.get('job_id') + ' is not defined.')
+        raise Exception(f"{item.get('job_id')} is not defined. {e}")
 
     return job_data
 
+def start_summary(job_id, claim, from_batch=False):
+    """
+    Move a transcribed job to SUMMARIZING for the message claim. Returns the
+    job, or None when another message has it or it is already over; from_batch
+    takes over a job waiting on batch inference.
+    """
+    item = get_jobs().transition(
+        job_id,
+        job_util.job_util.SUMMARIZING,
+        # A quick job can finish before transcribe has marked it TRANSCRIBING
+        (job_util.job_util.UPLOADING, job_util.job_util.TRANSCRIBING),
+        claim=claim,
+        from_claim='batch' if from_batch else None
+    )
+
+    return to_job_data(item)
+
+def complete_segment(job_data, claim):
+    """
+    Mark a segment's transcript as ready. Returns the parent job once every
+    segment is, to exactly one caller, and None otherwise.
+    """
+    table = aws_util.get_table(JOB_TABLE)
+    parent_job_id = job_data['parent_job_id']
+
+    # Duplicate events of the segment stop here
+    if not get_jobs().transition(job_data['job_id'], job_util.job_util.SUMMARIZING, (job_util.job_util.UPLOADING, job_util.job_util.TRANSCRIBING), claim=claim):
+        return None
+
+    try:
+        # A string set makes a redelivered event count once
+        response = table.update_item(
+            Key={'job_id': parent_job_id},
+            UpdateExpression="ADD segments_done :segment",
+            ConditionExpression="attribute_exists(job_id)",
+            ExpressionAttributeValues={':segment': {job_data['job_id']}},
+            ReturnValues="ALL_NEW"
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        logger.info(f"{parent_job_id} is gone")
+        return None
+
+    parent = response['Attributes']
+
+    logger.info(f"{parent_job_id}: {len(parent['segments_done'])} of {len(parent['segment_jobs'])} segments done")
+
+    if len(parent['segments_done']) < len(parent['segment_jobs']):
+        return None
+
+    # The claim holds for redeliveries of this same message, which retry a failed summary
+    return start_summary(parent_job_id, claim)
 
-def delete_job_data(job_id):
-    job_table.delete_item(
-        Key={
-            'job_id': job_id
-        }
+def get_segmented_transcription(ai, job_data):
+    with ThreadPoolExecutor(max_workers=min(8, len(job_data['segment_jobs']))) as executor:
+        transcripts = list(executor.map(ai.get_transcription, job_data['segment_jobs']))
+
+    segments = [
+        (float(start), items)
+        for start, (transcript, items) in zip(job_data['segment_starts'], transcripts)
+    ]
+
+    entries = transcript_util.compact_transcript.from_items(
+        transcript_util.stitch_segments(segments, float(job_data['segment_overlap']))
     )
 
-def lambda_handler(event, context):
-    logger.debug(f"summarize->lambda_handler: Event: " + pformat(event))
-    logger.debug(f"summarize->lambda_handler: Context: " + pformat(context))
+    return entries.text(), entries
+
+def get_dedup():
+    return dedup_util.dedup_util(aws_util.get_table(DEDUP_TABLE), aws_util.get_client('s3'), transcribe_bucket, logger)
+
+def get_dedup_transcription(content_hash):
+    """
+    Return the transcript an earlier upload of the same content left in the
+    dedup index, for a job whose stored summaries were made with other settings
+    """
+    cached = get_dedup().lookup(content_hash)
+
+    if not cached:
+        raise Exception(f"dedup entry for {content_hash} is gone, the transcript can't be reused")
+
+    entries = transcript_util.compact_transcript.from_items(cached['items'])
+
+    return entries.text(), entries
+
+def queue_batch_summary(ai, job_data, transcription, entries, claim):
+    batch = batch_util.batch_util(aws_util.get_client('s3'), aws_util.get_client('bedrock'), transcribe_bucket, logger)
+    batch.queue(job_data['job_id'], ai.get_batch_requests(transcription, job_data['job_id'], transcript=entries))
+
+    # The job stays SUMMARIZING, handed to whichever message brings the batch results back
+    get_jobs().transition(job_data['job_id'], job_util.job_util.SUMMARIZING, (), claim='batch', from_claim=claim)
+
+def finish_job_rows(job_data, state):
+    """
+    Move a job and its segments to PUBLISHED or FAILED; returns whether the
+    job itself moved, False when a duplicate delivery finished it already
+    """
+    jobs = get_jobs()
+    finished = jobs.finish(job_data['job_id'], state)
+
+    for job_id in job_data['segment_jobs']:
+        jobs.finish(job_id, state)
+
+    return finished is not None
+
+def fail_job(ai, job_data):
+    job = ai.get_transcription_status(job_data['job_id'])['TranscriptionJob']
+    reason = job.get('FailureReason', 'unknown reason')
+
+    logger.error(f"transcription job {job_data['job_id']} failed: {reason}")
+
+    # Without this segment the recording can't be stitched, so fail the whole job
+    if job_data['parent_job_id']:
+        get_jobs().finish(job_data['job_id'], job_util.job_util.FAILED)
+        job_data = get_job_data(job_data['parent_job_id']) or job_data
+
+    if not finish_job_rows(job_data, job_util.job_util.FAILED):
+        logger.info(f"{job_data['job_id']} is already over, no error card")
+        return
+
+    box = box_util.box_util(
+        job_data['file_read_token'],
+        job_data['file_write_token'],
+        logger
+    )
+
+    box.send_error_card(
+        job_data['file_id'],
+        job_data['skill_id'],
+        box.skills_error_enum['FILE_PROCESSING_ERROR'],
+        f"Error transcribing file: {reason}",
+        job_data['request_id']
+    )
+
+def is_final_attempt(record):
+    receive_count = int(record.get('attributes', {}).get('ApproximateReceiveCount', 1))
+
+    return receive_count >= max_receive_count or aws_util.get_deferrals(record) >= max_deferrals
+
+def process_record(ai, record):
+
+    box = None
+    job_data = None
 
     try:
+        # Each message is a "Transcribe Job State Change" event forwarded by EventBridge,
+        # or one sent by the batch lambda carrying summaries or asking for them on demand
+        message = json.loads(record['body'])
+        detail = message['detail']
 
+        meeting_file = detail['TranscriptionJobName']
 
-        ai = ai_util.ai_util()
+        job_data = get_job_data(meeting_file)
 
-        for record in event['Records']:
+        if not job_data:
+            logger.info(f"ignoring transcription job {meeting_file}, it wasn't started by this skill")
+            return
 
-            s3_key = record['s3']['object']['key']
-            
-            if s3_key == 'meetings_summary/.write_access_check_file.temp':
-                logger.info(f"Received trigger for transcribe's permission check. Ignoring...")
-                return {
-                    'statusCode' : 200
-                }
-            
-            meeting_file = s3_key.replace("meetings_summary/","").replace(".json", "")
+        if job_data['state'] in job_util.job_util.final_states:
+            logger.info(f"ignoring transcription job {meeting_file}, it is already {job_data['state']}")
+            return
 
-            transcription, entries = ai.get_transcription(meeting_file)
+        if detail['TranscriptionJobStatus'] != 'COMPLETED':
+            fail_job(ai, job_data)
+            return
 
-            logger.debug(f"transcription {transcription}")
+        # Deferred messages come back under a new id, the first one holds the claim
+        claim = aws_util.get_message_id(record)
 
-            summary = ai.meeting_summarize(transcription,meeting_file)
+        if job_data['parent_job_id']:
+            job_data = complete_segment(job_data, claim)
+        else:
+            # Messages from the batch lambda take over jobs left waiting on batch inference
+            job_data = start_summary(job_data['job_id'], claim, from_batch='summaries' in message or message.get('on_demand'))
 
-            logger.debug(f"summary {summary}")
+        if not job_data:
+            logger.info(f"nothing left for message {claim} to do on {meeting_file}")
+            return
 
-            job_data = get_job_data(meeting_file)
+        if job_data['transcript_hash']:
+            transcription, entries = get_dedup_transcription(job_data['transcript_hash'])
+        elif job_data['segment_jobs']:
+            transcription, entries = get_segmented_transcription(ai, job_data)
+        else:
+            transcription, items = ai.get_transcription(meeting_file)
 
-            box = box_util.box_util(
-                job_data['file_read_token'],
-                job_data['file_write_token'],
-                logger    
-            )
+            # Parsed once here; cards, prompts and the dedup copy all read the compact form
+            entries = transcript_util.compact_transcript.from_items(items)
 
-            delete_cards = box.delete_status_card(job_data['file_id'])
+        log_util.log_payload(logger, 'transcript', "transcription", transcription)
 
-            logger.debug(f"delete cards {delete_cards}")
+        box = box_util.box_util(
+            job_data['file_read_token'],
+            job_data['file_write_token'],
+            logger    
+        )
 
-            summary_sent = box.update_skills_on_file(
-                job_data['file_id'],
-                job_data['skill_id'],
-                entries,
-                str(summary),
-                job_data['request_id']
-            )
-            
-            logger.debug(f"summary sent {summary_sent}")
+        # Partial summaries replace the "preparing to process" status while they stream in
+        progress = box_util.progress_card(box, job_data['file_id'], job_data['skill_id'], job_data['request_id'])
 
-            """transcript_sent = box.send_transcript_card(
-                job_data['file_id'],
-                job_data['skill_id'],
-                "Video Transcript",
-                str(transcription),
-                job_data['request_id']
-            )
-            
-            logger.debug(f"transcript sent {transcript_sent}")"""
+        if 'summaries' in message:
+            summary = message['summaries']
+        elif job_data['skill_id'] in low_priority_skills and not message.get('on_demand'):
+            queue_batch_summary(ai, job_data, transcription, entries, claim)
+            return
+        else:
+            summary = ai.meeting_summarize(transcription, job_data['job_id'], transcript=entries, on_progress=progress.update)
 
+        log_util.log_payload(logger, 'summary', "summary", summary)
 
-            delete_job_data(meeting_file)
+        delete_cards = box.delete_status_card(job_data['file_id'])
 
-        return {
-            'statusCode' : 200
-        }
-    except Exception as inst:
-        logger.exception(f"transcribe: Exception: {inst}")
+        log_util.log_payload(logger, 'card', "delete cards", delete_cards)
 
-        error_card = box.send_error_card(
+        summary_sent = box.update_skills_on_file(
             job_data['file_id'],
-            job_data['skill_id'], 
-            box.skills_error_enum['FILE_PROCESSING_ERROR'], 
-            f"Error summarizing file: {inst}", 
+            job_data['skill_id'],
+            entries,
+            summary,
             job_data['request_id']
         )
+        
+        log_util.log_payload(logger, 'card', "summary sent", summary_sent)
+
+        if job_data['content_hash']:
+            get_dedup().store(job_data['content_hash'], job_data['file_version_id'], summary, entries, ai.get_summary_settings())
+
+        """transcript_sent = box.send_transcript_card(
+            job_data['file_id'],
+            job_data['skill_id'],
+            "Video Transcript",
+            str(transcription),
+            job_data['request_id']
+        )
+        
+        logger.debug(f"transcript sent {transcript_sent}")"""
+
+
+        finish_job_rows(job_data, job_util.job_util.PUBLISHED)
+
+    except Exception as e:
+        # A dependency is down or Bedrock capacity is used up, have the message delivered again once
+        # it may be back, unless it never was
+        if isinstance(e, (resilience_util.circuit_open, rate_util.rate_limited)) and not is_final_attempt(record):
+            logger.warning(f"summarize: message {record['messageId']} deferred: {e}")
+            aws_util.delay_message(record, e.retry_in)
+            return
+
+        logger.exception(f"summarize: Exception on message {record['messageId']}: {e}")
+
+        # Earlier attempts are redelivered by SQS, only the last one reports the failure on the file
+        if job_data and is_final_attempt(record):
+            try:
+                finish_job_rows(job_data, job_util.job_util.FAILED)
+            except Exception as job_error:
+                logger.exception(f"summarize: unable to mark job {job_data['job_id']} failed: {job_error}")
+
+            try:
+                box = box or box_util.box_util(job_data['file_read_token'], job_data['file_write_token'], logger)
+
+                box.send_error_card(
+                    job_data['file_id'],
+                    job_data['skill_id'], 
+                    box.skills_error_enum['FILE_PROCESSING_ERROR'], 
+                    f"Error summarizing file: {e}", 
+                    job_data['request_id']
+                )
+            except Exception as card_error:
+                logger.exception(f"summarize: unable to send error card: {card_error}")
+
+        raise
+
+def lambda_handler(event, context):
+    log_util.log_payload(logger, 'event', "summarize->lambda_handler: Event", event)
+    log_util.log_payload(logger, 'event', "summarize->lambda_handler: Context", context)
+
+    ai = ai_util.ai_util()
+
+    records = event['Records']
+    batch_item_failures = []
+
+    # Records fail on their own; only the failed ones are delivered again
+    with ThreadPoolExecutor(max_workers=max(1, min(worker_count, len(records)))) as executor:
+        futures = {executor.submit(process_record, ai, record): record['messageId'] for record in records}
+
+        for future in as_completed(futures):
+            if future.exception():
+                batch_item_failures.append({"itemIdentifier": futures[future]})
+
+    logger.info(f"summarize: {len(records) - len(batch_item_failures)} of {len(records)} records handled")
 
-        return {
-            'statusCode' : 200,
-            'body' : str(e),
-            "headers": {
-                "Content-Type": "text/plain"
-            }
-        }
\ No newline at end of file
+    return {
+        "batchItemFailures": batch_item_failures
+    }
@@ -1,35 +1,41 @@
 import base64
-import boto3
-from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Key
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
-import logging
 import os
-from pprint import pformat
 from urllib.parse import parse_qsl
 
+import aws_util
 import box_util
 import ai_util
-
-dynamodb = boto3.resource('dynamodb')
+import s3_util
+import dedup_util
+import job_util
+import media_util
+import log_util
+import resilience_util
 
 JOB_TABLE = os.environ['JOB_TABLE']
-job_table= dynamodb.Table(JOB_TABLE)
+DEDUP_TABLE = os.environ['DEDUP_TABLE']
 
-s3 = boto3.client('s3')
 storage_bucket = os.environ['STORAGE_BUCKET']
+transcribe_bucket = os.environ['TRANSCRIBE_BUCKET']
+
+summarize_queue_url = os.environ['SUMMARIZE_QUEUE_URL']
+
+extract_audio = os.environ.get('EXTRACT_AUDIO', 'false').lower() == 'true'
+
+worker_count = int(os.environ.get('WORKER_COUNT', 4))
+max_receive_count = int(os.environ.get('MAX_RECEIVE_COUNT', 3))
+max_deferrals = int(os.environ.get('MAX_DEFERRALS', 10))
 
-LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
-logger = logging.getLogger()
+# Recordings at least SEGMENT_MIN_DURATION seconds long are transcribed as parallel segments
+segment_min_duration = int(os.environ.get('SEGMENT_MIN_DURATION', 0))
+segment_duration = int(os.environ.get('SEGMENT_DURATION', 600))
+segment_overlap = int(os.environ.get('SEGMENT_OVERLAP', 10))
+segment_concurrency = int(os.environ.get('SEGMENT_CONCURRENCY', 4))
 
-if LOG_LEVEL == "DEBUG":
-    logger.setLevel(logging.DEBUG)
-elif LOG_LEVEL == "ERROR":
-    logger.setLevel(logging.ERROR)
-elif LOG_LEVEL == "WARN":
-    logger.setLevel(logging.WARN)
-else:
-    logger.setLevel(logging.INFO)
+logger = log_util.get_logger()
 
 def get_file_context(body):
     
@@ -45,97 +51,366 @@ def get_file_context(body):
     
     return file_context
 
-def upload_file(file_name, file_contents):
-    
-    s3_upload = s3.put_object(Bucket=storage_bucket,Key=file_name,Body=file_contents)
+def upload_file(file_name, boxsdk, file_id, file_size, upload_id=None, on_start=None):
+
+    uploader = s3_util.s3_util(aws_util.get_client('s3'), storage_bucket, logger)
+
+    digest = hashlib.sha1()
+    offsets = []
+
+    def open_stream(offset):
+        offsets.append(offset)
+        return box_util.hashing_reader(boxsdk.get_file_reader(file_id, file_size, offset), digest)
+
+    s3_upload = uploader.upload_stream(file_name, open_stream, upload_id=upload_id, on_start=on_start)
+
+    logger.debug(f"s3_upload {s3_upload}")
+
+    # A resumed upload skips the bytes sent by the earlier attempt, so its digest is incomplete
+    content_hash = digest.hexdigest() if offsets == [0] else None
+
+    return s3_upload, content_hash
+
+def upload_audio(audio_name, boxsdk, media, file_id, start=None, duration=None, upload_id=None, on_start=None):
+
+    uploader = s3_util.s3_util(aws_util.get_client('s3'), storage_bucket, logger)
+
+    source_url = boxsdk.get_file_url(file_id)
+
+    s3_upload = uploader.upload_stream(
+        audio_name,
+        lambda offset: media.extract_audio(source_url, offset, start=start, duration=duration),
+        upload_id=upload_id,
+        on_start=on_start
+    )
 
     logger.debug(f"s3_upload {s3_upload}")
 
     return s3_upload
 
-def write_job(job_id, job_uri, file_context):
-    
+def send_to_summarize(job_id):
+    """
+    Hand a job to the summarize lambda the way a finished transcription does
+    """
+    message = {
+        'detail': {
+            'TranscriptionJobName': job_id,
+            'TranscriptionJobStatus': 'COMPLETED'
+        }
+    }
+
+    aws_util.get_client('sqs').send_message(QueueUrl=summarize_queue_url, MessageBody=json.dumps(message))
+
+def get_jobs():
+    # Tables can't be shared between threads, so one per caller
+    return job_util.job_util(aws_util.get_table(JOB_TABLE), logger)
+
+def get_job_attributes(file_context):
+    """
+    Attributes of the job row summarize needs
+    """
+    return {
+        'request_id': file_context['request_id'],
+        'skill_id': str(file_context['skill_id']),
+        'file_id': file_context['file_id'],
+        'file_name': file_context['file_name'],
+        'file_size': file_context['file_size'],
+        'file_read_token': file_context['file_read_token'],
+        'file_write_token': file_context['file_write_token'],
+        'content_hash': file_context.get('content_hash') or '',
+        'file_version_id': file_context.get('file_version_id') or ''
+    }
+
+def get_upload_id(row, file_context):
+    # Only the upload this job started, of this same version of the file, is resumed
+    if row.get('upload_version', '') == (file_context.get('file_version_id') or ''):
+        return row.get('upload_id')
+
+    return None
+
+def save_upload_id(job_id, file_context):
+    """
+    Return an on_start callback keeping a new upload's id on the job row
+    """
+    def on_start(upload_id):
+        get_jobs().update(job_id, {'upload_id': upload_id, 'upload_version': file_context.get('file_version_id') or ''})
+
+    return on_start
+
+def start_job(ai, job_id, meeting_file, sample_rate=None):
+    """
+    Start the Transcribe job of an UPLOADING row and mark it TRANSCRIBING
+    """
     try:
-        response = job_table.put_item(
-            Item={
-                'job_id': str(job_id),
-                'job_uri': str(job_uri),
-                'request_id': file_context['request_id'],
-                'skill_id': str(file_context['skill_id']),
-                'file_id': file_context['file_id'],
-                'file_name': file_context['file_name'],
-                'file_size': file_context['file_size'],
-                'file_read_token': file_context['file_read_token'],
-                'file_write_token': file_context['file_write_token'],
-            }
-        )
-        logger.info(f"Job {job_id} successfully added")
-    except ClientError as err:
-        logger.exception(
-            f"Couldn't write data: job_id {job_id}. Here's why: {err.response['Error']['Code']}: {err.response['Error']['Message']}",
+        ai.meeting_transcribe(meeting_file, sample_rate=sample_rate, job_unique_name=job_id)
+    except ai.transcribe.exceptions.ConflictException:
+        logger.info(f"job {job_id} already started")
+
+    # Summarize may have moved a quick job on already
+    get_jobs().transition(job_id, job_util.job_util.TRANSCRIBING, (job_util.job_util.UPLOADING,))
+
+def get_segments(boxsdk, media, file_id):
+    """
+    Return the (start, length) segments to transcribe separately, or None
+    when the recording is short enough for a single job.
+    """
+    if not segment_min_duration or not media.is_available():
+        return None
+
+    duration = media.get_duration(boxsdk.get_file_url(file_id))
+
+    logger.debug(f"file {file_id} runs {duration} seconds")
+
+    if duration is None or duration < segment_min_duration:
+        return None
+
+    return media_util.plan_segments(duration, segment_duration, segment_overlap)
+
+def transcribe_segments(ai, parent_job_id, segments, boxsdk, media, file_context, message_id):
+    """
+    Start one Transcribe job per segment of the recording.
+
+    The parent row lists the segment jobs and each segment row points back
+    to it; summarize stitches the transcripts once every segment is done.
+    Segment rows are claimed by the SQS message, so a redelivered message
+    resumes the same uploads and skips jobs that already started.
+    """
+    segment_jobs = [f"{parent_job_id}_part{index:03d}" for index in range(len(segments))]
+
+    get_jobs().update(parent_job_id, {
+        'job_uri': f"s3://{storage_bucket}/{parent_job_id}",
+        'segment_jobs': segment_jobs,
+        'segment_starts': [start for start, length in segments],
+        'segment_overlap': segment_overlap,
+        'content_hash': file_context.get('content_hash') or '',
+        'file_version_id': file_context.get('file_version_id') or ''
+    })
+
+    def start_segment(index):
+        start, length = segments[index]
+        job_id = segment_jobs[index]
+        audio_name = media.get_audio_name(job_id)
+
+        jobs = get_jobs()
+
+        # The row has to exist before the job can finish and trigger summarize
+        jobs.create(job_id, {
+            **get_job_attributes(file_context),
+            'job_uri': f"s3://{storage_bucket}/{audio_name}",
+            'parent_job_id': parent_job_id
+        })
+
+        row = jobs.transition(job_id, job_util.job_util.UPLOADING, (job_util.job_util.QUEUED,), claim=message_id)
+
+        if not row:
+            logger.info(f"segment job {job_id} already started")
+            return
+
+        upload_audio(
+            audio_name,
+            boxsdk,
+            media,
+            file_context['file_id'],
+            start=start,
+            duration=length,
+            upload_id=get_upload_id(row, file_context),
+            on_start=save_upload_id(job_id, file_context)
         )
-        raise
-    except Exception as e:
-        logger.exception(f"Error writing job_id {job_id} - {e}")
-        raise
 
-def lambda_handler(event, context):
-    logger.debug(f"transcribe->lambda_handler: Event: " + pformat(event))
-    logger.debug(f"transcribe->lambda_handler: Context: " + pformat(context))
+        start_job(ai, job_id, audio_name, sample_rate=media.sample_rate)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(segment_concurrency, len(segments)))) as executor:
+        # list() surfaces the first failure
+        list(executor.map(start_segment, range(len(segments))))
+
+    get_jobs().transition(parent_job_id, job_util.job_util.TRANSCRIBING, (job_util.job_util.UPLOADING,))
+
+    logger.info(f"file {file_context['file_id']} split into {len(segments)} segments under {parent_job_id}")
+
+def is_final_attempt(record):
+    receive_count = int(record.get('attributes', {}).get('ApproximateReceiveCount', 1))
+
+    return receive_count >= max_receive_count or aws_util.get_deferrals(record) >= max_deferrals
+
+def process_record(record):
+
+    boxsdk = None
+    file_context = None
+    job_id = None
 
     try:
-        
-        for record in event['Records']:
-            body = record['body']
+        body = record['body']
 
-            logger.debug("Body: " + str(body))
+        data = json.loads(body)
 
-            data = json.loads(body)
-    
-            file_context = get_file_context(data)
-            file_context['sqs_message_id'] = record['messageId']
+        log_util.log_payload(logger, 'record', "Body", data)
+
+        file_context = get_file_context(data)
+        # Deferred messages come back under a new id, the first one names and claims the job
+        message_id = aws_util.get_message_id(record)
+        file_context['sqs_message_id'] = message_id
+
+        boxsdk = box_util.box_util(
+            file_context['file_read_token'],
+            file_context['file_write_token'],
+            logger
+        )
+
+        ai = ai_util.ai_util()
+        jobs = get_jobs()
+
+        # Named after the message, so a redelivery finds the row it left behind
+        job_id = f"{ai.get_job_name(file_context['file_name'])}_{message_id[:8]}"
 
-            boxsdk = box_util.box_util(
-                file_context['file_read_token'],
-                file_context['file_write_token'],
-                logger
+        jobs.create(job_id, get_job_attributes(file_context))
+
+        row = jobs.transition(job_id, job_util.job_util.UPLOADING, (job_util.job_util.QUEUED,), claim=message_id)
+
+        if not row:
+            logger.info(f"job {job_id} is already past uploading, message {message_id} is a duplicate")
+            return
+
+        dedup = dedup_util.dedup_util(aws_util.get_table(DEDUP_TABLE), aws_util.get_client('s3'), transcribe_bucket, logger)
+
+        content_hash, file_version_id = boxsdk.get_file_hash(file_context['file_id'])
+
+        cached = dedup.lookup(content_hash) if content_hash else None
+
+        if cached and cached['summary_settings'] != ai.get_summary_settings():
+            # The cards were made for other templates or models, only the transcript still holds
+            jobs.update(job_id, {
+                'transcript_hash': content_hash,
+                'content_hash': content_hash,
+                'file_version_id': file_version_id or ''
+            })
+
+            send_to_summarize(job_id)
+
+            logger.info(f"file {file_context['file_id']} matches {content_hash}, summarizing its transcript again")
+            return
+
+        if cached:
+            boxsdk.delete_status_card(file_context['file_id'])
+
+            boxsdk.update_skills_on_file(
+                file_context['file_id'],
+                file_context['skill_id'],
+                cached['items'],
+                cached['summary'],
+                file_context['request_id']
             )
 
-            file_content = boxsdk.get_file_contents(file_context['file_id'])
+            jobs.finish(job_id, job_util.job_util.PUBLISHED)
 
-            upload = upload_file(file_context['file_name'], file_content)
+            logger.info(f"file {file_context['file_id']} matches {content_hash}, reused earlier results")
+            return
 
-            logger.debug(f"upload results: {upload}")
+        media = media_util.media_util(logger)
 
-            ai = ai_util.ai_util()
+        file_name, file_extension = os.path.splitext(file_context['file_name'])
 
-            job_id, job_uri = ai.meeting_transcribe(file_context['file_name'])
+        file_context['content_hash'] = content_hash
+        file_context['file_version_id'] = file_version_id
 
-            write_job(job_id, job_uri, file_context)
+        segments = get_segments(boxsdk, media, file_context['file_id'])
+
+        if segments:
+            transcribe_segments(ai, job_id, segments, boxsdk, media, file_context, message_id)
+            return
+
+        audio_only = extract_audio and boxsdk.is_video(file_extension)
+
+        if audio_only and not media.is_available():
+            logger.warning(f"audio extraction enabled but {media.ffmpeg_path} is missing, uploading the original file")
+            audio_only = False
+
+        if audio_only:
+            meeting_file = media.get_audio_name(job_id)
+            sample_rate = media.sample_rate
+
+            upload = upload_audio(
+                meeting_file,
+                boxsdk,
+                media,
+                file_context['file_id'],
+                upload_id=get_upload_id(row, file_context),
+                on_start=save_upload_id(job_id, file_context)
+            )
+            computed_hash = None
+        else:
+            # Keyed on the job, other uploads of a file with the same name can't get mixed in
+            meeting_file = f"{job_id}{file_extension}"
+            sample_rate = None
+
+            upload, computed_hash = upload_file(
+                meeting_file,
+                boxsdk,
+                file_context['file_id'],
+                file_context['file_size'],
+                upload_id=get_upload_id(row, file_context),
+                on_start=save_upload_id(job_id, file_context)
+            )
+
+        logger.debug(f"upload results: {upload}")
+
+        # Box reports no hash for some files, the upload may have computed one
+        if not file_context['content_hash']:
+            file_context['content_hash'] = computed_hash
+
+        jobs.update(job_id, {
+            'job_uri': f"s3://{storage_bucket}/{meeting_file}",
+            'content_hash': file_context['content_hash'] or '',
+            'file_version_id': file_context['file_version_id'] or ''
+        })
+
+        start_job(ai, job_id, meeting_file, sample_rate=sample_rate)
 
-        return {
-            "statusCode": 200,
-            "body": json.dumps({"message": "Transcription started"}),
-            "headers": {
-                "Content-Type": "application/json",
-            }
-        }
-        
     except Exception as e:
-        logger.exception(f"transcribe: Exception: {e}")
-        
-        error_card = boxsdk.send_error_card(
-            file_context['file_id'],
-            file_context['skill_id'], 
-            boxsdk.skills_error_enum['FILE_PROCESSING_ERROR'], 
-            f"Error transcribing file: {e}", 
-            file_context['request_id']
-        )
+        # Not the file's fault; come back once the dependency may have recovered, unless it never did
+        if isinstance(e, resilience_util.circuit_open) and not is_final_attempt(record):
+            logger.warning(f"transcribe: message {record['messageId']} deferred: {e}")
+            aws_util.delay_message(record, e.retry_in)
+            return
+
+        logger.exception(f"transcribe: Exception on message {record['messageId']}: {e}")
+
+        # Earlier attempts are redelivered by SQS, only the last one reports the failure on the file
+        if job_id and is_final_attempt(record):
+            try:
+                get_jobs().finish(job_id, job_util.job_util.FAILED)
+            except Exception as job_error:
+                logger.exception(f"transcribe: unable to mark job {job_id} failed: {job_error}")
+
+        if boxsdk and is_final_attempt(record):
+            try:
+                boxsdk.send_error_card(
+                    file_context['file_id'],
+                    file_context['skill_id'], 
+                    boxsdk.skills_error_enum['FILE_PROCESSING_ERROR'], 
+                    f"Error transcribing file: {e}", 
+                    file_context['request_id']
+                )
+            except Exception as card_error:
+                logger.exception(f"transcribe: unable to send error card: {card_error}")
+
+        raise
+
+def lambda_handler(event, context):
+    log_util.log_payload(logger, 'event', "transcribe->lambda_handler: Event", event)
+    log_util.log_payload(logger, 'event', "transcribe->lambda_handler: Context", context)
+
+    records = event['Records']
+    batch_item_failures = []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(worker_count, len(records)))) as executor:
+        futures = {executor.submit(process_record, record): record['messageId'] for record in records}
+
+        for future in as_completed(futures):
+            if future.exception():
+                batch_item_failures.append({"itemIdentifier": futures[future]})
+
+    logger.info(f"transcribe: {len(records) - len(batch_item_failures)} of {len(records)} records started")
 
-        return {
-            'statusCode' : 200,
-            'body' : str(e),
-            "headers": {
-                "Content-Type": "text/plain"
-            }
-        }
\ No newline at end of file
+    return {
+        "batchItemFailures": batch_item_failures
+    }
\ No newline at end of file
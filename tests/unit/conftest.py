@@ -0,0 +1,6 @@
+import os
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'lambdas', 'shared')
+
+sys.path.insert(0, os.path.abspath(LAMBDA_DIR))
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import ai_util
+
+RULES = [
+    {'max_input_tokens': 1000, 'model_id': 'anthropic.claude-instant-v1', 'output_tokens': 150},
+    {'max_input_tokens': 100000, 'model_id': 'anthropic.claude-v2:1', 'output_tokens': 600}
+]
+
+
+@pytest.fixture
+def ai(monkeypatch):
+    monkeypatch.setenv('TRANSCRIBE_BUCKET', 'transcripts')
+    monkeypatch.setenv('STORAGE_BUCKET', 'recordings')
+    monkeypatch.setenv('MODEL_RULES', json.dumps(RULES))
+    monkeypatch.setenv('SUMMARY_TEMPLATES', 'summary,speakers')
+    return ai_util.ai_util()
+
+
+def words(tokens):
+    # estimate_tokens counts about four characters per token
+    return 'word' * tokens
+
+
+def test_route_picks_first_rule_that_fits(ai):
+    assert ai.route(500) == {'model_id': 'anthropic.claude-instant-v1', 'output_tokens': 150}
+    assert ai.route(1001) == {'model_id': 'anthropic.claude-v2:1', 'output_tokens': 600}
+    assert ai.route(100001) is None
+
+
+def test_output_budget_scales_with_the_rule(ai):
+    short = ai.get_summary_prompts(words(100), 'All Hands.mp4')
+    long = ai.get_summary_prompts(words(5000), 'All Hands.mp4')
+
+    assert [request['token_count'] for request in short] == [150, 300]
+    assert [request['token_count'] for request in long] == [600, 1200]
+    assert {request['model_id'] for request in long} == {'anthropic.claude-v2:1'}
+
+
+def test_transcript_over_every_rule_is_condensed_in_chunks(ai, monkeypatch):
+    condensed = []
+
+    def map_reduce_summarize(content, jname, transcript, model_id):
+        condensed.append(len(content))
+        return words(200)
+
+    monkeypatch.setattr(ai, 'map_reduce_summarize', map_reduce_summarize)
+
+    requests = ai.get_summary_prompts(words(200000), 'All Hands.mp4')
+
+    assert condensed == [800000]
+    # Routed again on the length of the partial summaries
+    assert requests[0]['model_id'] == 'anthropic.claude-instant-v1'
+    assert '<partial summaries>' in requests[0]['prompt']
@@ -0,0 +1,49 @@
+import aws_util
+
+
+class FakeSQS:
+
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, **message):
+        self.messages.append(message)
+
+
+def make_record(**attributes):
+    return {
+        'messageId': 'message-2',
+        'body': '{"file_id": "42"}',
+        'eventSourceARN': 'arn:aws:sqs:us-east-1:123456789012:TranscribeExpressQueue',
+        'messageAttributes': {
+            name: {'stringValue': value, 'dataType': 'String'} for name, value in attributes.items()
+        }
+    }
+
+
+def test_delayed_message_keeps_its_first_id_and_counts_deferrals(monkeypatch):
+    sqs = FakeSQS()
+    monkeypatch.setattr(aws_util, 'get_client', lambda name, **config: sqs)
+
+    aws_util.delay_message(make_record(), 0.3)
+    aws_util.delay_message(make_record(original_message_id='message-1', deferrals='2'), 5000)
+
+    first, second = sqs.messages
+
+    assert first['QueueUrl'] == 'https://sqs.us-east-1.amazonaws.com/123456789012/TranscribeExpressQueue'
+    assert first['MessageBody'] == '{"file_id": "42"}'
+    # Under a second is rounded up, not down to an immediate redelivery
+    assert first['DelaySeconds'] == 1
+    assert first['MessageAttributes']['original_message_id']['StringValue'] == 'message-2'
+    assert first['MessageAttributes']['deferrals']['StringValue'] == '1'
+
+    assert second['DelaySeconds'] == aws_util.max_delay_seconds
+    assert second['MessageAttributes']['original_message_id']['StringValue'] == 'message-1'
+    assert second['MessageAttributes']['deferrals']['StringValue'] == '3'
+
+
+def test_record_ids_and_deferrals():
+    assert aws_util.get_message_id(make_record()) == 'message-2'
+    assert aws_util.get_message_id(make_record(original_message_id='message-1')) == 'message-1'
+    assert aws_util.get_deferrals(make_record()) == 0
+    assert aws_util.get_deferrals(make_record(deferrals='4')) == 4
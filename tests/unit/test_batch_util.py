@@ -0,0 +1,162 @@
+import datetime
+import io
+import json
+import logging
+from types import SimpleNamespace
+
+import batch_util
+
+MODEL = 'anthropic.claude-v2:1'
+
+
+class FakeBody(io.BytesIO):
+
+    def iter_lines(self):
+        return iter(self.read().splitlines())
+
+
+class FakePaginator:
+
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def paginate(self, Bucket, Prefix):
+        yield {'Contents': [
+            {'Key': key, 'LastModified': self.s3.modified[key]}
+            for key in sorted(self.s3.objects) if key.startswith(Prefix)
+        ]}
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class FakeS3:
+
+    exceptions = SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self, now):
+        self.now = now
+        self.objects = {}
+        self.modified = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body
+        self.modified[Key] = self.now
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        return {'Body': FakeBody(self.objects[Key])}
+
+    def delete_object(self, Bucket, Key):
+        del self.objects[Key]
+
+    def get_paginator(self, name):
+        return FakePaginator(self)
+
+
+NOW = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_batch(invoke, **kwargs):
+    s3 = FakeS3(NOW)
+    backend = batch_util.local_batch_backend(s3, invoke)
+    batch = batch_util.batch_util(s3, backend, 'bucket', logging.getLogger(), role_arn='arn:aws:iam::123456789012:role/batch', **kwargs)
+    return batch, backend
+
+
+def queue_jobs(batch, count):
+    for n in range(count):
+        batch.queue(f"job-{n}", [
+            {'title': title, 'model_id': MODEL, 'body': {'prompt': f"{title} of job-{n}"}}
+            for title in ('Summary', 'Brief')
+        ])
+
+
+def echo(model_id, body):
+    return {'completion': body['prompt'].upper()}
+
+
+def get_completion(model_id, output):
+    return output['completion']
+
+
+def finish(batch, backend):
+    job_arn, = backend.jobs
+
+    while backend.get_model_invocation_job(jobIdentifier=job_arn)['status'] != 'Completed':
+        pass
+
+    return batch.get_results(job_arn, get_completion)
+
+
+def test_full_batch_fans_results_out_to_jobs():
+    batch, backend = make_batch(echo, min_records=4)
+    queue_jobs(batch, 3)
+
+    assert batch.submit(NOW) == []
+    assert not batch.list_pending()
+
+    status, results, failed = finish(batch, backend)
+
+    assert status == 'Completed'
+    assert failed == []
+    assert results['job-2'] == {'Summary': 'SUMMARY OF JOB-2', 'Brief': 'BRIEF OF JOB-2'}
+
+
+def test_short_batch_waits_then_goes_on_demand():
+    batch, backend = make_batch(echo, min_records=100, max_wait_minutes=60)
+    queue_jobs(batch, 2)
+
+    assert batch.submit(NOW + datetime.timedelta(minutes=30)) == []
+    assert len(batch.list_pending()[MODEL]) == 2
+
+    assert batch.submit(NOW + datetime.timedelta(minutes=90)) == ['job-0', 'job-1']
+    assert not batch.list_pending()
+    assert not backend.jobs
+
+
+def test_failed_record_fails_its_whole_job():
+    def invoke(model_id, body):
+        if body['prompt'] == 'Brief of job-1':
+            return None
+        return echo(model_id, body)
+
+    batch, backend = make_batch(invoke, min_records=1)
+    queue_jobs(batch, 2)
+    batch.submit(NOW)
+
+    # Bedrock leaves modelOutput out of records that failed
+    original_run = backend.run
+
+    def run(job):
+        original_run(job)
+        for key, body in batch.s3.objects.items():
+            if key.endswith('.out'):
+                lines = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+                for record in lines:
+                    if record['modelOutput'] is None:
+                        del record['modelOutput']
+                        record['error'] = {'errorCode': 400}
+                batch.s3.objects[key] = "\n".join(json.dumps(record) for record in lines).encode('utf-8')
+
+    backend.run = run
+
+    status, results, failed = finish(batch, backend)
+
+    assert failed == ['job-1']
+    assert list(results) == ['job-0']
+
+
+def test_batch_job_without_manifest_is_skipped():
+    batch, backend = make_batch(echo, min_records=1)
+    queue_jobs(batch, 1)
+    batch.submit(NOW)
+
+    for key in [key for key in batch.s3.objects if key.endswith('.manifest.json')]:
+        batch.s3.delete_object(Bucket='bucket', Key=key)
+
+    status, results, failed = finish(batch, backend)
+
+    assert (results, failed) == ({}, [])
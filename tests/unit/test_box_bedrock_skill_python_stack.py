@@ -13,3 +13,49 @@ def test_sqs_queue_created():
 #     template.has_resource_properties("AWS::SQS::Queue", {
 #         "VisibilityTimeout": 300
 #     })
+
+
+def test_transcribe_queue_reports_batch_item_failures():
+    app = core.App()
+    stack = BoxBedrockSkillPythonStack(app, "box-bedrock-skill-python")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "FunctionResponseTypes": ["ReportBatchItemFailures"]
+    })
+    template.has_resource_properties("AWS::SQS::Queue", {
+        "QueueName": "TranscribeExpressQueue",
+        "RedrivePolicy": assertions.Match.object_like({
+            "maxReceiveCount": 3
+        })
+    })
+
+
+def test_bulk_lane_has_limited_concurrency():
+    app = core.App()
+    stack = BoxBedrockSkillPythonStack(app, "box-bedrock-skill-python")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::SQS::Queue", {
+        "QueueName": "TranscribeBulkQueue",
+        "VisibilityTimeout": 90 * 60
+    })
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "BatchSize": 1,
+        "ScalingConfig": {"MaximumConcurrency": 2}
+    })
+
+
+def test_summarize_runs_on_transcribe_job_state_changes():
+    app = core.App()
+    stack = BoxBedrockSkillPythonStack(app, "box-bedrock-skill-python")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::Events::Rule", {
+        "EventPattern": {
+            "source": ["aws.transcribe"],
+            "detail-type": ["Transcribe Job State Change"],
+            "detail": {"TranscriptionJobStatus": ["COMPLETED", "FAILED"]}
+        }
+    })
+    template.resource_count_is("Custom::S3BucketNotifications", 0)
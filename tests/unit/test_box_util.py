@@ -0,0 +1,111 @@
+import base64
+import datetime
+import hashlib
+import hmac
+import logging
+
+import box_util
+
+PRIMARY_KEY = 'primary-key'
+SECONDARY_KEY = 'secondary-key'
+BODY = b'{"type": "skill_invocation"}'
+
+
+def sign(body, timestamp, key):
+    digest = hmac.new(key.encode('utf-8'), body + timestamp.encode('utf-8'), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def make_headers(timestamp=None, primary_key=PRIMARY_KEY, secondary_key=SECONDARY_KEY):
+    if timestamp is None:
+        timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+
+    return {
+        'BOX-DELIVERY-ID': 'f96bb54b-ee16-4fc5-aa65-8c2d9e5b546f',
+        'BOX-DELIVERY-TIMESTAMP': timestamp,
+        'BOX-SIGNATURE-ALGORITHM': 'HmacSHA256',
+        'BOX-SIGNATURE-VERSION': '1',
+        'BOX-SIGNATURE-PRIMARY': sign(BODY, timestamp, primary_key),
+        'BOX-SIGNATURE-SECONDARY': sign(BODY, timestamp, secondary_key),
+    }
+
+
+def make_box(monkeypatch):
+    monkeypatch.setenv('BOX_KEY_1', PRIMARY_KEY)
+    monkeypatch.setenv('BOX_KEY_2', SECONDARY_KEY)
+    return box_util.box_util('read-token', 'write-token', logging.getLogger())
+
+
+def test_launch_safe_with_valid_signature(monkeypatch):
+    box = make_box(monkeypatch)
+
+    assert box.is_launch_safe(BODY, make_headers())
+
+
+def test_launch_safe_with_rotated_primary_key(monkeypatch):
+    box = make_box(monkeypatch)
+
+    assert box.is_launch_safe(BODY, make_headers(primary_key='old-key'))
+
+
+def test_launch_unsafe_with_tampered_body(monkeypatch):
+    box = make_box(monkeypatch)
+
+    assert not box.is_launch_safe(BODY + b' ', make_headers())
+
+
+def test_launch_unsafe_when_delivery_is_stale(monkeypatch):
+    box = make_box(monkeypatch)
+    stale = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=11)
+
+    assert not box.is_launch_safe(BODY, make_headers(timestamp=stale.isoformat(timespec='seconds')))
+
+
+def test_clients_are_created_lazily(monkeypatch):
+    box = make_box(monkeypatch)
+
+    assert box._read_client is None
+    assert box._write_client is None
+    assert box._old_client is None
+
+
+def test_transcript_policy_per_skill(monkeypatch):
+    monkeypatch.setenv('TRANSCRIPT_MAX_ENTRIES', '200')
+    monkeypatch.setenv('TRANSCRIPT_POLICIES', '{"1234": {"policy": "speaker"}}')
+    box = make_box(monkeypatch)
+
+    assert box.get_transcript_policy('1234') == {'policy': 'speaker', 'window_seconds': 1.0, 'max_entries': 200}
+    assert box.get_transcript_policy('5678')['policy'] == 'window'
+
+
+def test_summary_card_codes(monkeypatch):
+    box = make_box(monkeypatch)
+
+    assert box.get_summary_card_code('Summary') == 'summary-card'
+    assert box.get_summary_card_code('Follow ups') == 'summary-card-follow-ups'
+
+
+class FakeStatusBox:
+
+    def __init__(self):
+        self.logger = logging.getLogger()
+        self.statuses = []
+
+    def send_processing_card(self, file_id, skill_id, title, status, invocation_id):
+        self.statuses.append(status)
+
+
+def test_progress_card_is_throttled():
+    box = FakeStatusBox()
+    progress = box_util.progress_card(box, '1', '2', '3', interval=60, max_length=20)
+
+    progress.update('Summary', 'The team')
+    progress.update('Summary', 'The team agreed')
+    progress.update('Follow ups', 'Ana sends the notes to everyone')
+
+    assert box.statuses == ['The team...']
+
+    progress.last_sent -= 60
+    progress.update('Summary', 'The team agreed to ship')
+
+    assert box.statuses[-1] == 'Summary: The team ag...'
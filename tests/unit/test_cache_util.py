@@ -0,0 +1,106 @@
+import datetime
+import io
+import logging
+from types import SimpleNamespace
+
+import cache_util
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class FakeS3:
+
+    exceptions = SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+        self.modified = {}
+        self.now = datetime.datetime.now(datetime.timezone.utc)
+
+    def put_object(self, Bucket, Key, Body, ContentType, Metadata):
+        self.objects[Key] = (Body, Metadata)
+        self.modified[Key] = self.now
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        body, metadata = self.objects[Key]
+        return {'Body': io.BytesIO(body), 'Metadata': metadata, 'LastModified': self.modified[Key]}
+
+    def copy_object(self, Bucket, Key, CopySource, ContentType, Metadata, MetadataDirective):
+        self.put_object(Bucket, Key, self.objects[CopySource['Key']][0], ContentType, Metadata)
+
+    def delete_objects(self, Bucket, Delete):
+        for entry in Delete['Objects']:
+            del self.objects[entry['Key']]
+
+    def get_paginator(self, name):
+        return SimpleNamespace(paginate=lambda Bucket, Prefix: [{'Contents': [
+            {'Key': key, 'Size': len(body), 'LastModified': self.modified[key]}
+            for key, (body, metadata) in self.objects.items() if key.startswith(Prefix)
+        ]}])
+
+
+BODY = {'prompt': 'Summarize', 'max_tokens_to_sample': 150, 'temperature': 0}
+
+
+def make_cache(**kwargs):
+    return cache_util.cache_util(FakeS3(), 'bucket', logging.getLogger(), **kwargs)
+
+
+def test_key_ignores_key_order_and_tracks_parameters():
+    cache = make_cache()
+    key = cache.get_key('anthropic.claude-v2:1', BODY, '1')
+
+    assert key == cache.get_key('anthropic.claude-v2:1', dict(reversed(list(BODY.items()))), '1')
+    assert key != cache.get_key('anthropic.claude-v2:1', {**BODY, 'temperature': 0.5}, '1')
+    assert key != cache.get_key('anthropic.claude-v2:1', BODY, '2')
+    assert key.startswith(cache_util.cache_util.key_prefix)
+
+
+def test_lookup_counts_hits_and_misses(capsys):
+    cache = make_cache(ttl_days=1)
+    key = cache.get_key('anthropic.claude-v2:1', BODY, '1')
+
+    assert cache.lookup(key) is None
+
+    cache.store(key, 'anthropic.claude-v2:1', 'A short meeting.')
+
+    assert cache.lookup(key) == 'A short meeting.'
+    assert cache.lookup(key, refresh=True) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert '"BedrockCacheHit": 1' in capsys.readouterr().out
+
+
+def test_expired_and_oversized_entries_miss():
+    cache = make_cache(ttl_days=1, max_entry_bytes=10)
+    key = cache.get_key('anthropic.claude-v2:1', BODY, '1')
+
+    cache.store(key, 'anthropic.claude-v2:1', 'A completion too long to cache.')
+
+    assert key not in cache.s3.objects
+
+    cache.store(key, 'anthropic.claude-v2:1', 'Short.')
+    cache.s3.objects[key][1]['expires-at'] = '0'
+
+    assert cache.lookup(key) is None
+
+
+def test_least_recently_used_entries_are_evicted_over_max_bytes():
+    cache = make_cache(ttl_days=30, max_bytes=20, sweep_minutes=0)
+    keys = [cache.get_key('anthropic.claude-v2:1', {**BODY, 'prompt': str(n)}, '1') for n in range(3)]
+    day = datetime.timedelta(days=1)
+    cache.s3.now -= 10 * day
+
+    for key in keys[:2]:
+        cache.store(key, 'anthropic.claude-v2:1', 'Ten bytes.')
+        cache.s3.now += 2 * day
+
+    # A hit on a stale entry makes it the most recently used
+    assert cache.lookup(keys[0]) == 'Ten bytes.'
+
+    cache.store(keys[2], 'anthropic.claude-v2:1', 'Ten bytes.')
+
+    assert sorted(cache.s3.objects) == sorted([keys[0], keys[2]])
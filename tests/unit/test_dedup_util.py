@@ -0,0 +1,104 @@
+import io
+import logging
+import time
+from types import SimpleNamespace
+
+import dedup_util
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class FakeTable:
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key['content_hash'])
+        return {'Item': item} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item['content_hash']] = Item
+
+    def delete_item(self, Key):
+        self.items.pop(Key['content_hash'], None)
+
+
+class FakeS3:
+
+    exceptions = SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body.read()
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        return {'Body': io.BytesIO(self.objects[Key])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+ITEMS = [{'type': 'pronunciation', 'start_time': '0.5', 'alternatives': [{'content': 'Hello'}]}]
+
+
+def make_dedup(ttl_days=30):
+    return dedup_util.dedup_util(FakeTable(), FakeS3(), 'bucket', logging.getLogger(), ttl_days=ttl_days)
+
+
+def test_lookup_returns_stored_results():
+    dedup = make_dedup()
+
+    assert dedup.lookup('abc') is None
+
+    dedup.store('abc', '42', 'A short meeting.', iter(ITEMS))
+
+    cached = dedup.lookup('abc')
+
+    assert cached['summary'] == 'A short meeting.'
+    assert list(cached['items']) == ITEMS
+    assert list(cached['items']) == ITEMS
+
+
+def test_expired_entry_is_evicted():
+    dedup = make_dedup()
+    dedup.store('abc', '42', 'A short meeting.', ITEMS)
+    dedup.table.items['abc']['expires_at'] = int(time.time()) - 1
+
+    assert dedup.lookup('abc') is None
+    assert dedup.table.items == {}
+    assert dedup.s3.objects == {}
+
+
+def test_entry_without_object_is_evicted():
+    dedup = make_dedup()
+    dedup.store('abc', '42', 'A short meeting.', ITEMS)
+    dedup.s3.objects.clear()
+
+    assert dedup.lookup('abc') is None
+    assert dedup.table.items == {}
+
+
+def test_summary_per_template_round_trips():
+    dedup = make_dedup()
+    summaries = {'Summary': 'A short meeting.', 'Follow ups': 'Ana sends the notes.'}
+    dedup.store('abc', '42', summaries, ITEMS)
+
+    assert dedup.lookup('abc')['summary'] == summaries
+
+
+def test_summary_settings_round_trip():
+    dedup = make_dedup()
+    settings = {'templates': ['summary', 'speakers'], 'model_rules': [{'model_id': 'anthropic.claude-v2:1'}]}
+
+    dedup.store('abc', '42', 'A short meeting.', ITEMS, settings)
+    dedup.store('older', '42', 'A short meeting.', ITEMS)
+
+    assert dedup.lookup('abc')['summary_settings'] == settings
+    assert dedup.lookup('older')['summary_settings'] is None
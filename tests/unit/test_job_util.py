@@ -0,0 +1,127 @@
+import logging
+import re
+from types import SimpleNamespace
+
+import job_util
+
+jobs_class = job_util.job_util
+
+
+class ConditionalCheckFailedException(Exception):
+    pass
+
+
+class FakeTable:
+    """
+    Evaluates the subset of update and condition expressions job_util writes
+    """
+
+    meta = SimpleNamespace(client=SimpleNamespace(exceptions=SimpleNamespace(
+        ConditionalCheckFailedException=ConditionalCheckFailedException
+    )))
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key, ConsistentRead=False):
+        item = self.items.get(Key['job_id'])
+        return {'Item': dict(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression):
+        if Item['job_id'] in self.items:
+            raise ConditionalCheckFailedException()
+        self.items[Item['job_id']] = dict(Item)
+
+    def matches(self, item, condition, names, values):
+        if item is None:
+            return False
+
+        for clause in condition.split(" OR "):
+            if clause == "attribute_exists(job_id)":
+                return True
+
+            within = re.match(r"#state IN \((.*)\)", clause)
+
+            if within:
+                if item['state'] in [values[key] for key in within.group(1).split(", ")]:
+                    return True
+                continue
+
+            state, claim = re.match(r"\(#state = (\S+) AND claimed_by = (\S+)\)", clause).groups()
+
+            if item['state'] == values[state] and item.get('claimed_by') == values[claim]:
+                return True
+
+        return False
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, ReturnValues=None):
+        item = self.items.get(Key['job_id'])
+
+        if not self.matches(item, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues):
+            raise ConditionalCheckFailedException()
+
+        sets, _, removes = UpdateExpression[len("SET "):].partition(" REMOVE ")
+
+        for assignment in re.split(r", (?![^(]*\))", sets):
+            name, value = assignment.split(" = ")
+            name = ExpressionAttributeNames.get(name, name)
+            default = re.match(r"if_not_exists\(\S+, (\S+)\)", value)
+
+            if default:
+                item.setdefault(name, ExpressionAttributeValues[default.group(1)])
+            else:
+                item[name] = ExpressionAttributeValues[value]
+
+        for name in filter(None, removes.split(", ")):
+            item.pop(name, None)
+
+        return {'Attributes': dict(item)}
+
+
+def make_jobs():
+    jobs = jobs_class(FakeTable(), logging.getLogger(), ttl_days=1)
+    jobs.create('job', {'file_id': '42', 'file_read_token': 'r', 'file_write_token': 'w'})
+    return jobs
+
+
+def test_job_moves_through_its_states_once():
+    jobs = make_jobs()
+
+    assert jobs.transition('job', jobs_class.UPLOADING, (jobs_class.QUEUED,), claim='message-1')
+    assert jobs.transition('job', jobs_class.TRANSCRIBING, (jobs_class.UPLOADING,))
+
+    # A second delivery of the same event finds the job moved on
+    assert jobs.transition('job', jobs_class.UPLOADING, (jobs_class.QUEUED,), claim='message-2') is None
+
+    row = jobs.transition('job', jobs_class.SUMMARIZING, (jobs_class.TRANSCRIBING,), claim='message-3')
+
+    assert row['claimed_by'] == 'message-3'
+    assert {'queued_at', 'uploading_at', 'transcribing_at', 'summarizing_at'} <= set(row)
+    assert row['expires_at'] - row['updated_at'] == 24 * 60 * 60
+
+
+def test_redelivered_message_resumes_its_claim():
+    jobs = make_jobs()
+
+    jobs.transition('job', jobs_class.UPLOADING, (jobs_class.QUEUED,), claim='message-1')
+    stamped = jobs.get('job')['uploading_at']
+
+    assert jobs.transition('job', jobs_class.UPLOADING, (jobs_class.QUEUED,), claim='message-1')['uploading_at'] == stamped
+    assert jobs.transition('job', jobs_class.UPLOADING, (jobs_class.QUEUED,), claim='message-2') is None
+
+
+def test_batch_hand_over_and_finish():
+    jobs = make_jobs()
+
+    jobs.transition('job', jobs_class.SUMMARIZING, (jobs_class.QUEUED,), claim='message-1')
+    jobs.transition('job', jobs_class.SUMMARIZING, (), claim='batch', from_claim='message-1')
+
+    # Only a message bringing batch results back takes the job over
+    assert jobs.transition('job', jobs_class.SUMMARIZING, (jobs_class.TRANSCRIBING,), claim='message-2') is None
+    assert jobs.transition('job', jobs_class.SUMMARIZING, (jobs_class.TRANSCRIBING,), claim='message-3', from_claim='batch')
+
+    row = jobs.finish('job', jobs_class.PUBLISHED)
+
+    assert row['state'] == jobs_class.PUBLISHED
+    assert 'file_write_token' not in row
+    assert jobs.finish('job', jobs_class.FAILED) is None
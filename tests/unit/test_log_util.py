@@ -0,0 +1,42 @@
+import json
+import logging
+
+import log_util
+
+
+class Unprintable:
+
+    def to_dict(self):
+        raise AssertionError("payload rendered while DEBUG is off")
+
+
+def make_logger(level):
+    logger = logging.getLogger('test_log_util')
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def test_payload_skipped_when_level_disabled():
+    log_util.log_payload(make_logger(logging.INFO), 'event', 'Event', Unprintable())
+
+
+def test_json_line_redacts_and_truncates():
+    record = logging.LogRecord('skill', logging.DEBUG, __file__, 1, "%s: %s", (
+        'Event',
+        log_util.payload({'token': {'read': 'secret'}, 'text': 'x' * 100}, max_length=40)
+    ), None)
+
+    entry = json.loads(log_util.json_formatter().format(record))
+
+    assert entry['level'] == 'DEBUG'
+    assert 'secret' not in entry['message']
+    assert entry['message'].endswith(f"[truncated, {entry['payload_size']} chars]")
+    assert entry['payload_size'] > 100
+
+
+def test_sampling_rate(monkeypatch):
+    monkeypatch.setattr(log_util, 'sample_rates', {'transcript': 0})
+
+    assert not log_util.is_sampled('transcript')
+    assert log_util.is_sampled('event')
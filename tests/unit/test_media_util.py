@@ -0,0 +1,66 @@
+import logging
+import os
+import stat
+
+import pytest
+
+import media_util
+
+
+def make_ffmpeg(tmp_path, script):
+    path = tmp_path / 'ffmpeg'
+    path.write_text(f"#!/bin/sh\n{script}\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def test_extract_audio_streams_output(tmp_path):
+    media = media_util.media_util(logging.getLogger(), ffmpeg_path=make_ffmpeg(tmp_path, "printf 0123456789"))
+
+    assert media.is_available()
+
+    reader = media.extract_audio('https://example.com/video.mp4', offset=4)
+
+    assert reader.read(100) == b'456789'
+    assert reader.read(100) == b''
+
+    reader.close()
+
+
+def test_extract_audio_raises_on_failure(tmp_path):
+    media = media_util.media_util(logging.getLogger(), ffmpeg_path=make_ffmpeg(tmp_path, "echo 'no audio' >&2; exit 1"))
+
+    reader = media.extract_audio('https://example.com/video.mp4')
+
+    with pytest.raises(RuntimeError, match='no audio'):
+        reader.read(100)
+
+    reader.close()
+
+
+def test_get_audio_name():
+    media = media_util.media_util(logging.getLogger(), ffmpeg_path=os.devnull)
+
+    assert media.get_audio_name('All_Hands.mp4_0a1b2c3d') == 'All_Hands.mp4_0a1b2c3d.flac'
+
+
+def test_extract_audio_passes_segment_bounds(tmp_path):
+    media = media_util.media_util(logging.getLogger(), ffmpeg_path=make_ffmpeg(tmp_path, 'printf "%s " "$@"'))
+
+    reader = media.extract_audio('https://example.com/video.mp4', start=600, duration=610)
+    arguments = reader.read(1000).decode().split()
+
+    assert arguments[arguments.index('-ss') + 1] == '600'
+    assert arguments[arguments.index('-t') + 1] == '610'
+    assert arguments.index('-t') < arguments.index('-i')
+
+    reader.close()
+
+
+def test_plan_segments_overlap_and_tail():
+    assert media_util.plan_segments(1500, 600, 10) == [(0, 610), (600, 610), (1200, 300)]
+
+    # A tail no longer than the overlap is folded into the previous segment
+    assert media_util.plan_segments(1205, 600, 10) == [(0, 610), (600, 605)]
+
+    assert media_util.plan_segments(300, 600, 10) == [(0, 300)]
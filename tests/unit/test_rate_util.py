@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+
+import pytest
+
+import rate_util
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_rate(store=None, **kwargs):
+    return rate_util.rate_util(store or rate_util.memory_store(), logging.getLogger(), **kwargs)
+
+
+def run_workers(rate, workers, calls, tokens):
+    admitted = []
+    lock = threading.Lock()
+
+    def work():
+        for _ in range(calls):
+            rate.acquire('anthropic.claude-v2:1', tokens)
+
+            with lock:
+                admitted.append(time.monotonic())
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    began = time.monotonic()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return began, sorted(admitted)
+
+
+def test_contending_workers_stay_within_rate():
+    store = rate_util.memory_store()
+
+    # 100 requests a second with room for a burst of 5
+    rate = make_rate(store, requests_per_minute=6000, tokens_per_minute=0, burst_seconds=0.05)
+
+    began, admitted = run_workers(rate, workers=40, calls=3, tokens=0)
+
+    assert len(admitted) == 120
+    assert admitted[-1] - began >= (120 - 5) / 100 * 0.9
+
+    # No half second admits more than its refill plus the burst
+    for index, start in enumerate(admitted):
+        window = [moment for moment in admitted[index:] if moment - start <= 0.5]
+        assert len(window) <= 50 + 5 + 2
+
+
+def test_tokens_per_minute_limits_large_requests():
+    clock = FakeClock()
+    rate = make_rate(requests_per_minute=600, tokens_per_minute=60000, burst_seconds=1, clock=clock.time, sleep=clock.sleep)
+
+    assert rate.acquire('model', 1000) == 0
+
+    # The bucket holds 1000 tokens and refills 1000 a second
+    assert rate.acquire('model', 500) == pytest.approx(0.5)
+
+
+def test_throttles_halve_the_rate_until_it_recovers():
+    clock = FakeClock()
+    rate = make_rate(requests_per_minute=60, tokens_per_minute=0, burst_seconds=1, clock=clock.time, sleep=clock.sleep)
+
+    rate.acquire('model')
+    rate.throttled('model')
+
+    assert rate.store.read('model')['scale'] == 0.5
+
+    # Half the rate means two seconds for the next request
+    assert rate.acquire('model') == pytest.approx(2, rel=0.05)
+
+    clock.now += 600
+
+    assert rate.refill(rate.store.read('model'), clock.now)['scale'] == 1.0
+
+
+def test_gives_up_after_max_wait():
+    clock = FakeClock()
+    rate = make_rate(requests_per_minute=1, tokens_per_minute=0, burst_seconds=1, max_wait_seconds=5, clock=clock.time, sleep=clock.sleep)
+
+    rate.acquire('model')
+
+    with pytest.raises(rate_util.rate_limited) as limited:
+        rate.acquire('model')
+
+    assert limited.value.retry_in > 5
@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pytest
+
+import resilience_util
+
+
+class FakeClientError(Exception):
+
+    def __init__(self, code, status=400, headers=None):
+        super().__init__(code)
+        self.response = {
+            'Error': {'Code': code},
+            'ResponseMetadata': {'HTTPStatusCode': status, 'HTTPHeaders': headers or {}}
+        }
+
+
+class FakeBoxError(Exception):
+
+    def __init__(self, status, headers=None):
+        super().__init__(status)
+        self.response_info = SimpleNamespace(status_code=status, headers=headers or {}, code=None)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_resilience(**policy):
+    clock = FakeClock()
+    resilience = resilience_util.resilience_util(
+        {'box': {'attempts': 3, 'base_delay': 1, 'max_delay': 20, 'failure_threshold': 2, 'reset_seconds': 30, **policy}},
+        clock=clock.time,
+        sleep=clock.sleep
+    )
+    return resilience, clock
+
+
+def failing(*errors, result='ok'):
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return call
+
+
+def test_transient_errors_are_retried_with_jittered_backoff():
+    resilience, clock = make_resilience()
+
+    assert resilience.call('box', failing(FakeBoxError(503), FakeClientError('ThrottlingException'))) == 'ok'
+
+    assert len(clock.sleeps) == 2
+    assert 0 <= clock.sleeps[0] <= 1 and 0 <= clock.sleeps[1] <= 2
+
+
+def test_box_retry_after_is_honoured_up_to_max_delay():
+    resilience, clock = make_resilience()
+
+    resilience.call('box', failing(FakeBoxError(429, {'Retry-After': '7'})))
+
+    assert clock.sleeps == [7]
+
+    with pytest.raises(FakeBoxError):
+        resilience.call('box', failing(FakeBoxError(429, {'retry-after': '60'})))
+
+
+def test_client_errors_are_not_retried_or_counted():
+    resilience, clock = make_resilience()
+
+    for _ in range(3):
+        with pytest.raises(FakeClientError):
+            resilience.call('box', failing(FakeClientError('ConditionalCheckFailedException')))
+
+    assert clock.sleeps == []
+    assert resilience.breakers['box'].state == 'closed'
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_good_trial(capsys):
+    resilience, clock = make_resilience(attempts=1)
+
+    for _ in range(2):
+        with pytest.raises(FakeBoxError):
+            resilience.call('box', failing(FakeBoxError(502)))
+
+    calls = []
+
+    with pytest.raises(resilience_util.circuit_open) as opened:
+        resilience.call('box', lambda: calls.append(1))
+
+    assert not calls
+    assert opened.value.retry_in == 30
+
+    clock.now += 30
+
+    assert resilience.call('box', failing()) == 'ok'
+    assert resilience.breakers['box'].state == 'closed'
+
+    out = capsys.readouterr().out
+    assert '"State": "open"' in out and '"State": "closed"' in out
+
+
+def test_throttles_pass_through_for_paced_callers():
+    resilience, clock = make_resilience()
+
+    with pytest.raises(FakeClientError):
+        resilience.call('box', failing(FakeClientError('ThrottlingException')), retry_throttles=False)
+
+    assert clock.sleeps == []
@@ -0,0 +1,135 @@
+import io
+import logging
+from types import SimpleNamespace
+
+import s3_util
+
+PART_SIZE = s3_util.s3_util.min_part_size
+
+
+class NoSuchUpload(Exception):
+    pass
+
+
+class FakeS3:
+
+    exceptions = SimpleNamespace(NoSuchUpload=NoSuchUpload)
+
+    def __init__(self):
+        self.uploads = {}
+        self.objects = {}
+        self.next_id = 0
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.next_id += 1
+        upload_id = str(self.next_id)
+        self.uploads[upload_id] = {'Key': Key, 'Initiated': self.next_id, 'Parts': {}}
+        return {'UploadId': upload_id}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker):
+        if UploadId not in self.uploads:
+            raise NoSuchUpload(UploadId)
+        parts = self.uploads[UploadId]['Parts']
+        return {'Parts': [
+            {'PartNumber': number, 'ETag': f"etag-{number}", 'Size': len(body)}
+            for number, body in sorted(parts.items()) if number > PartNumberMarker
+        ]}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        assert len(Body) <= PART_SIZE
+        self.uploads[UploadId]['Parts'][PartNumber] = Body
+        return {'ETag': f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)['Parts']
+        self.objects[Key] = b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+        return {'Key': Key}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body
+        return {'Key': Key}
+
+
+class FailingStream(io.BytesIO):
+
+    def __init__(self, data, fail_after):
+        super().__init__(data)
+        self.fail_after = fail_after
+
+    def read(self, size=-1):
+        if self.tell() >= self.fail_after:
+            raise IOError("connection reset")
+        return super().read(size)
+
+
+def test_upload_stream_splits_into_parts():
+    s3 = FakeS3()
+    data = bytes(range(256)) * (PART_SIZE * 2 // 256 + 100)
+    uploader = s3_util.s3_util(s3, 'bucket', logging.getLogger(), part_size=PART_SIZE)
+
+    uploader.upload_stream('meeting.mp4', lambda offset: io.BytesIO(data[offset:]))
+
+    assert s3.objects['meeting.mp4'] == data
+    assert s3.uploads == {}
+
+
+def test_upload_stream_resumes_unfinished_upload():
+    s3 = FakeS3()
+    data = b'x' * PART_SIZE + b'y' * PART_SIZE + b'z' * 10
+    uploader = s3_util.s3_util(s3, 'bucket', logging.getLogger(), part_size=PART_SIZE)
+
+    started = []
+
+    try:
+        uploader.upload_stream('meeting.mp4', lambda offset: FailingStream(data[offset:], PART_SIZE), on_start=started.append)
+    except IOError:
+        pass
+
+    offsets = []
+
+    def open_stream(offset):
+        offsets.append(offset)
+        return io.BytesIO(data[offset:])
+
+    uploader.upload_stream('meeting.mp4', open_stream, upload_id=started[0])
+
+    assert offsets == [PART_SIZE]
+    assert s3.objects['meeting.mp4'] == data
+
+
+def test_upload_stream_ignores_other_uploads_of_the_key():
+    s3 = FakeS3()
+    other = b'o' * PART_SIZE * 2
+    data = b'x' * PART_SIZE + b'z' * 10
+    uploader = s3_util.s3_util(s3, 'bucket', logging.getLogger(), part_size=PART_SIZE)
+
+    try:
+        uploader.upload_stream('meeting.mp4', lambda offset: FailingStream(other[offset:], PART_SIZE))
+    except IOError:
+        pass
+
+    offsets = []
+
+    def open_stream(offset):
+        offsets.append(offset)
+        return io.BytesIO(data[offset:])
+
+    # Neither a stranger's upload nor a finished one is resumed
+    uploader.upload_stream('meeting.mp4', open_stream)
+    uploader.upload_stream('meeting.mp4', open_stream, upload_id='gone')
+
+    assert offsets == [0, 0]
+    assert s3.objects['meeting.mp4'] == data
+
+
+def test_upload_stream_empty_file():
+    s3 = FakeS3()
+    uploader = s3_util.s3_util(s3, 'bucket', logging.getLogger())
+
+    uploader.upload_stream('empty.wav', lambda offset: io.BytesIO(b''))
+
+    assert s3.objects['empty.wav'] == b''
+    assert s3.uploads == {}
@@ -0,0 +1,240 @@
+import importlib
+import json
+import logging
+import os
+
+import pytest
+
+import job_util
+import rate_util
+import resilience_util
+from tests.unit.test_job_util import FakeTable
+
+HANDLER_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'lambdas', 'summarize')
+
+ENVIRONMENT = {
+    'JOB_TABLE': 'jobs',
+    'DEDUP_TABLE': 'dedup',
+    'STORAGE_BUCKET': 'recordings',
+    'TRANSCRIBE_BUCKET': 'transcripts',
+    'MAX_RECEIVE_COUNT': '3'
+}
+
+jobs_class = job_util.job_util
+
+
+class FakeBox:
+
+    skills_error_enum = {'FILE_PROCESSING_ERROR': 'FILE_PROCESSING_ERROR'}
+    cards = []
+
+    def __init__(self, read_token, write_token, logger):
+        pass
+
+    def delete_status_card(self, file_id):
+        pass
+
+    def update_skills_on_file(self, file_id, skill_id, items, summary, request_id):
+        FakeBox.cards.append((file_id, 'summary'))
+
+    def send_error_card(self, file_id, skill_id, error, message, request_id):
+        FakeBox.cards.append((file_id, 'error'))
+
+
+class FakeProgress:
+
+    def __init__(self, box, file_id, skill_id, request_id):
+        pass
+
+    def update(self, title, text):
+        pass
+
+
+class FakeAI:
+
+    # Transcripts that can't be read, by job id
+    errors = {}
+
+    def get_transcription(self, job_id):
+        if job_id in FakeAI.errors:
+            raise FakeAI.errors[job_id]
+        return "spk_0: Hello.", []
+
+    def get_transcription_status(self, job_id):
+        return {'TranscriptionJob': {'FailureReason': "unsupported media"}}
+
+    def meeting_summarize(self, transcription, job_id, transcript=None, on_progress=None):
+        return {'Summary': "A short meeting."}
+
+    def get_summary_settings(self):
+        return {'templates': ['summary']}
+
+
+class FakeDedup:
+
+    items = [{'type': 'pronunciation', 'start_time': '0.5', 'end_time': '0.9', 'alternatives': [{'content': 'Hello'}]}]
+    stored = []
+
+    def lookup(self, content_hash):
+        return {'summary': {'Summary': "Made with other templates."}, 'items': FakeDedup.items, 'summary_settings': None}
+
+    def store(self, content_hash, file_version_id, summary, items, summary_settings=None):
+        FakeDedup.stored.append((content_hash, summary, summary_settings))
+
+
+@pytest.fixture
+def summarize(monkeypatch):
+    for name, value in ENVIRONMENT.items():
+        monkeypatch.setenv(name, value)
+
+    monkeypatch.syspath_prepend(HANDLER_DIR)
+    module = importlib.import_module('summarize')
+
+    table = FakeTable()
+    delays = []
+    FakeBox.cards = []
+    FakeAI.errors = {}
+    FakeDedup.stored = []
+
+    monkeypatch.setattr(module, 'get_jobs', lambda: jobs_class(table, logging.getLogger()))
+    monkeypatch.setattr(module.box_util, 'box_util', FakeBox)
+    monkeypatch.setattr(module.box_util, 'progress_card', FakeProgress)
+    monkeypatch.setattr(module.ai_util, 'ai_util', FakeAI)
+    monkeypatch.setattr(module, 'get_dedup', FakeDedup)
+    monkeypatch.setattr(module.aws_util, 'delay_message', lambda record, seconds: delays.append((record['messageId'], seconds)))
+
+    module.table, module.delays = table, delays
+
+    return module
+
+
+def add_job(summarize, job_id, **attributes):
+    jobs = summarize.get_jobs()
+    jobs.create(job_id, {
+        'request_id': 'request',
+        'skill_id': 'skill',
+        'file_id': f"{job_id}-file",
+        'file_name': f"{job_id}.mp4",
+        'file_size': 1024,
+        'file_read_token': 'read',
+        'file_write_token': 'write',
+        **attributes
+    })
+    jobs.transition(job_id, jobs_class.TRANSCRIBING, (jobs_class.QUEUED,))
+
+
+def make_record(job_id, status='COMPLETED', receive_count=1):
+    body = {'detail': {'TranscriptionJobName': job_id, 'TranscriptionJobStatus': status}}
+
+    return {
+        'messageId': f"{job_id}-message",
+        'body': json.dumps(body),
+        'attributes': {'ApproximateReceiveCount': str(receive_count)}
+    }
+
+
+def get_state(summarize, job_id):
+    return summarize.table.items[job_id]['state']
+
+
+def test_completed_transcription_is_summarized_once(summarize):
+    add_job(summarize, 'meeting')
+
+    summarize.process_record(FakeAI(), make_record('meeting'))
+    # A duplicate of the state change event finds the job over
+    summarize.process_record(FakeAI(), make_record('meeting'))
+
+    assert get_state(summarize, 'meeting') == jobs_class.PUBLISHED
+    assert FakeBox.cards == [('meeting-file', 'summary')]
+
+
+def test_failed_transcription_fails_the_job(summarize):
+    add_job(summarize, 'meeting')
+
+    summarize.process_record(FakeAI(), make_record('meeting', status='FAILED'))
+
+    assert get_state(summarize, 'meeting') == jobs_class.FAILED
+    assert FakeBox.cards == [('meeting-file', 'error')]
+
+
+def test_transcription_jobs_of_others_are_ignored(summarize):
+    summarize.process_record(FakeAI(), make_record('someone-elses-job'))
+
+    assert summarize.table.items == {}
+    assert FakeBox.cards == []
+
+
+def test_batch_reports_only_failed_messages(summarize):
+    for job_id in ('good', 'broken', 'down', 'busy'):
+        add_job(summarize, job_id)
+
+    FakeAI.errors = {
+        'broken': RuntimeError("transcript is unreadable"),
+        'down': resilience_util.circuit_open('bedrock', 30),
+        'busy': rate_util.rate_limited("no capacity", 12)
+    }
+
+    event = {'Records': [make_record(job_id) for job_id in ('good', 'broken', 'down', 'busy')]}
+
+    response = summarize.lambda_handler(event, None)
+
+    assert sorted(failure['itemIdentifier'] for failure in response['batchItemFailures']) == ['broken-message']
+    assert get_state(summarize, 'good') == jobs_class.PUBLISHED
+    assert get_state(summarize, 'down') == jobs_class.SUMMARIZING
+    assert get_state(summarize, 'busy') == jobs_class.SUMMARIZING
+
+    # Unavailable dependencies push their messages back, the broken transcript is retried on the usual schedule
+    assert sorted(summarize.delays) == [('busy-message', 12), ('down-message', 30)]
+
+
+def test_job_fails_only_on_the_last_attempt(summarize):
+    add_job(summarize, 'broken')
+    FakeAI.errors = {'broken': RuntimeError("transcript is unreadable")}
+
+    with pytest.raises(RuntimeError):
+        summarize.process_record(FakeAI(), make_record('broken', receive_count=2))
+
+    assert get_state(summarize, 'broken') == jobs_class.SUMMARIZING
+    assert FakeBox.cards == []
+
+    with pytest.raises(RuntimeError):
+        summarize.process_record(FakeAI(), make_record('broken', receive_count=3))
+
+    assert get_state(summarize, 'broken') == jobs_class.FAILED
+    assert FakeBox.cards == [('broken-file', 'error')]
+
+
+def test_outage_fails_the_job_once_attempts_run_out(summarize):
+    add_job(summarize, 'down')
+    FakeAI.errors = {'down': resilience_util.circuit_open('bedrock', 30)}
+
+    with pytest.raises(resilience_util.circuit_open):
+        summarize.process_record(FakeAI(), make_record('down', receive_count=3))
+
+    assert summarize.delays == []
+    assert get_state(summarize, 'down') == jobs_class.FAILED
+    assert FakeBox.cards == [('down-file', 'error')]
+
+
+def test_throttled_job_fails_on_the_last_attempt(summarize):
+    add_job(summarize, 'busy')
+    FakeAI.errors = {'busy': rate_util.rate_limited("no capacity", 12)}
+
+    with pytest.raises(rate_util.rate_limited):
+        summarize.process_record(FakeAI(), make_record('busy', receive_count=summarize.max_receive_count))
+
+    assert summarize.delays == []
+    assert get_state(summarize, 'busy') == jobs_class.FAILED
+    assert FakeBox.cards == [('busy-file', 'error')]
+
+
+def test_reused_transcript_is_summarized_with_current_settings(summarize):
+    add_job(summarize, 'repeat', content_hash='sha1', transcript_hash='sha1')
+    # The transcript comes from the dedup index, not from Transcribe
+    FakeAI.errors = {'repeat': RuntimeError("no transcription job")}
+
+    summarize.process_record(FakeAI(), make_record('repeat'))
+
+    assert get_state(summarize, 'repeat') == jobs_class.PUBLISHED
+    assert FakeBox.cards == [('repeat-file', 'summary')]
+    assert FakeDedup.stored == [('sha1', {'Summary': "A short meeting."}, {'templates': ['summary']})]
@@ -0,0 +1,194 @@
+import importlib
+import json
+import logging
+import os
+
+import pytest
+
+import job_util
+import resilience_util
+from tests.unit.test_job_util import FakeTable
+
+HANDLER_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'lambdas', 'transcribe')
+
+ENVIRONMENT = {
+    'JOB_TABLE': 'jobs',
+    'DEDUP_TABLE': 'dedup',
+    'STORAGE_BUCKET': 'recordings',
+    'TRANSCRIBE_BUCKET': 'transcripts',
+    'MAX_RECEIVE_COUNT': '3',
+    'SUMMARIZE_QUEUE_URL': 'https://sqs.example/summarize'
+}
+
+SETTINGS = {'templates': ['summary'], 'model_rules': [], 'template_version': '1'}
+
+
+class FakeBox:
+
+    skills_error_enum = {'FILE_PROCESSING_ERROR': 'FILE_PROCESSING_ERROR'}
+    cards = []
+
+    def __init__(self, read_token, write_token, logger):
+        pass
+
+    def get_file_hash(self, file_id):
+        if file_id == 'broken':
+            raise RuntimeError("file is corrupt")
+        if file_id == 'down':
+            raise resilience_util.circuit_open('box', 30)
+        return f"sha1-{file_id}", 'v1'
+
+    def delete_status_card(self, file_id):
+        pass
+
+    def update_skills_on_file(self, file_id, skill_id, items, summary, request_id):
+        FakeBox.cards.append((file_id, 'summary'))
+
+    def send_error_card(self, file_id, skill_id, error, message, request_id):
+        FakeBox.cards.append((file_id, 'error'))
+
+
+class FakeAI:
+
+    def get_job_name(self, file_name):
+        return file_name.replace(" ", "_")
+
+    def get_summary_settings(self):
+        return SETTINGS
+
+
+class FakeDedup:
+    """
+    Every file was seen before, so a good record publishes without uploading
+    """
+
+    settings = SETTINGS
+
+    def __init__(self, table, s3, bucket, logger):
+        pass
+
+    def lookup(self, content_hash):
+        return {'summary': {'Summary': "Seen before."}, 'items': [], 'summary_settings': FakeDedup.settings}
+
+
+@pytest.fixture
+def transcribe(monkeypatch):
+    for name, value in ENVIRONMENT.items():
+        monkeypatch.setenv(name, value)
+
+    monkeypatch.syspath_prepend(HANDLER_DIR)
+    module = importlib.import_module('transcribe')
+
+    table = FakeTable()
+    delays, summarized = [], []
+    FakeBox.cards = []
+    FakeDedup.settings = SETTINGS
+
+    monkeypatch.setattr(module, 'get_jobs', lambda: job_util.job_util(table, logging.getLogger()))
+    monkeypatch.setattr(module.box_util, 'box_util', FakeBox)
+    monkeypatch.setattr(module.ai_util, 'ai_util', FakeAI)
+    monkeypatch.setattr(module.dedup_util, 'dedup_util', FakeDedup)
+    monkeypatch.setattr(module.aws_util, 'get_table', lambda name: None)
+    monkeypatch.setattr(module.aws_util, 'get_client', lambda name, **config: None)
+    monkeypatch.setattr(module.aws_util, 'delay_message', lambda record, seconds: delays.append((record['messageId'], seconds)))
+    monkeypatch.setattr(module, 'send_to_summarize', summarized.append)
+
+    module.table, module.delays, module.summarized = table, delays, summarized
+
+    return module
+
+
+def make_record(file_id, receive_count=1, deferrals=0):
+    body = {
+        'request_id': 'request',
+        'skill_id': 'skill',
+        'file_id': file_id,
+        'file_name': f"{file_id}.mp4",
+        'file_size': 1024,
+        'file_read_token': 'read',
+        'file_write_token': 'write'
+    }
+
+    record = {
+        'messageId': f"{file_id}-message",
+        'body': json.dumps(body),
+        'attributes': {'ApproximateReceiveCount': str(receive_count)},
+        'messageAttributes': {}
+    }
+
+    # delay_message sends a copy under a new id, carrying the first one
+    if deferrals:
+        record['messageId'] = f"{file_id}-copy-{deferrals}"
+        record['messageAttributes'] = {
+            'original_message_id': {'stringValue': f"{file_id}-message", 'dataType': 'String'},
+            'deferrals': {'stringValue': str(deferrals), 'dataType': 'Number'}
+        }
+
+    return record
+
+
+def states(transcribe):
+    return {item['file_id']: item['state'] for item in transcribe.table.items.values()}
+
+
+def test_batch_reports_only_failed_messages(transcribe):
+    event = {'Records': [make_record('good'), make_record('broken'), make_record('down')]}
+
+    response = transcribe.lambda_handler(event, None)
+
+    # The open circuit sends its message back to wait, the broken file is retried on the usual schedule
+    assert [failure['itemIdentifier'] for failure in response['batchItemFailures']] == ['broken-message']
+    assert transcribe.delays == [('down-message', 30)]
+
+    assert states(transcribe)['good'] == job_util.job_util.PUBLISHED
+    assert states(transcribe)['down'] == job_util.job_util.UPLOADING
+
+
+def test_job_fails_only_on_the_last_attempt(transcribe):
+    with pytest.raises(RuntimeError):
+        transcribe.process_record(make_record('broken', receive_count=2))
+
+    assert states(transcribe)['broken'] == job_util.job_util.UPLOADING
+    assert FakeBox.cards == []
+
+    with pytest.raises(RuntimeError):
+        transcribe.process_record(make_record('broken', receive_count=3))
+
+    assert states(transcribe)['broken'] == job_util.job_util.FAILED
+    assert FakeBox.cards == [('broken', 'error')]
+
+
+def test_outage_fails_the_job_once_attempts_run_out(transcribe):
+    with pytest.raises(resilience_util.circuit_open):
+        transcribe.process_record(make_record('down', receive_count=3))
+
+    assert transcribe.delays == []
+    assert states(transcribe)['down'] == job_util.job_util.FAILED
+    assert FakeBox.cards == [('down', 'error')]
+
+
+def test_deferred_copies_resume_the_same_job_until_deferrals_run_out(transcribe):
+    transcribe.process_record(make_record('down'))
+    transcribe.process_record(make_record('down', deferrals=1))
+
+    assert transcribe.delays == [('down-message', 30), ('down-copy-1', 30)]
+    assert list(states(transcribe).values()) == [job_util.job_util.UPLOADING]
+
+    with pytest.raises(resilience_util.circuit_open):
+        transcribe.process_record(make_record('down', deferrals=transcribe.max_deferrals))
+
+    assert list(states(transcribe).values()) == [job_util.job_util.FAILED]
+    assert FakeBox.cards == [('down', 'error')]
+
+
+def test_stale_summaries_only_reuse_the_transcript(transcribe):
+    FakeDedup.settings = {**SETTINGS, 'templates': ['summary', 'speakers']}
+
+    transcribe.process_record(make_record('good'))
+
+    job = next(iter(transcribe.table.items.values()))
+
+    # Summarize reads the earlier transcript and makes cards for the current templates
+    assert transcribe.summarized == [job['job_id']]
+    assert job['transcript_hash'] == 'sha1-good'
+    assert FakeBox.cards == []
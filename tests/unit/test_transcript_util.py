@@ -0,0 +1,149 @@
+import io
+import json
+import os
+
+import transcript_util
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def word(content, start, end):
+    return {
+        'type': 'pronunciation',
+        'start_time': str(start),
+        'end_time': str(end),
+        'alternatives': [{'confidence': '0.99', 'content': content}]
+    }
+
+
+def punctuation(content):
+    return {
+        'type': 'punctuation',
+        'alternatives': [{'confidence': '0.0', 'content': content}]
+    }
+
+
+def test_stitch_segments_keeps_one_copy_of_the_overlap():
+    # Segment two starts at 10s and repeats the 10-12s overlap of segment one
+    first = [word('hello', 1.0, 1.5), word('there', 9.0, 9.5), word('general', 10.5, 10.9), word('ken', 11.8, 12.0)]
+    second = [word('eral', 0.0, 0.2), word('general', 0.5, 0.9), word('kenobi', 1.8, 2.4), punctuation('.')]
+
+    items = list(transcript_util.stitch_segments([(0, first), (10, second)], overlap=2))
+
+    assert [item['alternatives'][0]['content'] for item in items] == ['hello', 'there', 'general', 'kenobi', '.']
+    assert [item.get('start_time') for item in items] == ['1.000', '9.000', '10.500', '11.800', None]
+
+
+def test_get_transcript_text_attaches_punctuation():
+    items = [word('hello', 0, 1), punctuation(','), word('world', 1, 2), punctuation('.')]
+
+    assert transcript_util.get_transcript_text(items) == 'hello, world.'
+
+
+def test_iter_items_streams_across_chunk_boundaries():
+    items = [word(f"word{index}", index, index + 0.5) for index in range(50)] + [punctuation('.')]
+    document = json.dumps({
+        'jobName': 'meeting',
+        'results': {
+            'transcripts': [{'transcript': 'a "quoted" [transcript] {text}'}],
+            'speaker_labels': {'segments': [{'items': [{'start_time': '0.0'}]}]},
+            'items': items,
+            'audio_segments': [{'items': [1, 2, 3]}]
+        },
+        'status': 'COMPLETED'
+    }, indent=1).encode('utf-8')
+
+    stream = transcript_util.json_stream(io.BytesIO(document), chunk_size=7)
+
+    assert [value for path, value in stream.walk({'results.items.item'})] == items
+    assert transcript_util.read_transcript(io.BytesIO(document)) == 'a "quoted" [transcript] {text}'
+
+
+def test_compact_transcript_round_trips_items():
+    items = [word('hello', 0.04, 0.38), punctuation(','), word('hello', 1.2, 1.5), word('world', 2.0, 2.25)]
+
+    transcript = transcript_util.compact_transcript.from_items(items)
+
+    assert len(transcript) == 4
+    assert transcript.words == ['hello', ',', 'world']
+    assert list(transcript.start_ms) == [40, -1, 1200, 2000]
+    assert transcript.text() == 'hello, hello world'
+    assert [item.get('start_time') for item in transcript] == ['0.040', None, '1.200', '2.000']
+    assert [item['alternatives'][0]['content'] for item in transcript] == ['hello', ',', 'hello', 'world']
+
+
+def test_group_entries_matches_golden_card_entries():
+    with open(os.path.join(FIXTURES, 'transcribe_output.json'), 'rb') as output:
+        items = list(transcript_util.iter_items(output))
+
+    with open(os.path.join(FIXTURES, 'transcribe_output.entries.json')) as golden:
+        expected = [(entry['appears'], entry['text']) for entry in json.load(golden)]
+
+    assert transcript_util.group_entries(items) == expected
+    assert transcript_util.group_entries(transcript_util.compact_transcript.from_items(items)) == expected
+
+
+def test_group_entries_window():
+    items = [word('a', 0.1, 0.2), word('b', 1.5, 1.6), punctuation('.'), word('c', 2.1, 2.2), word('d', 4.9, 5.0)]
+
+    assert transcript_util.group_entries(items, window_seconds=2) == [(0, 'a b . '), (2, 'c '), (4, 'd ')]
+
+
+def test_group_entries_by_sentence_and_speaker():
+    items = [
+        dict(word('hi', 0.1, 0.2), speaker_label='spk_0'),
+        dict(punctuation('.'), speaker_label='spk_0'),
+        dict(word('how', 1.2, 1.3), speaker_label='spk_0'),
+        dict(word('are', 1.4, 1.5), speaker_label='spk_0'),
+        dict(word('you', 2.1, 2.2), speaker_label='spk_0'),
+        dict(punctuation('?'), speaker_label='spk_0'),
+        dict(word('fine', 3.5, 3.8), speaker_label='spk_1'),
+        dict(punctuation('.'), speaker_label='spk_1'),
+    ]
+
+    assert transcript_util.group_entries(items, policy='sentence') == [
+        (0, 'hi . '), (1, 'how are you ? '), (3, 'fine . ')
+    ]
+    assert transcript_util.group_entries(items, policy='speaker') == [
+        (0, 'hi . how are you ? '), (3, 'fine . ')
+    ]
+
+
+def test_group_entries_max_entries_merges_evenly():
+    items = [word(f"w{index}", index, index + 0.5) for index in range(10)]
+
+    entries = transcript_util.group_entries(items, max_entries=3)
+
+    assert entries == [(0, 'w0 w1 w2 w3 '), (4, 'w4 w5 w6 w7 '), (8, 'w8 w9 ')]
+
+
+def test_split_units_breaks_at_sentences_and_speakers():
+    items = [
+        dict(word('hi', 0.1, 0.2), speaker_label='spk_0'),
+        dict(punctuation('.'), speaker_label='spk_0'),
+        dict(word('welcome', 1.0, 1.3), speaker_label='spk_0'),
+        dict(word('thanks', 1.5, 1.8), speaker_label='spk_1'),
+        dict(punctuation('!'), speaker_label='spk_1'),
+    ]
+
+    assert transcript_util.split_units(items) == ['spk_0: hi.', 'welcome', 'spk_1: thanks!']
+
+
+def test_pack_chunks_overlaps_and_bounds_size():
+    units = [f"Sentence number {index} is here." for index in range(20)]
+
+    chunks = transcript_util.pack_chunks(units, max_tokens=30, overlap_tokens=10)
+
+    assert all(transcript_util.estimate_tokens(chunk) <= 30 for chunk in chunks)
+    assert chunks[0].startswith('Sentence number 0 ')
+    assert chunks[-1].endswith('Sentence number 19 is here.')
+
+    # Each chunk starts with the last sentence of the one before it
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.endswith(chunk.split(' is here.')[0] + ' is here.')
+
+
+def test_pack_chunks_min_units_always_shrinks():
+    partials = ['x' * 400] * 5
+
+    assert len(transcript_util.pack_chunks(partials, max_tokens=50, min_units=2)) == 3